@@ -7,7 +7,7 @@ from alembic import context
 
 from app.core.config import settings
 from app.core.database import Base
-from app.models import User, Dataset, Image, Annotation, Job
+from app.models import User, Dataset, Image, Annotation, Job, Prediction, Blob
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,60 @@
+"""store timestamps with time zone
+
+Revision ID: 2b8f6d4c9e13
+Revises: 7c3e9a1f5b20
+Create Date: 2026-10-17 21:05:37.284519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2b8f6d4c9e13'
+down_revision: Union[str, Sequence[str], None] = '7c3e9a1f5b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, column, nullable); existing values were written in UTC
+TIMESTAMP_COLUMNS = [
+    ('users', 'created_at', False),
+    ('datasets', 'created_at', False),
+    ('images', 'created_at', False),
+    ('images', 'reviewed_at', True),
+    ('annotations', 'updated_at', False),
+    ('predictions', 'created_at', False),
+    ('blobs', 'created_at', False),
+    ('jobs', 'created_at', True),
+    ('jobs', 'started_at', True),
+    ('jobs', 'finished_at', True),
+    ('jobs', 'lease_expires_at', True),
+    ('jobs', 'heartbeat_at', True),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, column, nullable in TIMESTAMP_COLUMNS:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(
+                column,
+                existing_type=sa.DateTime(),
+                type_=sa.DateTime(timezone=True),
+                existing_nullable=nullable,
+                postgresql_using=f"{column} AT TIME ZONE 'UTC'"
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, column, nullable in reversed(TIMESTAMP_COLUMNS):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(
+                column,
+                existing_type=sa.DateTime(timezone=True),
+                type_=sa.DateTime(),
+                existing_nullable=nullable,
+                postgresql_using=f"{column} AT TIME ZONE 'UTC'"
+            )
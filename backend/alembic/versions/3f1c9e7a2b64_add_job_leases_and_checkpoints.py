@@ -0,0 +1,40 @@
+"""add job leases and checkpoints
+
+Revision ID: 3f1c9e7a2b64
+Revises: cd79aba850a3
+Create Date: 2026-10-17 11:03:27.552918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c9e7a2b64'
+down_revision: Union[str, Sequence[str], None] = 'cd79aba850a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('jobs', sa.Column('params_json', sa.JSON(), nullable=True))
+    op.add_column('jobs', sa.Column('started_at', sa.DateTime(), nullable=True))
+    op.add_column('jobs', sa.Column('lease_owner', sa.String(), nullable=True))
+    op.add_column('jobs', sa.Column('lease_expires_at', sa.DateTime(), nullable=True))
+    op.add_column('jobs', sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+    op.add_column('jobs', sa.Column('attempts', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('jobs', sa.Column('checkpoint_image_id', sa.UUID(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('jobs', 'checkpoint_image_id')
+    op.drop_column('jobs', 'attempts')
+    op.drop_column('jobs', 'heartbeat_at')
+    op.drop_column('jobs', 'lease_expires_at')
+    op.drop_column('jobs', 'lease_owner')
+    op.drop_column('jobs', 'started_at')
+    op.drop_column('jobs', 'params_json')
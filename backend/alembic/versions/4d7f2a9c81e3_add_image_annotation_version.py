@@ -0,0 +1,28 @@
+"""add image annotation version
+
+Revision ID: 4d7f2a9c81e3
+Revises: b92c4d1e7a05
+Create Date: 2026-10-17 17:08:52.140376
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4d7f2a9c81e3'
+down_revision: Union[str, Sequence[str], None] = 'b92c4d1e7a05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('images', sa.Column('annotation_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('images', 'annotation_version')
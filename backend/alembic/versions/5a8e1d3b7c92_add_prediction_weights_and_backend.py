@@ -0,0 +1,31 @@
+"""add prediction weights and backend
+
+Revision ID: 5a8e1d3b7c92
+Revises: 9e2a7c5d1f38
+Create Date: 2026-10-18 10:27:44.302917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a8e1d3b7c92'
+down_revision: Union[str, Sequence[str], None] = '9e2a7c5d1f38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows don't say which weights made them, so they are never reused
+    op.add_column('predictions', sa.Column('weights_id', sa.String(), nullable=True))
+    op.add_column('predictions', sa.Column('backend', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('predictions', 'backend')
+    op.drop_column('predictions', 'weights_id')
@@ -0,0 +1,30 @@
+"""add prediction tiling
+
+Revision ID: 7c3e9a1f5b20
+Revises: 4d7f2a9c81e3
+Create Date: 2026-10-17 19:42:10.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c3e9a1f5b20'
+down_revision: Union[str, Sequence[str], None] = '4d7f2a9c81e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('predictions', sa.Column('tile_size', sa.Integer(), nullable=True))
+    op.add_column('predictions', sa.Column('tile_overlap', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('predictions', 'tile_overlap')
+    op.drop_column('predictions', 'tile_size')
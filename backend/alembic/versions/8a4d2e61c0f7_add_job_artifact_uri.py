@@ -0,0 +1,28 @@
+"""add job artifact uri
+
+Revision ID: 8a4d2e61c0f7
+Revises: 3f1c9e7a2b64
+Create Date: 2026-10-17 13:40:05.117392
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a4d2e61c0f7'
+down_revision: Union[str, Sequence[str], None] = '3f1c9e7a2b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('jobs', sa.Column('artifact_uri', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('jobs', 'artifact_uri')
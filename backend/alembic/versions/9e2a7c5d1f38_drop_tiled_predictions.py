@@ -0,0 +1,28 @@
+"""drop tiled predictions
+
+Revision ID: 9e2a7c5d1f38
+Revises: 2b8f6d4c9e13
+Create Date: 2026-10-17 23:12:48.615203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e2a7c5d1f38'
+down_revision: Union[str, Sequence[str], None] = '2b8f6d4c9e13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Tiled predictions used to drop objects cut by tile seams; recompute them
+    op.execute("DELETE FROM predictions WHERE tile_size IS NOT NULL")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    pass
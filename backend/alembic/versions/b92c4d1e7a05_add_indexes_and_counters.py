@@ -0,0 +1,67 @@
+"""add indexes and counters
+
+Revision ID: b92c4d1e7a05
+Revises: e5b7f04d93a1
+Create Date: 2026-10-17 16:41:09.318220
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b92c4d1e7a05'
+down_revision: Union[str, Sequence[str], None] = 'e5b7f04d93a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_images_dataset_id_id', 'images', ['dataset_id', 'id'], unique=False)
+    op.create_index('ix_images_dataset_id_created_at_id', 'images', ['dataset_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_images_dataset_id_filename_id', 'images', ['dataset_id', 'filename', 'id'], unique=False)
+    op.create_index('ix_annotations_image_id_source', 'annotations', ['image_id', 'source'], unique=False)
+    op.create_index(op.f('ix_jobs_dataset_id'), 'jobs', ['dataset_id'], unique=False)
+
+    op.add_column('images', sa.Column('annotation_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('datasets', sa.Column('image_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('datasets', sa.Column('annotation_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('datasets', sa.Column('reviewed_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill the counters from existing rows
+    op.execute("""
+        UPDATE images SET annotation_count = (
+            SELECT count(*) FROM annotations WHERE annotations.image_id = images.id
+        )
+    """)
+    op.execute("""
+        UPDATE datasets SET
+            image_count = (
+                SELECT count(*) FROM images WHERE images.dataset_id = datasets.id
+            ),
+            annotation_count = (
+                SELECT coalesce(sum(images.annotation_count), 0) FROM images
+                WHERE images.dataset_id = datasets.id
+            ),
+            reviewed_count = (
+                SELECT count(*) FROM images
+                WHERE images.dataset_id = datasets.id AND images.reviewed_at IS NOT NULL
+            )
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('datasets', 'reviewed_count')
+    op.drop_column('datasets', 'annotation_count')
+    op.drop_column('datasets', 'image_count')
+    op.drop_column('images', 'annotation_count')
+
+    op.drop_index(op.f('ix_jobs_dataset_id'), table_name='jobs')
+    op.drop_index('ix_annotations_image_id_source', table_name='annotations')
+    op.drop_index('ix_images_dataset_id_filename_id', table_name='images')
+    op.drop_index('ix_images_dataset_id_created_at_id', table_name='images')
+    op.drop_index('ix_images_dataset_id_id', table_name='images')
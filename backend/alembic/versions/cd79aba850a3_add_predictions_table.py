@@ -0,0 +1,41 @@
+"""add predictions table
+
+Revision ID: cd79aba850a3
+Revises: a05d81b3c859
+Create Date: 2026-10-17 09:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'cd79aba850a3'
+down_revision: Union[str, Sequence[str], None] = 'a05d81b3c859'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('predictions',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('image_id', sa.UUID(), nullable=False),
+    sa.Column('model_name', sa.String(), nullable=False),
+    sa.Column('imgsz', sa.Integer(), nullable=False),
+    sa.Column('conf_floor', sa.Float(), nullable=False),
+    sa.Column('iou', sa.Float(), nullable=False),
+    sa.Column('max_det', sa.Integer(), nullable=False),
+    sa.Column('boxes', sa.LargeBinary(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['image_id'], ['images.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('image_id', 'model_name', 'imgsz', name='uq_predictions_image_model_imgsz')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('predictions')
@@ -0,0 +1,94 @@
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+from uuid import UUID
+import threading
+import time
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.models import User
+
+class TTLCache:
+    """Thread-safe LRU mapping whose entries also expire after a TTL."""
+    
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def pop(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class AuthCache:
+    """Per-process cache of decoded access tokens and the users they resolve to.
+    
+    Cached users are detached from any session, so only their column
+    attributes can be used. Entries are dropped on logout and whenever a
+    User row is updated or deleted through the ORM in this process; other
+    processes see such changes once their entries expire.
+    """
+    
+    def __init__(self, max_entries: int, ttl: float):
+        self.tokens = TTLCache(max_entries, ttl)
+        self.users = TTLCache(max_entries, ttl)
+    
+    def get_payload(self, token: str) -> Optional[dict]:
+        return self.tokens.get(token)
+    
+    def set_payload(self, token: str, payload: dict):
+        # Never keep a token around past its own expiry
+        expires = payload.get("exp")
+        ttl = expires - time.time() if isinstance(expires, (int, float)) else None
+        self.tokens.set(token, payload, ttl)
+    
+    def get_user(self, user_id: UUID) -> Optional[User]:
+        return self.users.get(user_id)
+    
+    def set_user(self, user: User):
+        self.users.set(user.id, user)
+    
+    def invalidate_token(self, token: str):
+        self.tokens.pop(token)
+    
+    def invalidate_user(self, user_id: UUID):
+        self.users.pop(user_id)
+    
+    def clear(self):
+        self.tokens.clear()
+        self.users.clear()
+
+auth_cache = AuthCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_CACHE_TTL_SECONDS)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target: User):
+    auth_cache.invalidate_user(target.id)
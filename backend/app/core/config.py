@@ -1,13 +1,76 @@
 from pydantic_settings import BaseSettings
+from typing import List, Optional
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    # Defaults to DATABASE_URL with the asyncio driver (asyncpg / aiosqlite)
+    ASYNC_DATABASE_URL: Optional[str] = None
+    # Per engine (sync and async each have their own pool)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    # Query instrumentation
+    DB_QUERY_STATS_HEADERS: bool = True
+    DB_REPEATED_QUERY_THRESHOLD: int = 10
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 10080
     FRONTEND_URL: str = "http://localhost:3000"
+    # Resolved users and decoded tokens are cached per process for this long
+    AUTH_CACHE_TTL_SECONDS: float = 60.0
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+    # Scrapers send it as "Authorization: Bearer <token>"; when unset, /metrics
+    # only answers requests from this host
+    METRICS_TOKEN: Optional[str] = None
+
+    # Inference
+    PRELABEL_BATCH_SIZE: int = 16
+    # Batch size for images predicted in tiles: each is held decoded at full
+    # resolution (a 24 MP image is ~70 MB) and already runs as many model inputs
+    PRELABEL_TILED_BATCH_SIZE: int = 2
+    PRELABEL_DECODE_WORKERS: int = 4
+    PRELABEL_PREFETCH_BATCHES: int = 4
+    # Batches' worth of image rows the reader looks ahead to fill batches of one
+    # input shape (rows only: images are decoded once their batch is full)
+    PRELABEL_BUCKET_WINDOW: int = 4
+    # Batch images of similar aspect ratio at rectangular input sizes instead of
+    # padding everything to a square imgsz
+    INFERENCE_RECT_BATCHES: bool = True
+    # Raw predictions are stored with these loose settings so plans can be re-thresholded later
+    PREDICTION_CONF_FLOOR: float = 0.01
+    PREDICTION_IOU: float = 0.7
+    PREDICTION_MAX_DET: int = 300
+    # torch | onnx | openvino (exported once per model and imgsz); plans can override it
+    INFERENCE_BACKEND: str = "torch"
+    # Exported models are cached here (default: yolo-models/exported)
+    EXPORTED_MODELS_DIR: Optional[str] = None
+    # Images whose longer side exceeds TILING_MIN_SIDE pixels are predicted in
+    # overlapping tiles of TILE_SIZE (default: the plan's imgsz); None disables it.
+    # Well above phone photos (about 4000 px), which downscale to imgsz fine and
+    # would otherwise cost dozens of passes each
+    TILING_MIN_SIDE: Optional[int] = 6000
+    TILE_SIZE: Optional[int] = None
+    TILE_OVERLAP: float = 0.2
+    # Models kept loaded per process; least recently used are evicted past either limit
+    MODEL_CACHE_MAX_BYTES: int = 1024 * 1024 * 1024
+    MODEL_CACHE_MAX_MODELS: int = 4
+    # Preloaded models get one dummy forward pass at this size
+    MODEL_WARMUP_IMGSZ: int = 640
+    
+    # Uploads
+    UPLOAD_WORKERS: int = 8
+    
+    # Job executor
+    JOB_WORKERS: int = 2
+    JOB_QUEUE_LIMIT: int = 32
+    JOB_SHUTDOWN_TIMEOUT: float = 30.0
+    JOB_WORKER_PRELOAD_MODELS: List[str] = ["yolov8s.pt"]
+    JOB_LEASE_SECONDS: int = 120
+    JOB_RECOVERY_INTERVAL_SECONDS: int = 60
+    # Export artifacts are deleted this long after their job finished
+    EXPORT_RETENTION_HOURS: float = 24.0
     
     class Config:
         env_file = ".env"
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
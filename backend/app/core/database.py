@@ -1,15 +1,74 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.core.query_stats import instrument_engine
 
-engine = create_engine(settings.DATABASE_URL)
+# asyncio driver used for each database backend by the async engine
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def async_database_url(url: str) -> str:
+    """The same database URL, with the backend's asyncio driver."""
+    
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()]).render_as_string(hide_password=False)
+
+def pool_options(url: str) -> dict:
+    """Pool sizing from Settings (SQLite keeps SQLAlchemy's defaults)."""
+    
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+
+def use_sqlite_wal(engine):
+    """Let SQLite commit while other connections are reading.
+    
+    Jobs stream rows in one session and checkpoint in another; with SQLite's
+    default rollback journal an open read cursor blocks every commit.
+    """
+    
+    if engine.dialect.name != "sqlite":
+        return
+    
+    @event.listens_for(engine, "connect")
+    def set_journal_mode(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.close()
+
+engine = create_engine(settings.DATABASE_URL, **pool_options(settings.DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Used by the request-path routes so queries don't block the event loop.
+# Objects stay usable after commit, as nothing can lazy-load on an AsyncSession.
+ASYNC_URL = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(ASYNC_URL, **pool_options(ASYNC_URL))
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+use_sqlite_wal(engine)
+use_sqlite_wal(async_engine.sync_engine)
+
+# Per-request / per-job query counts and timings (see app.core.query_stats)
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
\ No newline at end of file
@@ -1,27 +1,46 @@
 from fastapi import Cookie, HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
-from app.core.database import get_db
+from uuid import UUID
+from app.core.auth_cache import auth_cache
+from app.core.database import get_db, get_async_db
 from app.core.security import decode_access_token
 from app.models import User
 
 async def require_user(
     access_token: Optional[str] = Cookie(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> User:
+    """Resolve the request's user, from the auth cache when possible.
+    
+    A cache hit needs neither a JWT decode nor a query; the returned user is
+    detached, so only use its columns (e.g. `user.id`).
+    """
     if not access_token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    payload = decode_access_token(access_token)
-    if not payload:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    payload = auth_cache.get_payload(access_token)
+    if payload is None:
+        payload = decode_access_token(access_token)
+        if not payload:
+            raise HTTPException(status_code=401, detail="Invalid token")
+        auth_cache.set_payload(access_token, payload)
     
-    user_id = payload.get("sub")
-    if not user_id:
+    try:
+        user_id = UUID(payload.get("sub"))
+    except (TypeError, ValueError):
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = auth_cache.get_user(user_id)
+    if user is not None:
+        return user
+    
+    user = await db.scalar(select(User).where(User.id == user_id))
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     
+    db.expunge(user)
+    auth_cache.set_user(user)
+    
     return user
\ No newline at end of file
@@ -0,0 +1,336 @@
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import abc
+import bisect
+import logging
+import math
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds; spans a single small forward pass up to a cold model download
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+class Metric(abc.ABC):
+    """Base for metrics kept in a MetricsRegistry (Prometheus text format).
+    
+    Changes go through `_apply` so that, in a job worker process, they can be
+    forwarded to the API process instead of being recorded locally.
+    """
+    
+    type_name = ""
+    
+    def __init__(self, registry: "MetricsRegistry", name: str, help: str, labelnames: Sequence[str] = ()):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        registry.register(self)
+    
+    def _label_values(self, labels: Dict[str, object]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+    
+    def _apply(self, op: str, labels: Dict[str, object], value: float):
+        label_values = self._label_values(labels)
+        if not self.registry.forward(self.name, op, label_values, value):
+            self._apply_local(op, label_values, value)
+    
+    @abc.abstractmethod
+    def _apply_local(self, op: str, label_values: LabelValues, value: float):
+        """Record a change in this process."""
+    
+    @abc.abstractmethod
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        """(sample name, labels, value) for every series of this metric."""
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type_name}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+class Counter(Metric):
+    type_name = "counter"
+    
+    def __init__(self, *args, **kwargs):
+        self._values: Dict[LabelValues, float] = {}
+        super().__init__(*args, **kwargs)
+    
+    def inc(self, amount: float = 1.0, **labels):
+        self._apply("inc", labels, amount)
+    
+    def _apply_local(self, op, label_values, value):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + value
+    
+    def samples(self):
+        with self._lock:
+            return [
+                (f"{self.name}_total", dict(zip(self.labelnames, key)), value)
+                for key, value in sorted(self._values.items())
+            ]
+
+class Gauge(Metric):
+    type_name = "gauge"
+    
+    def __init__(self, *args, **kwargs):
+        self._values: Dict[LabelValues, float] = {}
+        super().__init__(*args, **kwargs)
+    
+    def set(self, value: float, **labels):
+        self._apply("set", labels, value)
+    
+    def remove(self, **labels):
+        self._apply("remove", labels, 0.0)
+    
+    def _apply_local(self, op, label_values, value):
+        with self._lock:
+            if op == "remove":
+                self._values.pop(label_values, None)
+            else:
+                self._values[label_values] = value
+    
+    def replace_all(self, values: Dict[LabelValues, float]):
+        """Swap in a full set of samples (for gauges computed at scrape time)."""
+        with self._lock:
+            self._values = dict(values)
+    
+    def samples(self):
+        with self._lock:
+            return [
+                (self.name, dict(zip(self.labelnames, key)), value)
+                for key, value in sorted(self._values.items())
+            ]
+
+class Histogram(Metric):
+    type_name = "histogram"
+    
+    def __init__(self, *args, buckets: Sequence[float] = LATENCY_BUCKETS, **kwargs):
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts incl. +Inf, sum)
+        self._values: Dict[LabelValues, Tuple[List[int], float]] = {}
+        super().__init__(*args, **kwargs)
+    
+    def observe(self, value: float, **labels):
+        self._apply("observe", labels, value)
+    
+    def time(self, **labels) -> "_Timer":
+        """Context manager that observes the duration of its block."""
+        return _Timer(self, labels)
+    
+    def _apply_local(self, op, label_values, value):
+        with self._lock:
+            counts, total = self._values.setdefault(label_values, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[label_values] = (counts, total + value)
+    
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                labels = dict(zip(self.labelnames, key))
+                cumulative = 0
+                for bound, count in zip(self.buckets + (math.inf,), counts):
+                    cumulative += count
+                    samples.append((f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+                samples.append((f"{self.name}_sum", labels, total))
+                samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, object]):
+        self.histogram = histogram
+        self.labels = labels
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+class MetricsRegistry:
+    """All metrics of this process, rendered together for /metrics.
+    
+    Job worker processes call `forward_to(queue)` so their samples are sent
+    to the API process, which applies them with `start_receiver(queue)`.
+    """
+    
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._forward_queue = None
+        self._receiver: Optional[threading.Thread] = None
+    
+    def register(self, metric: Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+    
+    def add_collector(self, collector: Callable[[], None]):
+        """Run `collector` before every render, to refresh scrape-time gauges."""
+        self._collectors.append(collector)
+    
+    def render(self) -> str:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception:
+                logger.exception("Metrics collector failed")
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+    
+    def forward_to(self, metrics_queue):
+        self._forward_queue = metrics_queue
+    
+    def forward(self, name: str, op: str, label_values: LabelValues, value: float) -> bool:
+        """Send a change to the API process. False when this process records locally."""
+        if self._forward_queue is None:
+            return False
+        try:
+            self._forward_queue.put_nowait((name, op, label_values, value))
+        except Exception:
+            # Metrics must never slow down or break a job
+            pass
+        return True
+    
+    def start_receiver(self, metrics_queue):
+        """Apply samples forwarded by worker processes until `stop_receiver`."""
+        
+        def receive():
+            while True:
+                item = metrics_queue.get()
+                if item is None:
+                    return
+                name, op, label_values, value = item
+                metric = self._metrics.get(name)
+                if metric is not None:
+                    metric._apply_local(op, label_values, value)
+        
+        self._receiver = threading.Thread(target=receive, name="metrics-receiver", daemon=True)
+        self._receiver.start()
+    
+    def stop_receiver(self, metrics_queue):
+        if self._receiver is not None:
+            metrics_queue.put(None)
+            self._receiver.join(timeout=5)
+            self._receiver = None
+
+def _format_labels(labels: Dict[str, object]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+def _escape(value: object) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+metrics = MetricsRegistry()
+
+# Inference (observed in whichever process runs the model)
+model_load_seconds = Histogram(
+    metrics, "orion_model_load_seconds", "Time to load a YOLO model", ["model"]
+)
+predict_seconds = Histogram(
+    metrics, "orion_predict_seconds", "Time of one batched YOLO forward pass", ["model", "imgsz", "backend"]
+)
+predicted_images = Counter(
+    metrics, "orion_predicted_images", "Images run through YOLO", ["model", "imgsz", "backend"]
+)
+model_memory_bytes = Gauge(
+    metrics, "orion_model_memory_bytes", "Parameter and buffer memory of a loaded model", ["model", "worker"]
+)
+
+# Jobs
+job_images = Counter(
+    metrics, "orion_job_images", "Images processed by jobs", ["type"]
+)
+job_images_per_second = Gauge(
+    metrics, "orion_job_images_per_second", "Throughput of each running job since it started", ["job_id", "type"]
+)
+jobs = Gauge(
+    metrics, "orion_jobs", "Jobs by status, from the jobs table", ["type", "status"]
+)
+executor_pending_jobs = Gauge(
+    metrics, "orion_executor_pending_jobs", "Jobs submitted to this process's job executor and not finished"
+)
+
+# HTTP
+http_request_seconds = Histogram(
+    metrics, "orion_http_request_seconds", "Request latency by route", ["method", "route", "status"]
+)
+
+class JobThroughput:
+    """Reports a running job's processed images to the job metrics."""
+    
+    def __init__(self, job_id, job_type: str):
+        self.labels = {"job_id": job_id, "type": job_type}
+        self.images = 0
+        self.started = time.perf_counter()
+    
+    def add(self, count: int):
+        self.images += count
+        job_images.inc(count, type=self.labels["type"])
+        elapsed = time.perf_counter() - self.started
+        if elapsed > 0:
+            job_images_per_second.set(self.images / elapsed, **self.labels)
+    
+    def close(self):
+        job_images_per_second.remove(**self.labels)
+
+def resident_models() -> List[Dict[str, object]]:
+    """Models loaded in this process and, via forwarded samples, its job workers."""
+    return [
+        {"model": labels["model"], "worker": labels["worker"], "memory_bytes": int(value)}
+        for _, labels, value in model_memory_bytes.samples()
+    ]
+
+def worker_label() -> str:
+    """Identifies the current process in per-worker metrics."""
+    return str(os.getpid())
+
+class MetricsMiddleware:
+    """Observes request latency per route template (not per raw path)."""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        status = 500
+        started = time.perf_counter()
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the (shared) scope
+            route = scope.get("route")
+            http_request_seconds.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status
+            )
@@ -0,0 +1,150 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+import logging
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class QueryStats:
+    """Queries run by one unit of work (a request or a background job)."""
+    
+    count: int = 0
+    total_ms: float = 0.0
+    statements: Counter = field(default_factory=Counter)
+    # Chunks of work done so far (jobs only, see count_batch)
+    batches: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    
+    def record(self, statement: str, elapsed_ms: float, executemany: bool = False):
+        # Pipelined jobs run queries from several threads
+        with self._lock:
+            self.count += 1
+            self.total_ms += elapsed_ms
+            # One executemany already covers many rows, it isn't an N+1
+            if not executemany:
+                self.statements[statement] += 1
+    
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Statements run at least `threshold` times per batch (or in all, outside
+        of jobs), the usual sign of an N+1."""
+        threshold *= max(self.batches, 1)
+        return [(sql, n) for sql, n in self.statements.most_common() if n >= threshold]
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Collect stats for every query run in this context until the block exits.
+    
+    Context variables are copied into asyncio tasks and Starlette's threadpool
+    but not into plain threads; start those with `contextvars.copy_context().run`.
+    """
+    
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+def count_batch():
+    """Mark one chunk of a job as done.
+    
+    Chunked jobs run the same few statements once per chunk; the repeated
+    statement threshold scales with the chunks so only per-row repeats warn.
+    """
+    
+    stats = _current_stats.get()
+    if stats is not None:
+        with stats._lock:
+            stats.batches += 1
+
+def log_query_stats(label: str, stats: QueryStats, level: int = logging.DEBUG):
+    """One summary line, plus a warning per repeated statement."""
+    
+    logger.log(level, "%s: %d queries, %.1f ms in DB", label, stats.count, stats.total_ms)
+    for sql, n in stats.repeated(settings.DB_REPEATED_QUERY_THRESHOLD):
+        logger.warning(
+            "%s ran the same statement %d times (possible N+1): %s",
+            label, n, " ".join(sql.split())[:300]
+        )
+
+def instrument_engine(engine: Engine):
+    """Attach the timing listeners to an engine (for async, its sync_engine)."""
+    
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+    
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.record(statement, (time.perf_counter() - started) * 1000, executemany)
+    
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        # Failed statements never reach after_cursor_execute
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+def pool_status(engine: Engine) -> Dict[str, int]:
+    """Current connection usage of an engine's pool (QueuePool-style pools)."""
+    
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return {}
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": getattr(pool, "_max_overflow", 0),
+    }
+
+class QueryStatsMiddleware:
+    """Tracks the queries of each HTTP request.
+    
+    Adds `X-DB-Query-Count` and `X-DB-Time-Ms` headers (when
+    DB_QUERY_STATS_HEADERS is on) and logs a debug line per request once its
+    body has been sent, so streamed responses are counted in full there.
+    """
+    
+    def __init__(self, app, engines: Dict[str, Engine]):
+        self.app = app
+        self.engines = engines
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        label = f"{scope['method']} {scope['path']}"
+        
+        with track_queries() as stats:
+            async def send_with_stats(message):
+                if message["type"] == "http.response.start" and settings.DB_QUERY_STATS_HEADERS:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-db-query-count", str(stats.count).encode()))
+                    headers.append((b"x-db-time-ms", f"{stats.total_ms:.1f}".encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+            
+            try:
+                await self.app(scope, receive, send_with_stats)
+            finally:
+                log_query_stats(label, stats)
+                if logger.isEnabledFor(logging.DEBUG):
+                    for name, engine in self.engines.items():
+                        logger.debug("%s: %s pool %s", label, name, pool_status(engine))
@@ -1,8 +1,26 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from app.core.config import settings
-from app.routes import auth, datasets, images, annotations, prelabel
-app = FastAPI(title="Orion API", version="0.1.0")
+from app.core.database import engine, async_engine
+from app.core.query_stats import QueryStatsMiddleware
+from app.core.metrics import MetricsMiddleware
+from app.routes import auth, datasets, images, annotations, prelabel, metrics
+from app.services.executor import job_executor
+from app.services.recovery import job_recovery
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    job_executor.start()
+    # Picks up jobs left queued or running by a previous process
+    job_recovery.start()
+    yield
+    # Blocks while running jobs get their grace period, so keep it off the loop
+    await run_in_threadpool(job_recovery.stop)
+    await run_in_threadpool(job_executor.shutdown)
+
+app = FastAPI(title="Orion API", version="0.1.0", lifespan=lifespan)
 
 # CORS Configuration 
 app.add_middleware(
@@ -11,8 +29,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["*"],
+    # Credentialed responses don't honour the wildcard, so name what the UI reads
+    expose_headers=["*", "X-Next-Cursor", "X-Annotation-Version", "X-DB-Query-Count", "X-DB-Time-Ms"],
+)
+
+# Added last so they wrap everything, CORS included
+app.add_middleware(
+    QueryStatsMiddleware,
+    engines={"sync": engine, "async": async_engine.sync_engine}
 )
+app.add_middleware(MetricsMiddleware)
 
 # Include routers
 app.include_router(auth.router)
@@ -20,6 +46,7 @@ app.include_router(datasets.router)
 app.include_router(images.router)
 app.include_router(annotations.router)
 app.include_router(prelabel.router)
+app.include_router(metrics.router)
 
 @app.get("/")
 async def root():
@@ -27,4 +54,5 @@ async def root():
 
 @app.get("/health")
 async def health():
+    # Unauthenticated; the details are at /health/details (see routes/metrics.py)
     return {"status": "ok"}
\ No newline at end of file
@@ -2,4 +2,6 @@ from app.models.user import User
 from app.models.dataset import Dataset
 from app.models.image import Image
 from app.models.annotation import Annotation, AnnotationSource
+from app.models.prediction import Prediction
+from app.models.blob import Blob
 from app.models.jobs import Job, JobStatus, JobType
\ No newline at end of file
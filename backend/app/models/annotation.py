@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, DateTime, ForeignKey, Enum as SQLEnum
+from sqlalchemy import Column, String, Float, DateTime, ForeignKey, Index, Enum as SQLEnum
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime, UTC
@@ -12,6 +12,10 @@ class AnnotationSource(str, enum.Enum):
 
 class Annotation(Base):
     __tablename__ = "annotations"
+    __table_args__ = (
+        # Also serves lookups by image_id alone
+        Index("ix_annotations_image_id_source", "image_id", "source"),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     image_id = Column(UUID(as_uuid=True), ForeignKey("images.id"), nullable=False)
@@ -22,7 +26,7 @@ class Annotation(Base):
     h = Column(Float, nullable=False)
     source = Column(SQLEnum(AnnotationSource), nullable=False, default=AnnotationSource.manual)
     confidence = Column(Float, nullable=True)
-    updated_at = Column(DateTime, default=datetime.now(UTC), onupdate=datetime.now(UTC), nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(UTC), onupdate=lambda: datetime.now(UTC), nullable=False)
     
     # Relationships
     image = relationship("Image", back_populates="annotations")
\ No newline at end of file
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime
+from datetime import datetime, UTC
+from app.core.database import Base
+
+class Blob(Base):
+    """A file in the content-addressed store, shared by every image with the same bytes."""
+    __tablename__ = "blobs"
+    
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    refcount = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(UTC), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime, UTC
@@ -12,7 +12,12 @@ class Dataset(Base):
     owner_user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     name = Column(String, nullable=False)
     description = Column(String, nullable=True)
-    created_at = Column(DateTime, default=datetime.now(UTC), nullable=False)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(UTC), nullable=False)
+    
+    # Denormalized, kept in step by app.services.counters
+    image_count = Column(Integer, default=0, server_default="0", nullable=False)
+    annotation_count = Column(Integer, default=0, server_default="0", nullable=False)
+    reviewed_count = Column(Integer, default=0, server_default="0", nullable=False)
     
     # Relationships
     owner = relationship("User", backref="datasets")
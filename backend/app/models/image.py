@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime, UTC
@@ -7,16 +7,30 @@ from app.core.database import Base
 
 class Image(Base):
     __tablename__ = "images"
+    __table_args__ = (
+        # Keyset pages of a dataset in each list_images sort order, and id
+        # order for jobs that stream a dataset
+        Index("ix_images_dataset_id_id", "dataset_id", "id"),
+        Index("ix_images_dataset_id_created_at_id", "dataset_id", "created_at", "id"),
+        Index("ix_images_dataset_id_filename_id", "dataset_id", "filename", "id"),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     dataset_id = Column(UUID(as_uuid=True), ForeignKey("datasets.id"), nullable=False)
     filename = Column(String, nullable=False)
     storage_uri = Column(String, nullable=False)
+    # SHA-256 of the file in the content store (null for files stored before it existed)
+    content_hash = Column(String(64), nullable=True, index=True)
     width = Column(Integer, nullable=False)
     height = Column(Integer, nullable=False)
-    created_at = Column(DateTime, default=datetime.now(UTC), nullable=False)
-    reviewed_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(UTC), nullable=False)
+    reviewed_at = Column(DateTime(timezone=True), nullable=True)
+    # Denormalized, kept in step by app.services.counters
+    annotation_count = Column(Integer, default=0, server_default="0", nullable=False)
+    # Bumped by every annotation write so editors can detect concurrent changes
+    annotation_version = Column(Integer, default=0, server_default="0", nullable=False)
     
     # Relationships
     dataset = relationship("Dataset", back_populates="images")
-    annotations = relationship("Annotation", back_populates="image", cascade="all, delete-orphan")
\ No newline at end of file
+    annotations = relationship("Annotation", back_populates="image", cascade="all, delete-orphan")
+    predictions = relationship("Prediction", back_populates="image", cascade="all, delete-orphan")
\ No newline at end of file
@@ -21,7 +21,7 @@ class Job(Base):
     __tablename__ = "jobs"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    dataset_id = Column(UUID(as_uuid=True), nullable=False)
+    dataset_id = Column(UUID(as_uuid=True), nullable=False, index=True)
     type = Column(SQLEnum(JobType), nullable=False)
     status = Column(SQLEnum(JobStatus), default=JobStatus.QUEUED, nullable=False)
     processed = Column(Integer, default=0)
@@ -31,5 +31,16 @@ class Job(Base):
     plan_v0_json = Column(JSON, nullable=True)
     sample_metrics_json = Column(JSON, nullable=True)
     plan_v1_json = Column(JSON, nullable=True)
-    created_at = Column(DateTime, default=lambda: datetime.now(UTC))
-    finished_at = Column(DateTime, nullable=True)
\ No newline at end of file
+    params_json = Column(JSON, nullable=True)
+    artifact_uri = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(UTC))
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # Durable execution: the worker holding the lease must heartbeat before it expires
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    # Last image (by id) whose results were committed; the job resumes after it
+    checkpoint_image_id = Column(UUID(as_uuid=True), nullable=True)
\ No newline at end of file
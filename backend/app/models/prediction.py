@@ -0,0 +1,36 @@
+from sqlalchemy import Column, String, Integer, Float, DateTime, ForeignKey, LargeBinary, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+from datetime import datetime, UTC
+import uuid
+from app.core.database import Base
+
+class Prediction(Base):
+    """Raw model output for one image, stored at a low confidence floor.
+    
+    `boxes` holds a float32 (n, 6) array of x, y, w, h, conf, cls so the
+    annotations can be rebuilt with new thresholds without re-running YOLO.
+    """
+    __tablename__ = "predictions"
+    __table_args__ = (
+        UniqueConstraint("image_id", "model_name", "imgsz", name="uq_predictions_image_model_imgsz"),
+    )
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    image_id = Column(UUID(as_uuid=True), ForeignKey("images.id", ondelete="CASCADE"), nullable=False)
+    model_name = Column(String, nullable=False)
+    imgsz = Column(Integer, nullable=False)
+    # Which weights file (see YOLOService.weights_id) and runtime made the boxes
+    weights_id = Column(String, nullable=True)
+    backend = Column(String, nullable=True)
+    conf_floor = Column(Float, nullable=False)
+    iou = Column(Float, nullable=False)
+    max_det = Column(Integer, nullable=False)
+    # Set when the image was predicted in overlapping tiles (see tile_windows)
+    tile_size = Column(Integer, nullable=True)
+    tile_overlap = Column(Float, nullable=True)
+    boxes = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(UTC), nullable=False)
+    
+    # Relationships
+    image = relationship("Image", back_populates="predictions")
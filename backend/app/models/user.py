@@ -10,4 +10,4 @@ class User(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     email = Column(String, unique=True, nullable=False, index=True)
     password_hash = Column(String, nullable=False)
-    created_at = Column(DateTime, default=datetime.now(UTC), nullable=False)
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(UTC), nullable=False)
\ No newline at end of file
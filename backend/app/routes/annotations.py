@@ -1,39 +1,54 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, update, delete
+from typing import Any, Dict, List
 from uuid import UUID
 from datetime import datetime, UTC
+import uuid
 
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.core.deps import require_user
 from app.models.user import User
 from app.models.dataset import Dataset
 from app.models.image import Image
 from app.models.annotation import Annotation, AnnotationSource
-from app.schemas.annotations import AnnotationItem, AnnotationBatchUpdate
+from app.schemas.annotations import (
+    AnnotationItem,
+    AnnotationInput,
+    AnnotationBatchUpdate,
+    AnnotationPatch,
+    AnnotationPatchResponse
+)
+from app.services.counters import counter_service
 
 router = APIRouter(tags=["annotations"])
 
 @router.get("/images/{image_id}/annotations", response_model=List[AnnotationItem])
 async def get_annotations(
     image_id: UUID,
+    response: Response,
     user: User = Depends(require_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all annotations for an image."""
+    """Get all annotations for an image.
+    
+    The `X-Annotation-Version` header holds the version to send with PATCH edits.
+    """
     
     # Verify image access through dataset ownership
-    image = db.query(Image).join(Dataset).filter(
+    image = await db.scalar(select(Image).join(Dataset).where(
         Image.id == image_id,
         Dataset.owner_user_id == user.id
-    ).first()
+    ))
     
     if not image:
         raise HTTPException(status_code=404, detail="Image not found")
     
-    annotations = db.query(Annotation).filter(
+    annotations = (await db.scalars(select(Annotation).where(
         Annotation.image_id == image_id
-    ).all()
+    ))).all()
+    
+    response.headers["X-Annotation-Version"] = str(image.annotation_version)
     
     return annotations
 
@@ -42,80 +57,196 @@ async def update_annotations(
     image_id: UUID,
     request: AnnotationBatchUpdate,
     user: User = Depends(require_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Replace all annotations for an image (replace-all strategy)."""
+    """Replace all annotations for an image (replace-all strategy).
+    
+    Prefer PATCH for edits: it only touches the annotations that changed.
+    """
     
     # Verify image access through dataset ownership
-    image = db.query(Image).join(Dataset).filter(
+    image = await db.scalar(select(Image).join(Dataset).where(
         Image.id == image_id,
         Dataset.owner_user_id == user.id
-    ).first()
+    ))
     
     if not image:
         raise HTTPException(status_code=404, detail="Image not found")
     
     # Delete all existing annotations for this image
-    db.query(Annotation).filter(Annotation.image_id == image_id).delete()
-    
-    # Create new annotations
-    new_annotations = []
-    for ann_input in request.annotations:
-        annotation = Annotation(
-            image_id=image_id,
-            label=ann_input.label,
-            x=ann_input.x,
-            y=ann_input.y,
-            w=ann_input.w,
-            h=ann_input.h,
-            source=AnnotationSource.manual,
-            confidence=None
-        )
-        db.add(annotation)
-        new_annotations.append(annotation)
+    deleted = (await db.execute(
+        delete(Annotation).where(Annotation.image_id == image_id)
+    )).rowcount
     
-    db.commit()
+    # Create new annotations (ids are generated here, so no refresh is needed)
+    new_annotations = [_manual_annotation(uuid.uuid4(), ann_input) for ann_input in request.annotations]
+    await _insert_annotations(db, image_id, new_annotations)
     
-    # Refresh all to get IDs and timestamps
-    for ann in new_annotations:
-        db.refresh(ann)
+    await db.run_sync(
+        counter_service.annotations_changed, image.dataset_id, {image_id: len(new_annotations) - deleted}
+    )
+    version = await _bump_version(db, image_id)
+    await db.commit()
     
     return {
         "image_id": image_id,
         "saved": len(new_annotations),
+        "version": version,
         "annotations": [
-            {
-                "id": str(ann.id),
-                "label": ann.label,
-                "x": ann.x,
-                "y": ann.y,
-                "w": ann.w,
-                "h": ann.h,
-                "source": ann.source.value,
-                "confidence": ann.confidence
-            }
+            {**ann, "id": str(ann["id"])}
             for ann in new_annotations
         ]
     }
 
+@router.patch("/images/{image_id}/annotations", response_model=AnnotationPatchResponse)
+async def patch_annotations(
+    image_id: UUID,
+    request: AnnotationPatch,
+    user: User = Depends(require_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Apply incremental annotation edits: creates, updates and deletes by id.
+    
+    `version` must be the image's current annotation version (from GET or a
+    previous write). If another edit landed in between, nothing is changed
+    and 409 is returned. Updated annotations become manual ones.
+    """
+    
+    # Verify image access through dataset ownership
+    image = await db.scalar(select(Image).join(Dataset).where(
+        Image.id == image_id,
+        Dataset.owner_user_id == user.id
+    ))
+    
+    if not image:
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    touched_ids = [ann.id for ann in request.update] + request.delete
+    if len(set(touched_ids)) != len(touched_ids):
+        raise HTTPException(status_code=400, detail="Each annotation can only be updated or deleted once")
+    
+    # Claim the next version first; in Postgres the row lock also makes
+    # concurrent editors of this image wait for each other
+    claimed = (await db.execute(
+        update(Image)
+        .where(Image.id == image_id, Image.annotation_version == request.version)
+        .values(annotation_version=Image.annotation_version + 1)
+        .execution_options(synchronize_session=False)
+    )).rowcount
+    
+    if not claimed:
+        await db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail=f"Annotations changed since version {request.version}, reload and retry"
+        )
+    
+    if touched_ids:
+        found = set((await db.scalars(select(Annotation.id).where(
+            Annotation.image_id == image_id,
+            Annotation.id.in_(touched_ids)
+        ))).all())
+        missing = [str(annotation_id) for annotation_id in touched_ids if annotation_id not in found]
+        if missing:
+            await db.rollback()
+            raise HTTPException(status_code=404, detail=f"Annotations not found: {', '.join(missing)}")
+    
+    created = [_manual_annotation(uuid.uuid4(), ann_input) for ann_input in request.create]
+    updated = [_manual_annotation(ann_input.id, ann_input) for ann_input in request.update]
+    
+    await _insert_annotations(db, image_id, created)
+    
+    if updated:
+        # ORM bulk UPDATE by primary key: one executemany for all rows
+        now = datetime.now(UTC)
+        await db.execute(update(Annotation), [{**ann, "updated_at": now} for ann in updated])
+    
+    if request.delete:
+        await db.execute(
+            delete(Annotation)
+            .where(Annotation.id.in_(request.delete))
+            .execution_options(synchronize_session=False)
+        )
+    
+    await db.run_sync(
+        counter_service.annotations_changed, image.dataset_id, {image_id: len(created) - len(request.delete)}
+    )
+    await db.commit()
+    
+    return AnnotationPatchResponse(
+        image_id=image_id,
+        version=request.version + 1,
+        created=[AnnotationItem(**ann) for ann in created],
+        updated=[AnnotationItem(**ann) for ann in updated],
+        deleted=len(request.delete)
+    )
+
+def _manual_annotation(annotation_id: UUID, ann_input: AnnotationInput) -> Dict[str, Any]:
+    """Column values of a user-drawn annotation."""
+    
+    return {
+        "id": annotation_id,
+        "label": ann_input.label,
+        "x": ann_input.x,
+        "y": ann_input.y,
+        "w": ann_input.w,
+        "h": ann_input.h,
+        "source": AnnotationSource.manual.value,
+        "confidence": None
+    }
+
+async def _insert_annotations(db: AsyncSession, image_id: UUID, annotations: List[Dict[str, Any]]):
+    """Insert annotation rows in one executemany, without ORM objects."""
+    
+    if annotations:
+        now = datetime.now(UTC)
+        await db.execute(
+            insert(Annotation),
+            [{**ann, "image_id": image_id, "updated_at": now} for ann in annotations]
+        )
+
+async def _bump_version(db: AsyncSession, image_id: UUID) -> int:
+    """Increment an image's annotation version and return the new value."""
+    
+    return (await db.execute(
+        update(Image)
+        .where(Image.id == image_id)
+        .values(annotation_version=Image.annotation_version + 1)
+        .returning(Image.annotation_version)
+        .execution_options(synchronize_session=False)
+    )).scalar_one()
+
 @router.post("/images/{image_id}/reviewed")
 async def mark_reviewed(
     image_id: UUID,
     user: User = Depends(require_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Mark an image as reviewed."""
     
     # Verify image access through dataset ownership
-    image = db.query(Image).join(Dataset).filter(
+    image = await db.scalar(select(Image).join(Dataset).where(
         Image.id == image_id,
         Dataset.owner_user_id == user.id
-    ).first()
+    ))
     
     if not image:
         raise HTTPException(status_code=404, detail="Image not found")
     
-    image.reviewed_at = datetime.now(UTC)
-    db.commit()
+    reviewed_at = datetime.now(UTC)
+    
+    # Only the request that actually flips reviewed_at counts the image
+    first_review = (await db.execute(
+        update(Image)
+        .where(Image.id == image_id, Image.reviewed_at.is_(None))
+        .values(reviewed_at=reviewed_at)
+        .execution_options(synchronize_session=False)
+    )).rowcount
+    
+    if first_review:
+        await db.run_sync(counter_service.images_reviewed, image.dataset_id, 1)
+    else:
+        image.reviewed_at = reviewed_at
+    await db.commit()
     
-    return {"image_id": image_id, "reviewed_at": image.reviewed_at}
\ No newline at end of file
+    return {"image_id": image_id, "reviewed_at": reviewed_at}
\ No newline at end of file
@@ -1,8 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Cookie, Depends, HTTPException, Response
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
-from app.core.database import get_db
-from app.core.security import verify_password, get_password_hash, create_access_token
+from typing import Optional
+from uuid import UUID
+from app.core.auth_cache import auth_cache
+from app.core.database import get_async_db
+from app.core.security import verify_password, get_password_hash, create_access_token, decode_access_token
 from app.core.config import settings
 from app.core.deps import require_user
 from app.models.user import User
@@ -14,21 +19,20 @@ router = APIRouter(prefix="/auth", tags=["auth"])
 async def register(
     request: RegisterRequest,
     response: Response,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Check if user exists
-    existing = db.query(User).filter(User.email == request.email).first()
+    existing = await db.scalar(select(User).where(User.email == request.email))
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    # Create user
+    # Create user (bcrypt is deliberately slow, keep it off the event loop)
     user = User(
         email=request.email,
-        password_hash=get_password_hash(request.password)
+        password_hash=await run_in_threadpool(get_password_hash, request.password)
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
     
     # Create token
     access_token = create_access_token(
@@ -51,10 +55,10 @@ async def register(
 async def login(
     request: LoginRequest,
     response: Response,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = db.query(User).filter(User.email == request.email).first()
-    if not user or not verify_password(request.password, user.password_hash):
+    user = await db.scalar(select(User).where(User.email == request.email))
+    if not user or not await run_in_threadpool(verify_password, request.password, user.password_hash):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     # Create token
@@ -75,7 +79,16 @@ async def login(
     return user
 
 @router.post("/logout")
-async def logout(response: Response):
+async def logout(response: Response, access_token: Optional[str] = Cookie(None)):
+    if access_token:
+        # Drop what this process cached for the token and its user
+        payload = auth_cache.get_payload(access_token) or decode_access_token(access_token)
+        auth_cache.invalidate_token(access_token)
+        try:
+            auth_cache.invalidate_user(UUID(payload["sub"]))
+        except (TypeError, KeyError, ValueError):
+            pass
+    
     response.delete_cookie(key="access_token")
     return {"message": "Logged out"}
 
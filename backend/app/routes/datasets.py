@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from sqlalchemy import func
 from typing import List
 from uuid import UUID
 from app.core.database import get_db
@@ -7,10 +8,13 @@ from app.core.deps import require_user
 from app.models.user import User
 from app.models.dataset import Dataset
 from app.schemas.datasets import DatasetCreate, DatasetResponse
-from fastapi.responses import JSONResponse
 from app.models.image import Image
-from app.models.annotation import Annotation
-from app.schemas.datasets import DatasetCreate, DatasetResponse
+from app.models.jobs import Job, JobStatus, JobType
+from app.schemas.datasets import ExportRequest, ExportJobResponse
+from fastapi.responses import StreamingResponse
+from app.services.export import export_service, run_export_job
+from app.services.executor import job_executor, JobSubmitError
+from app.services.storage import content_store
 
 
 router = APIRouter(prefix="/datasets", tags=["datasets"])
@@ -73,10 +77,23 @@ async def delete_dataset(
     if not dataset:
         raise HTTPException(status_code=404, detail="Dataset not found")
     
+    # Drop this dataset's references to stored files
+    hash_counts = {
+        row.content_hash: row.count for row in
+        db.query(Image.content_hash, func.count(Image.id).label("count")).filter(
+            Image.dataset_id == dataset_id,
+            Image.content_hash.isnot(None)
+        ).group_by(Image.content_hash).all()
+    }
+    unreferenced = content_store.release_refs(db, hash_counts)
+    
     # SQLAlchemy cascade will delete images and annotations
     db.delete(dataset)
     db.commit()
     
+    # Only remove files once nothing in the DB points at them
+    content_store.remove_files(db, unreferenced)
+    
     return {"message": "Dataset deleted successfully"}
 
 
@@ -96,46 +113,59 @@ async def export_dataset(
     if not dataset:
         raise HTTPException(status_code=404, detail="Dataset not found")
     
-    images = db.query(Image).filter(Image.dataset_id == dataset_id).all()
-    
-    export_data = {
-        "dataset": {
-            "id": str(dataset.id),
-            "name": dataset.name,
-            "description": dataset.description,
-            "created_at": dataset.created_at.isoformat()
-        },
-        "images": [],
-        "annotations": []
+    dataset_info = {
+        "id": str(dataset.id),
+        "name": dataset.name,
+        "description": dataset.description,
+        "created_at": dataset.created_at.isoformat()
     }
     
-    for img in images:
-        export_data["images"].append({
-            "id": str(img.id),
-            "filename": img.filename,
-            "width": img.width,
-            "height": img.height
-        })
-        
-        annotations = db.query(Annotation).filter(Annotation.image_id == img.id).all()
-        
-        for ann in annotations:
-            export_data["annotations"].append({
-                "id": str(ann.id),
-                "image_id": str(ann.image_id),
-                "label": ann.label,
-                "x": ann.x,
-                "y": ann.y,
-                "w": ann.w,
-                "h": ann.h,
-                "source": ann.source,
-                "confidence": ann.confidence
-            })
-    
-    return JSONResponse(
-        content=export_data,
+    return StreamingResponse(
+        export_service.stream_json(dataset.id, dataset_info),
         media_type="application/json",
         headers={
             "Content-Disposition": f"attachment; filename={dataset.name}_export.json"
         }
-    )
\ No newline at end of file
+    )
+
+@router.post("/{dataset_id}/exports", response_model=ExportJobResponse)
+async def start_export(
+    dataset_id: UUID,
+    request: ExportRequest,
+    user: User = Depends(require_user),
+    db: Session = Depends(get_db)
+):
+    """Start a background export (COCO JSON, YOLO labels zip, or images + labels zip)."""
+    
+    dataset = db.query(Dataset).filter(
+        Dataset.id == dataset_id,
+        Dataset.owner_user_id == user.id
+    ).first()
+    
+    if not dataset:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    
+    if not job_executor.has_capacity():
+        raise HTTPException(status_code=503, detail="Too many jobs queued, try again later")
+    
+    job = Job(
+        dataset_id=dataset_id,
+        type=JobType.EXPORT,
+        status=JobStatus.QUEUED,
+        total=dataset.image_count,
+        params_json={"format": request.format}
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    
+    try:
+        job_executor.submit(run_export_job, job.id)
+    except JobSubmitError as e:
+        # Don't leave a queued job behind that nothing will run
+        job.status = JobStatus.FAILED
+        job.error = str(e)
+        db.commit()
+        raise HTTPException(status_code=503, detail="Too many jobs queued, try again later")
+    
+    return {"job_id": str(job.id)}
@@ -1,165 +1,255 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request, Response, Query
 from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, exists, tuple_
+from typing import List, Literal, Optional, Tuple, Union
+from datetime import datetime
 from uuid import UUID
 from pathlib import Path
-from PIL import Image as PILImage
+from collections import Counter
+import asyncio
+import base64
+import json
+import uuid
 
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.core.deps import require_user
 from app.models.user import User
 from app.models.dataset import Dataset
 from app.models.image import Image
-from app.models.annotation import Annotation
+from app.models.annotation import Annotation, AnnotationSource
 from app.schemas.images import ImageUploadResponse, ImageListItem
+from app.services.thumbnails import thumbnail_service, IMAGE_VARIANTS
+from app.services.ingest import ingest_service, IngestedFile
+from app.services.storage import content_store
+from app.services.counters import counter_service
 
 router = APIRouter(tags=["images"])
 
 # Allowed extensions
 ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
 
-# Use absolute path to project root
-STORAGE_BASE = Path(__file__).parent.parent.parent.parent / "data" / "images"
+# Page size list_images uses when none is given, and the largest it allows
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Image bytes are auth-protected but never change for a given id
+IMAGE_CACHE_CONTROL = "private, max-age=31536000, immutable"
 
 @router.post("/datasets/{dataset_id}/images", response_model=ImageUploadResponse)
 async def upload_images(
     dataset_id: UUID,
     files: List[UploadFile] = File(...),
     user: User = Depends(require_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Upload multiple images to a dataset."""
     
     # Verify dataset ownership
-    dataset = db.query(Dataset).filter(
+    dataset = await db.scalar(select(Dataset).where(
         Dataset.id == dataset_id,
         Dataset.owner_user_id == user.id
-    ).first()
+    ))
     
     if not dataset:
         raise HTTPException(status_code=404, detail="Dataset not found")
     
-    # Create storage directory
-    dataset_dir = STORAGE_BASE / str(dataset_id)
-    dataset_dir.mkdir(parents=True, exist_ok=True)
-    
-    image_ids = []
-    
+    # Validate every file before touching the disk
     for file in files:
-        # Validate extension
         file_ext = Path(file.filename).suffix.lower()
         if file_ext not in ALLOWED_EXTENSIONS:
             raise HTTPException(
                 status_code=400,
                 detail=f"Invalid file type: {file.filename}. Allowed: jpg, jpeg, png, webp"
             )
-        
-        # Create image record
-        image = Image(
+    
+    # Uploads are already spooled by the multipart parser; hash and stream
+    # each one into the content store on the ingest pool, all files in parallel
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(
+        *[
+            loop.run_in_executor(ingest_service.pool, ingest_service.ingest, file.file)
+            for file in files
+        ],
+        return_exceptions=True
+    )
+    
+    for file, result in zip(files, results):
+        if isinstance(result, BaseException):
+            # Clean up files this upload added to the store if any one failed
+            created = [
+                ingested.content_hash for ingested in results
+                if isinstance(ingested, IngestedFile) and ingested.created
+            ]
+            await db.run_sync(content_store.remove_files, created)
+            raise HTTPException(status_code=500, detail=f"Failed to process {file.filename}: {str(result)}")
+    
+    # Services are written against a sync Session; run_sync hands them ours
+    await db.run_sync(
+        content_store.add_refs,
+        sizes={ingested.content_hash: ingested.size for ingested in results},
+        counts=Counter(ingested.content_hash for ingested in results)
+    )
+    
+    # Ids are generated here so reading them back after commit needs no refresh
+    image_ids = [uuid.uuid4() for _ in files]
+    db.add_all([
+        Image(
+            id=image_id,
             dataset_id=dataset_id,
             filename=file.filename,
-            storage_uri="",  # Will update after saving
-            width=0,  # Will update after opening
-            height=0
+            storage_uri=str(ingested.path),
+            content_hash=ingested.content_hash,
+            width=ingested.width,
+            height=ingested.height
         )
-        db.add(image)
-        db.flush()  # Get the ID without committing
-        
-        # Save file with image_id prefix
-        file_path = dataset_dir / f"{image.id}_{file.filename}"
-        
-        try:
-            # Reset file pointer to beginning
-            await file.seek(0)
-            
-            # Save uploaded file
-            with file_path.open("wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
-            
-            # Extract dimensions
-            with PILImage.open(file_path) as img:
-                width, height = img.size
-            
-            # Update image record
-            image.storage_uri = str(file_path)
-            image.width = width
-            image.height = height
-            
-            image_ids.append(image.id)
-            
-        except Exception as e:
-            # Clean up file if processing failed
-            if file_path.exists():
-                file_path.unlink()
-            db.rollback()
-            raise HTTPException(status_code=500, detail=f"Failed to process {file.filename}: {str(e)}")
-    
-    db.commit()
+        for image_id, file, ingested in zip(image_ids, files, results)
+    ])
+    await db.run_sync(counter_service.images_added, dataset_id, len(image_ids))
+    await db.commit()
+    
+    # A concurrent delete or failed upload may have removed one of these files
+    # before our references committed; it is done now, so put back what's missing
+    await asyncio.gather(*[
+        loop.run_in_executor(ingest_service.pool, content_store.restore, ingested.content_hash, file.file)
+        for file, ingested in zip(files, results)
+    ])
     
     return ImageUploadResponse(
         created=len(image_ids),
         image_ids=image_ids
     )
 
-@router.get("/datasets/{dataset_id}/images", response_model=List[ImageListItem])
+@router.get(
+    "/datasets/{dataset_id}/images",
+    response_model=List[ImageListItem],
+    responses={200: {"headers": {"X-Next-Cursor": {
+        "description": "Cursor for the next page; absent on the last page",
+        "schema": {"type": "string"}
+    }}}}
+)
 async def list_images(
     dataset_id: UUID,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: Literal["created_at", "filename"] = "created_at",
+    order: Literal["asc", "desc"] = "asc",
+    reviewed: Optional[bool] = None,
+    has_annotations: Optional[bool] = None,
+    source: Optional[AnnotationSource] = None,
+    min_confidence: Optional[float] = Query(None, ge=0, le=1),
     user: User = Depends(require_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """List all images in a dataset with annotation counts."""
+    """List one page of a dataset's images with annotation counts.
+    
+    At most `limit` images (default 100, up to 1000) are returned. When more
+    match, the `X-Next-Cursor` response header holds the `cursor` to pass for
+    the next page; it is absent on the last page. Pages are keyset-based, so
+    every page costs the same however deep it is.
+    
+    `source` and `min_confidence` keep images with at least one annotation
+    matching both.
+    """
     
     # Verify dataset ownership
-    dataset = db.query(Dataset).filter(
+    dataset = await db.scalar(select(Dataset).where(
         Dataset.id == dataset_id,
         Dataset.owner_user_id == user.id
-    ).first()
+    ))
     
     if not dataset:
         raise HTTPException(status_code=404, detail="Dataset not found")
     
-    # Query images with annotation counts
-    images = db.query(
-        Image,
-        func.count(Annotation.id).label("annotation_count")
-    ).outerjoin(
-        Annotation, Annotation.image_id == Image.id
-    ).filter(
+    query = select(
+        Image.id,
+        Image.filename,
+        Image.width,
+        Image.height,
+        Image.reviewed_at,
+        Image.created_at,
+        Image.annotation_count
+    ).where(
         Image.dataset_id == dataset_id
-    ).group_by(
-        Image.id
-    ).all()
-    
-    # Format response
-    result = []
-    for image, count in images:
-        result.append(ImageListItem(
-            id=image.id,
-            filename=image.filename,
-            width=image.width,
-            height=image.height,
-            annotation_count=count,
-            reviewed_at=image.reviewed_at
-        ))
-    
-    return result
+    )
+    
+    if reviewed is not None:
+        query = query.where(
+            Image.reviewed_at.isnot(None) if reviewed else Image.reviewed_at.is_(None)
+        )
+    
+    if has_annotations is not None:
+        query = query.where(
+            Image.annotation_count > 0 if has_annotations else Image.annotation_count == 0
+        )
+    
+    if source is not None or min_confidence is not None:
+        matching = exists().where(Annotation.image_id == Image.id)
+        if source is not None:
+            matching = matching.where(Annotation.source == source)
+        if min_confidence is not None:
+            matching = matching.where(Annotation.confidence >= min_confidence)
+        query = query.where(matching)
+    
+    # Image.id breaks ties so the order (and every cursor) is total
+    sort_column = getattr(Image, sort)
+    if cursor is not None:
+        sort_value, last_id = _decode_cursor(cursor, sort)
+        keyset = tuple_(sort_column, Image.id)
+        after = (sort_value, last_id)
+        query = query.where(keyset > after if order == "asc" else keyset < after)
+    
+    if order == "asc":
+        query = query.order_by(sort_column.asc(), Image.id.asc())
+    else:
+        query = query.order_by(sort_column.desc(), Image.id.desc())
+    
+    # One extra row tells whether there is a next page
+    rows = (await db.execute(query.limit(limit + 1))).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(getattr(rows[-1], sort), rows[-1].id)
+    
+    return [
+        ImageListItem(
+            id=row.id,
+            filename=row.filename,
+            width=row.width,
+            height=row.height,
+            annotation_count=row.annotation_count,
+            reviewed_at=row.reviewed_at
+        )
+        for row in rows
+    ]
 
 @router.get("/images/{image_id}/file")
 async def get_image_file(
     image_id: UUID,
+    request: Request,
+    size: str = "original",
     user: User = Depends(require_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Stream image file bytes."""
+    """Stream image file bytes.
+    
+    `size` is "original", "thumb" (256px) or "preview" (1024px); resized
+    variants are WebP and generated on first request. All variants support
+    conditional GET (ETag) and Range requests, and can be cached by the browser.
+    """
+    
+    if size != "original" and size not in IMAGE_VARIANTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid size: {size}. Allowed: original, {', '.join(IMAGE_VARIANTS)}"
+        )
     
     # Get image and verify access through dataset ownership
-    image = db.query(Image).join(Dataset).filter(
+    image = await db.scalar(select(Image).join(Dataset).where(
         Image.id == image_id,
         Dataset.owner_user_id == user.id
-    ).first()
+    ))
     
     if not image:
         raise HTTPException(status_code=404, detail="Image not found")
@@ -169,22 +259,77 @@ async def get_image_file(
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="Image file not found on disk")
     
-    # Determine media type
-    ext = file_path.suffix.lower()
-    media_types = {
-        ".jpg": "image/jpeg",
-        ".jpeg": "image/jpeg",
-        ".png": "image/png",
-        ".webp": "image/webp"
+    if size == "original":
+        # Determine media type (stored files are named by hash, so use the upload name)
+        ext = Path(image.filename).suffix.lower()
+        media_types = {
+            ".jpg": "image/jpeg",
+            ".jpeg": "image/jpeg",
+            ".png": "image/png",
+            ".webp": "image/webp"
+        }
+        media_type = media_types.get(ext, "application/octet-stream")
+        filename = image.filename
+    else:
+        file_path = await run_in_threadpool(
+            thumbnail_service.get_variant, image.content_hash or image.id, file_path, size
+        )
+        media_type = "image/webp"
+        filename = f"{Path(image.filename).stem}_{size}.webp"
+    
+    stat = file_path.stat()
+    if image.content_hash:
+        # Content-addressed: the hash identifies the bytes of every variant
+        etag = f'"{image.content_hash}-{size}"'
+    else:
+        # Legacy files never change in place, so size + mtime identify the bytes
+        etag = f'"{image.id.hex}-{size}-{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMAGE_CACHE_CONTROL,
+        "Access-Control-Allow-Origin": "http://localhost:3000",
+        "Access-Control-Allow-Credentials": "true",
     }
-    media_type = media_types.get(ext, "application/octet-stream")
+    
+    if_none_match = _parse_etags(request.headers.get("if-none-match"))
+    if etag in if_none_match or "*" in if_none_match:
+        return Response(status_code=304, headers=headers)
     
     return FileResponse(
         path=file_path,
         media_type=media_type,
-        filename=image.filename,
-        headers={
-            "Access-Control-Allow-Origin": "http://localhost:3000",
-            "Access-Control-Allow-Credentials": "true",
-        }
-    )
\ No newline at end of file
+        filename=filename,
+        stat_result=stat,
+        headers=headers
+    )
+
+def _encode_cursor(sort_value: Union[datetime, str], image_id: UUID) -> str:
+    """Opaque page cursor: the sort key of the last image on the page."""
+    
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    payload = json.dumps([sort_value, str(image_id)]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def _decode_cursor(cursor: str, sort: str) -> Tuple[Union[datetime, str], UUID]:
+    """Sort key stored in a cursor made by `_encode_cursor`."""
+    
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, image_id = json.loads(payload)
+        if sort == "created_at":
+            sort_value = datetime.fromisoformat(sort_value)
+        elif not isinstance(sort_value, str):
+            raise ValueError(sort_value)
+        return sort_value, UUID(image_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _parse_etags(header: Optional[str]) -> List[str]:
+    """Entity tags listed in an If-None-Match header."""
+    
+    if not header:
+        return []
+    if header.strip() == "*":
+        return ["*"]
+    return [tag.strip().removeprefix("W/") for tag in header.split(",")]
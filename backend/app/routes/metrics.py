@@ -0,0 +1,64 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+import secrets
+
+from app.core.config import settings
+from app.core.database import async_engine, engine, get_async_db
+from app.core.metrics import metrics, jobs, resident_models
+from app.core.query_stats import pool_status
+from app.models.jobs import Job, JobStatus, JobType
+
+router = APIRouter(tags=["metrics"])
+
+# Prometheus text exposition format
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LOOPBACK_HOSTS = {"127.0.0.1", "::1"}
+
+def require_metrics_access(request: Request):
+    """Metrics name jobs, models and pool internals, so only scrapers may read them.
+    
+    With METRICS_TOKEN set, the request must carry it as a bearer token;
+    otherwise only clients on this host are let through.
+    """
+    if settings.METRICS_TOKEN:
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+            raise HTTPException(status_code=401, detail="Not authenticated")
+    elif request.client is None or request.client.host not in LOOPBACK_HOSTS:
+        raise HTTPException(status_code=403, detail="Metrics are only served to localhost")
+
+@router.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_metrics_access)])
+async def get_metrics(db: AsyncSession = Depends(get_async_db)):
+    """Prometheus metrics for this API process and its job workers."""
+    
+    # Job counts come from the DB so every API process reports the same totals
+    rows = (await db.execute(
+        select(Job.type, Job.status, func.count(Job.id)).where(
+            Job.status.in_([JobStatus.QUEUED, JobStatus.RUNNING])
+        ).group_by(Job.type, Job.status)
+    )).all()
+    counts = {
+        (job_type.value, status.value): 0
+        for job_type in JobType
+        for status in (JobStatus.QUEUED, JobStatus.RUNNING)
+    }
+    counts.update({(job_type.value, status.value): count for job_type, status, count in rows})
+    jobs.replace_all(counts)
+    
+    return PlainTextResponse(metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+@router.get("/health/details", dependencies=[Depends(require_metrics_access)])
+async def health_details():
+    """Connection pool usage and the models loaded by this process and its job workers."""
+    
+    return {
+        "status": "ok",
+        "db_pool": {
+            "sync": pool_status(engine),
+            "async": pool_status(async_engine.sync_engine),
+        },
+        "models": resident_models()
+    }
@@ -1,51 +1,76 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from uuid import UUID
+from pathlib import Path
+from typing import Literal, Optional
 from pydantic import BaseModel
 
-from app.core.deps import get_db, require_user
+from app.core.deps import get_db, get_async_db, require_user
 from app.models.user import User
 from app.models.dataset import Dataset
 from app.models.image import Image
 from app.models.jobs import Job, JobStatus, JobType
-from app.models.annotation import Annotation
-from app.services.inference import yolo_service
-from app.services.agent import agent_service
-from datetime import datetime, UTC
-from pathlib import Path
-import random
+from app.models.prediction import Prediction
+from app.services.inference import BoxColumns
+from app.services.annotation_writer import annotation_writer
+from app.services.executor import job_executor, JobSubmitError
+from app.services.export import EXPORT_FORMATS
+from app.services.prelabel import run_prelabel_job, apply_plan
 
 router = APIRouter()
 
 class PrelabelRequest(BaseModel):
     goal: str = "balanced"  # fast | balanced | quality
     instructions: str = ""
+    # Inference runtime; defaults to Settings.INFERENCE_BACKEND
+    backend: Optional[Literal["torch", "onnx", "openvino"]] = None
+    # Run the model even on images with stored predictions
+    force_inference: bool = False
 
 class JobResponse(BaseModel):
     job_id: str
 
+class RethresholdRequest(BaseModel):
+    model: str = "yolov8s.pt"
+    imgsz: int = 640
+    conf: float = 0.25
+    iou: float = 0.45
+    max_det: int = 150
+    min_box_area: int = 150
+
+class RethresholdResponse(BaseModel):
+    images_updated: int
+    annotations_created: int
+
+# Images re-thresholded per transaction
+RETHRESHOLD_CHUNK_SIZE = 1000
+
 @router.post("/datasets/{dataset_id}/prelabel", response_model=JobResponse)
 async def start_prelabel(
     dataset_id: UUID,
     request: PrelabelRequest,
     agent_mode: bool = False,
-    background_tasks: BackgroundTasks = BackgroundTasks(),
     user: User = Depends(require_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Start auto-labeling job."""
     
     # Verify dataset ownership
-    dataset = db.query(Dataset).filter(
+    dataset = await db.scalar(select(Dataset).where(
         Dataset.id == dataset_id,
         Dataset.owner_user_id == user.id
-    ).first()
+    ))
     
     if not dataset:
         raise HTTPException(status_code=404, detail="Dataset not found")
     
-    # Count images
-    image_count = db.query(Image).filter(Image.dataset_id == dataset_id).count()
+    if not job_executor.has_capacity():
+        raise HTTPException(status_code=503, detail="Too many jobs queued, try again later")
+    
+    image_count = dataset.image_count
     
     if image_count == 0:
         raise HTTPException(status_code=400, detail="No images to label")
@@ -56,151 +81,115 @@ async def start_prelabel(
         type=JobType.PRELABEL,
         status=JobStatus.QUEUED,
         total=image_count,
-        agent_mode=agent_mode
+        agent_mode=agent_mode,
+        params_json={
+            "goal": request.goal,
+            "instructions": request.instructions,
+            "backend": request.backend,
+            "force_inference": request.force_inference
+        }
     )
     
     db.add(job)
-    db.commit()
-    db.refresh(job)
-    
-    # Run in background
-    background_tasks.add_task(
-        run_prelabel_job,
-        job.id,
-        dataset_id,
-        request.goal,
-        request.instructions,
-        agent_mode
-    )
+    await db.commit()
+    
+    # Hand off to the worker pool
+    try:
+        job_executor.submit(run_prelabel_job, job.id)
+    except JobSubmitError as e:
+        # Don't leave a queued job behind that nothing will run
+        job.status = JobStatus.FAILED
+        job.error = str(e)
+        await db.commit()
+        raise HTTPException(status_code=503, detail="Too many jobs queued, try again later")
     
     return {"job_id": str(job.id)}
 
-def run_prelabel_job(
-    job_id: UUID,
+@router.post("/datasets/{dataset_id}/rethreshold", response_model=RethresholdResponse)
+def rethreshold_dataset(
     dataset_id: UUID,
-    goal: str,
-    instructions: str,
-    agent_mode: bool
+    request: RethresholdRequest,
+    user: User = Depends(require_user),
+    db: Session = Depends(get_db)
 ):
-    """Execute prelabel job (runs in background)."""
+    """Rebuild YOLO annotations from stored predictions with new thresholds.
     
-    from app.core.database import SessionLocal
-    db = SessionLocal()
+    No inference is run. Images without stored predictions for this
+    model/imgsz keep their current annotations. Declared sync so the NumPy
+    work runs in the threadpool instead of on the event loop.
+    """
     
-    try:
-        job = db.query(Job).filter(Job.id == job_id).first()
-        job.status = JobStatus.RUNNING
-        db.commit()
-        
-        # Get all images
-        images = db.query(Image).filter(Image.dataset_id == dataset_id).all()
-        
-        if agent_mode:
-            # Agent mode: Plan → Sample → Evaluate → Refine → Full run
-            
-            # 1. Create initial plan
-            plan_v0 = agent_service.create_initial_plan(goal, instructions)
-            job.plan_v0_json = plan_v0
-            db.commit()
-            
-            # 2. Sample run
-            sample_size = min(20, len(images))
-            sample_images = random.sample(images, sample_size)
-            
-            sample_results = []
-            for img in sample_images:
-                boxes = yolo_service.predict_image(
-                    Path(img.storage_uri),
-                    model_name=plan_v0["model"],
-                    imgsz=plan_v0["imgsz"],
-                    conf=plan_v0["conf"],
-                    iou=plan_v0["iou"],
-                    max_det=plan_v0["max_det"],
-                    min_box_area=plan_v0["postprocess"]["min_box_area"]
-                )
-                sample_results.append(boxes)
-            
-            # 3. Evaluate
-            metrics = agent_service.compute_sample_metrics(sample_results)
-            job.sample_metrics_json = metrics
-            db.commit()
-            
-            # 4. Refine
-            plan_v1 = agent_service.refine_plan(plan_v0, metrics)
-            job.plan_v1_json = plan_v1
-            db.commit()
-            
-            # 5. Full run with refined plan
-            final_plan = plan_v1
-        else:
-            # Direct mode: just use initial plan
-            final_plan = agent_service.create_initial_plan(goal, instructions)
+    # Verify dataset ownership
+    dataset = db.query(Dataset).filter(
+        Dataset.id == dataset_id,
+        Dataset.owner_user_id == user.id
+    ).first()
+    
+    if not dataset:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    
+    plan = {
+        "conf": request.conf,
+        "iou": request.iou,
+        "max_det": request.max_det,
+        "postprocess": {"min_box_area": request.min_box_area},
+    }
+    
+    images_updated = 0
+    annotations_created = 0
+    last_image_id = None
+    
+    # Page through predictions by image id so each chunk is its own transaction
+    while True:
+        query = db.query(Prediction.image_id, Prediction.boxes).join(Image).filter(
+            Image.dataset_id == dataset_id,
+            Prediction.model_name == request.model,
+            Prediction.imgsz == request.imgsz
+        )
+        if last_image_id is not None:
+            query = query.filter(Prediction.image_id > last_image_id)
+        rows = query.order_by(Prediction.image_id).limit(RETHRESHOLD_CHUNK_SIZE).all()
         
-        # Run on all images
-        for idx, img in enumerate(images):
-            boxes = yolo_service.predict_image(
-                Path(img.storage_uri),
-                model_name=final_plan["model"],
-                imgsz=final_plan["imgsz"],
-                conf=final_plan["conf"],
-                iou=final_plan["iou"],
-                max_det=final_plan["max_det"],
-                min_box_area=final_plan["postprocess"]["min_box_area"]
-            )
-            
-            # Delete existing YOLO annotations
-            db.query(Annotation).filter(
-                Annotation.image_id == img.id,
-                Annotation.source == "yolo"
-            ).delete()
-            
-            # Create new annotations
-            for box in boxes:
-                annotation = Annotation(
-                    image_id=img.id,
-                    label=box["label"],
-                    x=box["x"],
-                    y=box["y"],
-                    w=box["w"],
-                    h=box["h"],
-                    source="yolo",
-                    confidence=box["confidence"]
-                )
-                db.add(annotation)
-            
-            job.processed = idx + 1
-            db.commit()
+        if not rows:
+            break
         
-        job.status = JobStatus.COMPLETE
-        job.finished_at = datetime.now(UTC)
+        image_ids = [row.image_id for row in rows]
+        annotations_created += annotation_writer.replace_yolo_annotations(
+            db,
+            dataset_id,
+            [
+                (row.image_id, apply_plan(BoxColumns.from_bytes(row.boxes), plan).to_dicts())
+                for row in rows
+            ]
+        )
         db.commit()
         
-    except Exception as e:
-        job.status = JobStatus.FAILED
-        job.error = str(e)
-        db.commit()
-        raise
-    finally:
-        db.close()
+        images_updated += len(rows)
+        last_image_id = image_ids[-1]
+    
+    return RethresholdResponse(
+        images_updated=images_updated,
+        annotations_created=annotations_created
+    )
 
 @router.get("/jobs/{job_id}")
 async def get_job_status(
     job_id: UUID,
     user: User = Depends(require_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get job status and progress."""
     
-    job = db.query(Job).filter(Job.id == job_id).first()
+    job = await db.scalar(select(Job).where(Job.id == job_id))
     
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
     # Verify ownership through dataset
-    dataset = db.query(Dataset).filter(
+    dataset = await db.scalar(select(Dataset).where(
         Dataset.id == job.dataset_id,
         Dataset.owner_user_id == user.id
-    ).first()
+    ))
     
     if not dataset:
         raise HTTPException(status_code=404, detail="Job not found")
@@ -216,6 +205,51 @@ async def get_job_status(
         "plan_v0": job.plan_v0_json,
         "sample_metrics": job.sample_metrics_json,
         "plan_v1": job.plan_v1_json,
+        "attempts": job.attempts,
         "created_at": job.created_at.isoformat(),
-        "finished_at": job.finished_at.isoformat() if job.finished_at else None
-    }
\ No newline at end of file
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "heartbeat_at": job.heartbeat_at.isoformat() if job.heartbeat_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "artifact_url": f"/jobs/{job.id}/artifact" if job.artifact_uri else None
+    }
+
+@router.get("/jobs/{job_id}/artifact")
+async def download_job_artifact(
+    job_id: UUID,
+    user: User = Depends(require_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Download the file produced by a finished export job."""
+    
+    row = (await db.execute(
+        select(Job, Dataset.name).join(
+            Dataset, Dataset.id == Job.dataset_id
+        ).where(
+            Job.id == job_id,
+            Dataset.owner_user_id == user.id
+        )
+    )).first()
+    
+    if not row:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    job, dataset_name = row
+    
+    if job.status != JobStatus.COMPLETE or job.type != JobType.EXPORT:
+        raise HTTPException(status_code=409, detail="Job has no artifact yet")
+    if not job.artifact_uri:
+        # Deleted after EXPORT_RETENTION_HOURS
+        raise HTTPException(status_code=410, detail="Export artifact expired, start a new export")
+    
+    artifact_path = Path(job.artifact_uri)
+    if not artifact_path.exists():
+        raise HTTPException(status_code=404, detail="Artifact file not found on disk")
+    
+    export_format = job.params_json["format"]
+    suffix, media_type = EXPORT_FORMATS[export_format]
+    
+    return FileResponse(
+        path=artifact_path,
+        media_type=media_type,
+        filename=f"{dataset_name}_{export_format}{suffix}"
+    )
\ No newline at end of file
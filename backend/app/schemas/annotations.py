@@ -23,4 +23,20 @@ class AnnotationInput(BaseModel):
     h: float
 
 class AnnotationBatchUpdate(BaseModel):
-    annotations: list[AnnotationInput]
\ No newline at end of file
+    annotations: list[AnnotationInput]
+
+class AnnotationUpdate(AnnotationInput):
+    id: UUID
+
+class AnnotationPatch(BaseModel):
+    version: int  # annotation_version the edit is based on
+    create: list[AnnotationInput] = []
+    update: list[AnnotationUpdate] = []
+    delete: list[UUID] = []
+
+class AnnotationPatchResponse(BaseModel):
+    image_id: UUID
+    version: int
+    created: list[AnnotationItem]
+    updated: list[AnnotationItem]
+    deleted: int
\ No newline at end of file
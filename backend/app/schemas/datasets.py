@@ -1,7 +1,7 @@
 from pydantic import BaseModel
 from datetime import datetime
 from uuid import UUID
-from typing import Optional
+from typing import Literal, Optional
 
 class DatasetCreate(BaseModel):
     name: str
@@ -13,6 +13,16 @@ class DatasetResponse(BaseModel):
     name: str
     description: Optional[str]
     created_at: datetime
+    image_count: int = 0
+    annotation_count: int = 0
+    reviewed_count: int = 0
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class ExportRequest(BaseModel):
+    # COCO JSON, YOLO labels zip, or images + labels zip
+    format: Literal["coco", "yolo", "zip"] = "coco"
+
+class ExportJobResponse(BaseModel):
+    job_id: str
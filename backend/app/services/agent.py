@@ -1,10 +1,30 @@
-from typing import Dict, Any, List
-import statistics
+from typing import Dict, Any, List, Optional, Sequence, Union
+import numpy as np
+
+from app.core.config import settings
+from app.services.inference import BoxColumns, box_iou_matrix
+
+# Sample metric thresholds: boxes smaller than this (px²) are "tiny", pairs
+# overlapping more than this are likely duplicates
+TINY_BOX_AREA = 100
+OVERLAP_IOU = 0.8
+
+# One image's boxes, as predict_batch dicts or columns
+SampleBoxes = Union[List[Dict[str, Any]], BoxColumns]
 
 class AgentService:
     
-    def create_initial_plan(self, goal: str = "balanced", instructions: str = "") -> Dict[str, Any]:
-        """Create plan_v0 based on goal and instructions."""
+    def create_initial_plan(
+        self,
+        goal: str = "balanced",
+        instructions: str = "",
+        backend: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Create plan_v0 based on goal and instructions.
+        
+        `backend` picks the inference runtime (torch, onnx or openvino) and
+        defaults to Settings.INFERENCE_BACKEND.
+        """
         
         # Base plans for yolo configuration
         plans = {
@@ -38,6 +58,12 @@ class AgentService:
         }
         
         plan = plans.get(goal, plans["balanced"]).copy()
+        plan["backend"] = backend or settings.INFERENCE_BACKEND
+        plan["tiling"] = {
+            "min_side": settings.TILING_MIN_SIDE,
+            "tile_size": settings.TILE_SIZE or plan["imgsz"],
+            "overlap": settings.TILE_OVERLAP,
+        }
         
         # Adjust based on instructions
         instructions_lower = instructions.lower()
@@ -50,44 +76,37 @@ class AgentService:
         
         return plan
     
-    def compute_sample_metrics(self, sample_results: List[List[Dict]]) -> Dict[str, Any]:
-        """Compute metrics from sample run results."""
+    def compute_sample_metrics(self, sample_results: Sequence[SampleBoxes]) -> Dict[str, Any]:
+        """Compute metrics from sample run results.
+        
+        Each image's boxes can be the dicts predict_batch returns or BoxColumns.
+        """
+        
+        images = [
+            boxes if isinstance(boxes, BoxColumns) else _dicts_to_columns(boxes)
+            for boxes in sample_results
+        ]
+        det_counts = np.array([len(boxes) for boxes in images])
+        total_boxes = int(det_counts.sum())
         
-        all_det_counts = []
-        all_confidences = []
-        zero_det_count = 0
         overlap_count = 0
-        total_boxes = 0
-        tiny_box_count = 0
+        for boxes in images:
+            if len(boxes) > 1:
+                # Each pair once: the strict upper triangle of the IoU matrix
+                overlaps = np.triu(box_iou_matrix(boxes) > OVERLAP_IOU, k=1)
+                overlap_count += int(np.count_nonzero(overlaps))
         
-        for image_boxes in sample_results:
-            det_count = len(image_boxes)
-            all_det_counts.append(det_count)
-            
-            if det_count == 0:
-                zero_det_count += 1
-                continue
-            
-            # Check overlaps
-            for i, box1 in enumerate(image_boxes):
-                all_confidences.append(box1["confidence"])
-                
-                # Check if tiny
-                area = box1["w"] * box1["h"]
-                if area < 100:  # Threshold
-                    tiny_box_count += 1
-                
-                for box2 in image_boxes[i+1:]:
-                    iou = self._compute_iou(box1, box2)
-                    if iou > 0.8:
-                        overlap_count += 1
-                
-                total_boxes += 1
+        avg_confidence = 0
+        tiny_box_count = 0
+        if total_boxes:
+            all_boxes = BoxColumns.concat(images)
+            avg_confidence = float(np.mean(all_boxes.conf))
+            tiny_box_count = int(np.count_nonzero(all_boxes.w * all_boxes.h < TINY_BOX_AREA))
         
         return {
-            "avg_dets_per_image": statistics.mean(all_det_counts) if all_det_counts else 0,
-            "pct_zero_det_images": zero_det_count / len(sample_results) if sample_results else 0,
-            "avg_confidence": statistics.mean(all_confidences) if all_confidences else 0,
+            "avg_dets_per_image": float(np.mean(det_counts)) if images else 0,
+            "pct_zero_det_images": int(np.count_nonzero(det_counts == 0)) / len(images) if images else 0,
+            "avg_confidence": avg_confidence,
             "overlap_rate": overlap_count / max(1, total_boxes),
             "tiny_box_ratio": tiny_box_count / max(1, total_boxes),
         }
@@ -112,32 +131,15 @@ class AgentService:
             plan_v1["postprocess"]["min_box_area"] = int(current_area * 1.2)
         
         return plan_v1
-    
-    def _compute_iou(self, box1: Dict, box2: Dict) -> float:
-        """Compute IoU between two boxes."""
-        x1_min = box1["x"]
-        y1_min = box1["y"]
-        x1_max = box1["x"] + box1["w"]
-        y1_max = box1["y"] + box1["h"]
-        
-        x2_min = box2["x"]
-        y2_min = box2["y"]
-        x2_max = box2["x"] + box2["w"]
-        y2_max = box2["y"] + box2["h"]
-        
-        inter_x_min = max(x1_min, x2_min)
-        inter_y_min = max(y1_min, y2_min)
-        inter_x_max = min(x1_max, x2_max)
-        inter_y_max = min(y1_max, y2_max)
-        
-        if inter_x_max <= inter_x_min or inter_y_max <= inter_y_min:
-            return 0.0
-        
-        inter_area = (inter_x_max - inter_x_min) * (inter_y_max - inter_y_min)
-        box1_area = box1["w"] * box1["h"]
-        box2_area = box2["w"] * box2["h"]
-        union_area = box1_area + box2_area - inter_area
-        
-        return inter_area / union_area if union_area > 0 else 0.0
+
+def _dicts_to_columns(boxes: List[Dict[str, Any]]) -> BoxColumns:
+    if not boxes:
+        return BoxColumns.empty()
+    # float64, like the Python floats in the dicts
+    data = np.array(
+        [(box["x"], box["y"], box["w"], box["h"], box["confidence"]) for box in boxes],
+        dtype=np.float64
+    )
+    return BoxColumns(data[:, 0], data[:, 1], data[:, 2], data[:, 3], data[:, 4], np.zeros(len(data)))
 
 agent_service = AgentService()
\ No newline at end of file
@@ -0,0 +1,77 @@
+from sqlalchemy import insert, delete, update
+from sqlalchemy.orm import Session
+from typing import List, Dict, Any, Sequence, Tuple
+from uuid import UUID
+from datetime import datetime, UTC
+from collections import Counter
+import uuid
+
+from app.models.annotation import Annotation, AnnotationSource
+from app.models.image import Image
+from app.services.counters import counter_service
+
+class AnnotationWriter:
+    """Set-based annotation writes for prelabel jobs and re-thresholding."""
+    
+    def replace_yolo_annotations(
+        self,
+        db: Session,
+        dataset_id: UUID,
+        image_boxes: Sequence[Tuple[UUID, List[Dict[str, Any]]]],
+    ) -> int:
+        """Replace the YOLO annotations of a chunk of images in one dataset.
+        
+        Runs one DELETE for the whole chunk and one multi-row INSERT, without
+        creating ORM objects, and updates the annotation counters and
+        versions. Does not commit. Returns the number of inserted rows.
+        """
+        
+        if not image_boxes:
+            return 0
+        
+        image_ids = [image_id for image_id, _ in image_boxes]
+        
+        deleted = db.execute(
+            delete(Annotation).where(
+                Annotation.image_id.in_(image_ids),
+                Annotation.source == AnnotationSource.yolo
+            ).returning(Annotation.image_id).execution_options(synchronize_session=False)
+        ).scalars().all()
+        
+        now = datetime.now(UTC)
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "image_id": image_id,
+                "label": box["label"],
+                "x": box["x"],
+                "y": box["y"],
+                "w": box["w"],
+                "h": box["h"],
+                "source": AnnotationSource.yolo,
+                "confidence": box["confidence"],
+                "updated_at": now,
+            }
+            for image_id, boxes in image_boxes
+            for box in boxes
+        ]
+        
+        if rows:
+            # Core insert with a list of dicts uses executemany / insertmanyvalues
+            db.execute(insert(Annotation), rows)
+        
+        deltas = Counter(row["image_id"] for row in rows)
+        deltas.subtract(deleted)
+        counter_service.annotations_changed(db, dataset_id, deltas)
+        
+        # Open editors of these images must reload before saving
+        db.execute(
+            update(Image)
+            .where(Image.id.in_(image_ids))
+            .values(annotation_version=Image.annotation_version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        
+        return len(rows)
+
+annotation_writer = AnnotationWriter()
@@ -0,0 +1,59 @@
+from sqlalchemy import update, bindparam
+from sqlalchemy.orm import Session
+from typing import Mapping
+from uuid import UUID
+
+from app.models.dataset import Dataset
+from app.models.image import Image
+
+images_table = Image.__table__
+
+class CounterService:
+    """Keeps the denormalized image/dataset counters in step with writes.
+    
+    Every update is relative (`count = count + delta`) so concurrent writers
+    never lose each other's changes. Nothing here commits; call these in the
+    same transaction as the write they describe.
+    """
+    
+    def images_added(self, db: Session, dataset_id: UUID, count: int):
+        if count:
+            self._bump_dataset(db, dataset_id, image_count=count)
+    
+    def images_reviewed(self, db: Session, dataset_id: UUID, count: int):
+        if count:
+            self._bump_dataset(db, dataset_id, reviewed_count=count)
+    
+    def annotations_changed(self, db: Session, dataset_id: UUID, deltas: Mapping[UUID, int]):
+        """Apply per-image annotation count changes for images of one dataset."""
+        
+        params = [
+            {"image_id": image_id, "delta": delta}
+            for image_id, delta in deltas.items() if delta
+        ]
+        if not params:
+            return
+        
+        # One statement, executed for every changed image
+        db.execute(
+            update(images_table)
+            .where(images_table.c.id == bindparam("image_id"))
+            .values(annotation_count=images_table.c.annotation_count + bindparam("delta")),
+            params
+        )
+        self._bump_dataset(
+            db, dataset_id, annotation_count=sum(param["delta"] for param in params)
+        )
+    
+    def _bump_dataset(self, db: Session, dataset_id: UUID, **deltas: int):
+        db.execute(
+            update(Dataset)
+            .where(Dataset.id == dataset_id)
+            .values({
+                getattr(Dataset, name): getattr(Dataset, name) + delta
+                for name, delta in deltas.items()
+            })
+            .execution_options(synchronize_session=False)
+        )
+
+counter_service = CounterService()
@@ -0,0 +1,225 @@
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Optional
+from uuid import UUID
+import multiprocessing
+import logging
+import threading
+
+from app.core.config import settings
+from app.core.query_stats import track_queries, log_query_stats
+from app.core.metrics import metrics, executor_pending_jobs
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for each worker process to exit once the pool is shut down
+WORKER_EXIT_TIMEOUT = 5.0
+
+class JobSubmitError(RuntimeError):
+    """The job could not be queued: the queue is full or the pool is broken."""
+
+def _init_worker(metrics_queue):
+    """Warm up a worker process so its first job doesn't pay the model load."""
+    
+    logging.basicConfig(level=logging.INFO)
+    
+    # Samples recorded in this process are reported by the API process
+    metrics.forward_to(metrics_queue)
+    
+    # A failing initializer breaks the whole pool, so never let this raise
+    try:
+        # Imported here so the API process never loads YOLO weights itself
+        from app.services.inference import yolo_service
+        
+        yolo_service.preload(
+            settings.JOB_WORKER_PRELOAD_MODELS,
+            backend=settings.INFERENCE_BACKEND,
+            imgsz=settings.MODEL_WARMUP_IMGSZ
+        )
+    except Exception:
+        logger.exception("Failed to preload models in job worker")
+
+def _ready():
+    """No-op submitted at start so the pool spawns (and warms up) its workers."""
+
+def _run_job(fn: Callable[[UUID], None], job_id: UUID):
+    """Run one job in a worker with its lease kept alive, then log the DB queries it made."""
+    
+    from app.services.leases import job_lease_service
+    
+    with track_queries() as stats:
+        try:
+            with job_lease_service.heartbeat(job_id):
+                fn(job_id)
+        finally:
+            log_query_stats(f"Job {job_id}", stats, level=logging.INFO)
+
+class JobExecutor:
+    """Process pool for long-running jobs (prelabel, export).
+    
+    Jobs run in separate worker processes, each with its own warm YOLOService,
+    so they never compete with request handling in the API server. At most
+    JOB_WORKERS jobs run at once; submissions beyond JOB_QUEUE_LIMIT pending
+    jobs are refused. Jobs are tracked by id so the same job is never queued
+    twice by this process.
+    
+    A worker that dies (e.g. OOM-killed) breaks the whole pool and fails its
+    jobs; the broken pool is dropped and the next submit starts a new one.
+    The failed jobs are left to JobRecoveryMonitor.
+    """
+    
+    def __init__(self, max_workers: int, queue_limit: int):
+        self.max_workers = max_workers
+        self.queue_limit = queue_limit
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending: Dict[UUID, Future] = {}
+        self._lock = threading.Lock()
+        self._metrics_queue = None
+        metrics.add_collector(lambda: executor_pending_jobs.set(self.pending_count()))
+    
+    def start(self):
+        with self._lock:
+            self._start_pool()
+    
+    def _start_pool(self):
+        """Create the pool if there is none (caller holds the lock)."""
+        
+        if self._pool is not None:
+            return
+        
+        logger.info(f"Starting job executor with {self.max_workers} workers")
+        # spawn, not fork: workers must not inherit the API's DB connections
+        mp_context = multiprocessing.get_context("spawn")
+        if self._metrics_queue is None:
+            self._metrics_queue = mp_context.Queue()
+            metrics.start_receiver(self._metrics_queue)
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=mp_context,
+            initializer=_init_worker,
+            initargs=(self._metrics_queue,),
+        )
+        # Workers are otherwise spawned by the first jobs; start them
+        # now so they preload their models while the API starts serving
+        for _ in range(self.max_workers):
+            self._pool.submit(_ready)
+    
+    def _drop_broken_pool(self, pool: ProcessPoolExecutor):
+        """Forget `pool` if it is still the current one (caller holds the lock)."""
+        
+        if self._pool is pool:
+            logger.error("Job worker died; replacing the job executor's process pool")
+            self._pool = None
+            # Its workers are already gone or being terminated by the pool itself
+            pool.shutdown(wait=False, cancel_futures=True)
+    
+    def has_capacity(self) -> bool:
+        with self._lock:
+            return len(self._pending) < self.queue_limit
+    
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+    
+    def is_pending(self, job_id: UUID) -> bool:
+        with self._lock:
+            return job_id in self._pending
+    
+    def submit(self, fn: Callable[[UUID], None], job_id: UUID) -> Future:
+        """Queue `fn(job_id)` on the pool. `fn` must be a picklable top-level function."""
+        
+        with self._lock:
+            if job_id in self._pending:
+                return self._pending[job_id]
+            if len(self._pending) >= self.queue_limit:
+                raise JobSubmitError("Job queue is full")
+            # A pool can break between jobs; a fresh one gets one more try
+            for attempt in range(2):
+                self._start_pool()
+                pool = self._pool
+                try:
+                    future = pool.submit(_run_job, fn, job_id)
+                    break
+                except BrokenProcessPool as e:
+                    self._drop_broken_pool(pool)
+                    if attempt:
+                        raise JobSubmitError(f"Job executor unavailable: {e}") from e
+                except RuntimeError as e:
+                    # The pool is shutting down
+                    raise JobSubmitError(f"Job executor unavailable: {e}") from e
+            self._pending[job_id] = future
+        
+        future.add_done_callback(lambda done: self._on_done(job_id, pool, done))
+        return future
+    
+    def _on_done(self, job_id: UUID, pool: ProcessPoolExecutor, future: Future):
+        with self._lock:
+            if self._pending.get(job_id) is future:
+                del self._pending[job_id]
+            if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+                self._drop_broken_pool(pool)
+        
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"Job {job_id} failed in worker", exc_info=future.exception())
+    
+    def shutdown(self, timeout: Optional[float] = None):
+        """Cancel queued jobs, give running ones `timeout` seconds, then stop workers.
+        
+        Leases of jobs that had to be terminated are released so the next
+        process resumes them from their checkpoint right away.
+        """
+        
+        with self._lock:
+            pool, self._pool = self._pool, None
+            pending = dict(self._pending)
+        
+        if pool is None:
+            return
+        
+        # The pool's workers are the only child processes the API process starts
+        workers = multiprocessing.active_children()
+        
+        for future in pending.values():
+            future.cancel()
+        pool.shutdown(wait=False, cancel_futures=True)
+        
+        running = {
+            job_id: future for job_id, future in pending.items()
+            if not future.cancelled()
+        }
+        timeout = settings.JOB_SHUTDOWN_TIMEOUT if timeout is None else timeout
+        _, not_done = wait(running.values(), timeout=timeout)
+        
+        if not_done:
+            logger.warning(f"Terminating {len(not_done)} running job(s) at shutdown")
+            for process in workers:
+                process.terminate()
+            self._release_leases([
+                job_id for job_id, future in running.items() if future in not_done
+            ])
+        
+        for process in workers:
+            process.join(WORKER_EXIT_TIMEOUT)
+            if process.is_alive():
+                logger.warning(f"Job worker {process.pid} did not exit, killing it")
+                process.kill()
+        
+        metrics.stop_receiver(self._metrics_queue)
+        self._metrics_queue = None
+    
+    def _release_leases(self, job_ids):
+        from app.core.database import SessionLocal
+        from app.services.leases import job_lease_service
+        
+        db = SessionLocal()
+        try:
+            job_lease_service.release(db, job_ids)
+        except Exception:
+            logger.exception("Failed to release job leases at shutdown")
+        finally:
+            db.close()
+
+job_executor = JobExecutor(
+    max_workers=settings.JOB_WORKERS,
+    queue_limit=settings.JOB_QUEUE_LIMIT,
+)
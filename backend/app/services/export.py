@@ -0,0 +1,370 @@
+from sqlalchemy.orm import Session
+from typing import Any, Dict, Iterator, List, TextIO
+from uuid import UUID
+from contextlib import ExitStack
+from datetime import datetime, timedelta, UTC
+from itertools import groupby
+from pathlib import Path
+import json
+import logging
+import shutil
+import tempfile
+import zipfile
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import JobThroughput
+from app.models.image import Image
+from app.models.annotation import Annotation
+from app.models.jobs import Job, JobStatus, JobType
+from app.services.leases import job_lease_service, LeaseLostError
+
+logger = logging.getLogger(__name__)
+
+# Finished export artifacts, one file per job
+EXPORT_BASE = Path(__file__).parent.parent.parent.parent / "data" / "exports"
+
+# Artifact file extension and media type per export format
+EXPORT_FORMATS = {
+    "coco": (".json", "application/json"),
+    "yolo": (".zip", "application/zip"),
+    "zip": (".zip", "application/zip"),
+}
+
+# Rows fetched per round trip from the server-side cursors
+EXPORT_FETCH_SIZE = 2000
+# Serialized bytes buffered before each chunk is sent
+EXPORT_CHUNK_BYTES = 64 * 1024
+# Images written between job progress checkpoints
+EXPORT_PROGRESS_EVERY = 500
+
+class ExportService:
+    """Dataset exports that stream instead of being built in memory."""
+    
+    def stream_json(self, dataset_id: UUID, dataset_info: Dict[str, Any]) -> Iterator[bytes]:
+        """Yield the dataset export JSON in chunks.
+        
+        Output matches the old inline export:
+        {"dataset": {...}, "images": [...], "annotations": [...]}.
+        Images and annotations are each read with one server-side cursor, so
+        memory stays flat. The generator opens its own session because it
+        outlives the request's dependencies.
+        """
+        
+        yield f'{{"dataset": {json.dumps(dataset_info)}, "images": ['.encode()
+        
+        db = SessionLocal()
+        try:
+            images = db.query(
+                Image.id, Image.filename, Image.width, Image.height
+            ).filter(
+                Image.dataset_id == dataset_id
+            ).order_by(Image.id).yield_per(EXPORT_FETCH_SIZE)
+            
+            yield from self._json_array_items(
+                {
+                    "id": str(img.id),
+                    "filename": img.filename,
+                    "width": img.width,
+                    "height": img.height
+                }
+                for img in images
+            )
+            
+            yield b'], "annotations": ['
+            
+            annotations = db.query(
+                Annotation.id, Annotation.image_id, Annotation.label,
+                Annotation.x, Annotation.y, Annotation.w, Annotation.h,
+                Annotation.source, Annotation.confidence
+            ).join(
+                Image, Image.id == Annotation.image_id
+            ).filter(
+                Image.dataset_id == dataset_id
+            ).order_by(Annotation.image_id, Annotation.id).yield_per(EXPORT_FETCH_SIZE)
+            
+            yield from self._json_array_items(
+                {
+                    "id": str(ann.id),
+                    "image_id": str(ann.image_id),
+                    "label": ann.label,
+                    "x": ann.x,
+                    "y": ann.y,
+                    "w": ann.w,
+                    "h": ann.h,
+                    "source": ann.source.value,
+                    "confidence": ann.confidence
+                }
+                for ann in annotations
+            )
+        finally:
+            db.close()
+        
+        yield b']}'
+    
+    def _json_array_items(self, items: Iterator[Dict[str, Any]]) -> Iterator[bytes]:
+        """Serialize items as comma-separated JSON, buffered into chunks."""
+        
+        buffer: List[str] = []
+        size = 0
+        first = True
+        
+        for item in items:
+            encoded = json.dumps(item)
+            buffer.append(encoded if first else "," + encoded)
+            first = False
+            size += len(encoded) + 1
+            
+            if size >= EXPORT_CHUNK_BYTES:
+                yield "".join(buffer).encode()
+                buffer = []
+                size = 0
+        
+        if buffer:
+            yield "".join(buffer).encode()
+
+    def build_artifact(self, db: Session, job: Job) -> Path:
+        """Write the export file for `job` and return its path.
+        
+        A single cursor walks images left-joined to their annotations, ordered
+        by image, so every format is written in one streaming pass. COCO
+        images and annotations go to two part files that are joined at the end.
+        `db` is only used for checkpoints; the rows are read in a session of
+        their own.
+        """
+        
+        export_format = job.params_json["format"]
+        suffix, _ = EXPORT_FORMATS[export_format]
+        EXPORT_BASE.mkdir(parents=True, exist_ok=True)
+        final_path = EXPORT_BASE / f"{job.id}{suffix}"
+        part_path = EXPORT_BASE / f"{job.id}{suffix}.part"
+        
+        processed = 0
+        throughput = JobThroughput(job.id, job.type.value)
+        
+        with tempfile.TemporaryDirectory(dir=EXPORT_BASE) as tmp_dir, ExitStack() as stack:
+            stack.callback(throughput.close)
+            # Rows stream from their own session: checkpoints commit `db`, which
+            # would close a server-side cursor opened on it
+            read_db = stack.enter_context(SessionLocal())
+            
+            labels = [
+                row.label for row in
+                read_db.query(Annotation.label).join(
+                    Image, Image.id == Annotation.image_id
+                ).filter(
+                    Image.dataset_id == job.dataset_id
+                ).distinct().order_by(Annotation.label).all()
+            ]
+            class_ids = {label: idx for idx, label in enumerate(labels)}
+            
+            rows = read_db.query(
+                Image.id.label("image_id"), Image.filename, Image.width, Image.height,
+                Image.storage_uri, Annotation.id.label("annotation_id"), Annotation.label,
+                Annotation.x, Annotation.y, Annotation.w, Annotation.h, Annotation.confidence
+            ).outerjoin(
+                Annotation, Annotation.image_id == Image.id
+            ).filter(
+                Image.dataset_id == job.dataset_id
+            ).order_by(Image.id, Annotation.id).yield_per(EXPORT_FETCH_SIZE)
+            
+            coco_images = stack.enter_context(open(Path(tmp_dir) / "images.json", "w"))
+            coco_annotations = stack.enter_context(open(Path(tmp_dir) / "annotations.json", "w"))
+            archive = None
+            if suffix == ".zip":
+                archive = stack.enter_context(zipfile.ZipFile(part_path, "w", zipfile.ZIP_DEFLATED))
+            
+            ann_count = 0
+            # Rows are consecutive per image; images without annotations have one null row
+            for image_idx, (_, group) in enumerate(groupby(rows, key=lambda row: row.image_id), start=1):
+                group = list(group)
+                img = group[0]
+                anns = [row for row in group if row.annotation_id is not None]
+                export_name = f"{img.image_id}_{img.filename}"
+                
+                if export_format in ("coco", "zip"):
+                    ann_count = self._write_coco_image(
+                        coco_images, coco_annotations, image_idx, ann_count,
+                        export_name, img, anns, class_ids
+                    )
+                if archive is not None:
+                    archive.writestr(
+                        f"labels/{Path(export_name).stem}.txt",
+                        self._yolo_label_lines(img, anns, class_ids)
+                    )
+                if export_format == "zip":
+                    # Images are already compressed
+                    archive.write(img.storage_uri, f"images/{export_name}", compress_type=zipfile.ZIP_STORED)
+                
+                processed += 1
+                if processed % EXPORT_PROGRESS_EVERY == 0:
+                    job_lease_service.checkpoint(db, job, processed=processed)
+                    throughput.add(EXPORT_PROGRESS_EVERY)
+            
+            throughput.add(processed % EXPORT_PROGRESS_EVERY)
+            
+            coco_images.close()
+            coco_annotations.close()
+            
+            categories = [{"id": idx + 1, "name": label} for label, idx in class_ids.items()]
+            if export_format == "coco":
+                with open(part_path, "w") as out:
+                    self._write_coco_document(out, tmp_dir, categories)
+            else:
+                archive.writestr("classes.txt", "".join(f"{label}\n" for label in labels))
+                if export_format == "zip":
+                    coco_path = Path(tmp_dir) / "coco.json"
+                    with open(coco_path, "w") as out:
+                        self._write_coco_document(out, tmp_dir, categories)
+                    archive.write(coco_path, "annotations.json")
+        
+        part_path.replace(final_path)
+        job_lease_service.checkpoint(db, job, processed=processed)
+        return final_path
+    
+    def purge_expired(self, db: Session) -> int:
+        """Delete export artifacts older than EXPORT_RETENTION_HOURS; returns how many.
+        
+        Jobs lose their artifact_uri before the file goes. Files no job points
+        at (deleted datasets, interrupted builds) expire by modification time.
+        """
+        
+        cutoff = datetime.now(UTC) - timedelta(hours=settings.EXPORT_RETENTION_HOURS)
+        
+        expired = db.query(Job).filter(
+            Job.type == JobType.EXPORT,
+            Job.artifact_uri.isnot(None),
+            Job.finished_at < cutoff
+        ).all()
+        paths = [Path(job.artifact_uri) for job in expired]
+        for job in expired:
+            job.artifact_uri = None
+        db.commit()
+        
+        if EXPORT_BASE.exists():
+            paths.extend(
+                path for path in EXPORT_BASE.iterdir()
+                if path.stat().st_mtime < cutoff.timestamp()
+            )
+        
+        removed = 0
+        for path in set(paths):
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            elif path.exists():
+                path.unlink(missing_ok=True)
+            else:
+                continue
+            removed += 1
+        return removed
+    
+    def _write_coco_image(
+        self,
+        images_out: TextIO,
+        annotations_out: TextIO,
+        image_idx: int,
+        ann_count: int,
+        export_name: str,
+        img: Any,
+        anns: List[Any],
+        class_ids: Dict[str, int],
+    ) -> int:
+        """Append one image and its annotations to the COCO part files."""
+        
+        if image_idx > 1:
+            images_out.write(",")
+        images_out.write(json.dumps({
+            "id": image_idx,
+            "file_name": export_name,
+            "width": img.width,
+            "height": img.height
+        }))
+        
+        for ann in anns:
+            ann_count += 1
+            record = {
+                "id": ann_count,
+                "image_id": image_idx,
+                "category_id": class_ids[ann.label] + 1,
+                "bbox": [ann.x, ann.y, ann.w, ann.h],
+                "area": ann.w * ann.h,
+                "iscrowd": 0
+            }
+            if ann.confidence is not None:
+                record["score"] = ann.confidence
+            if ann_count > 1:
+                annotations_out.write(",")
+            annotations_out.write(json.dumps(record))
+        
+        return ann_count
+    
+    def _write_coco_document(self, out: TextIO, tmp_dir: str, categories: List[Dict[str, Any]]):
+        """Assemble the COCO JSON from the image/annotation part files."""
+        
+        out.write('{"info": ')
+        out.write(json.dumps({"description": "Orion export", "date_created": datetime.now(UTC).isoformat()}))
+        out.write(', "images": [')
+        with open(Path(tmp_dir) / "images.json") as part:
+            shutil.copyfileobj(part, out)
+        out.write('], "annotations": [')
+        with open(Path(tmp_dir) / "annotations.json") as part:
+            shutil.copyfileobj(part, out)
+        out.write('], "categories": ')
+        out.write(json.dumps(categories))
+        out.write('}')
+    
+    def _yolo_label_lines(self, img: Any, anns: List[Any], class_ids: Dict[str, int]) -> str:
+        """YOLO txt labels: `class cx cy w h`, normalized to the image size."""
+        
+        lines = []
+        for ann in anns:
+            cx = (ann.x + ann.w / 2) / img.width
+            cy = (ann.y + ann.h / 2) / img.height
+            lines.append(
+                f"{class_ids[ann.label]} {cx:.6f} {cy:.6f} "
+                f"{ann.w / img.width:.6f} {ann.h / img.height:.6f}\n"
+            )
+        return "".join(lines)
+
+export_service = ExportService()
+
+def run_export_job(job_id: UUID):
+    """Execute export job (runs in a job executor worker process).
+    
+    Exports are not checkpointed mid-way: a resumed job rebuilds its artifact.
+    """
+    
+    db = SessionLocal()
+    job = None
+    
+    try:
+        job = job_lease_service.claim(db, job_id)
+        if job is None:
+            logger.info(f"Export job {job_id} is owned by another worker, skipping")
+            return
+        
+        job_lease_service.checkpoint(db, job, processed=0)
+        artifact_path = export_service.build_artifact(db, job)
+        
+        job_lease_service.checkpoint(
+            db, job,
+            status=JobStatus.COMPLETE,
+            artifact_uri=str(artifact_path),
+            finished_at=datetime.now(UTC),
+            lease_owner=None,
+            lease_expires_at=None
+        )
+        
+    except LeaseLostError:
+        logger.warning(f"Export job {job_id} was taken over by another worker")
+    except Exception as e:
+        db.rollback()
+        if job is not None:
+            job.status = JobStatus.FAILED
+            job.error = str(e)
+            job.lease_owner = None
+            job.lease_expires_at = None
+            db.commit()
+        raise
+    finally:
+        db.close()
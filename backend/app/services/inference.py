@@ -1,35 +1,372 @@
-from ultralytics import YOLO
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, NamedTuple, Optional, Sequence, Tuple, Union
+from dataclasses import dataclass
+from PIL import Image as PILImage, ImageOps
+import numpy as np
+import hashlib
 import logging
+import math
 import os
 
+from app.core.config import settings
+from app.core.metrics import predict_seconds, predicted_images
+from app.services.model_export import backend_available, export_model
+from app.services.model_manager import ModelManager
+
 logger = logging.getLogger(__name__)
 
+# Above this many boxes nms compares row by row instead of building the IoU matrix
+NMS_MATRIX_MAX_BOXES = 2000
+
+# Rectangular input sides are multiples of this (YOLO's largest stride)
+RECT_BUCKET_STEP = 32
+
+# (tile_size, overlap) of a tiled prediction
+Tiling = Tuple[int, float]
+# Boxes this close to a tile edge that cuts through the image are partial
+# objects, merged with what overlapping tiles saw of the same object
+TILE_EDGE_MARGIN = 2
+# A cut box is the same object as a box from an overlapping tile when, clipped
+# to the area both tiles saw, they overlap by more than this IoU
+TILE_MERGE_IOU = 0.5
+
+@dataclass
+class BoxColumns:
+    """Predicted boxes for one image as parallel arrays (xywh, pixels)."""
+    
+    x: np.ndarray
+    y: np.ndarray
+    w: np.ndarray
+    h: np.ndarray
+    conf: np.ndarray
+    cls: np.ndarray
+    
+    @classmethod
+    def empty(cls) -> "BoxColumns":
+        zeros = np.zeros(0, dtype=np.float32)
+        return cls(zeros, zeros, zeros, zeros, zeros, zeros)
+    
+    @classmethod
+    def from_xyxy(cls, xyxy: np.ndarray, conf: np.ndarray, classes: np.ndarray) -> "BoxColumns":
+        xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        return cls(
+            x=xyxy[:, 0],
+            y=xyxy[:, 1],
+            w=xyxy[:, 2] - xyxy[:, 0],
+            h=xyxy[:, 3] - xyxy[:, 1],
+            conf=np.asarray(conf, dtype=np.float32).reshape(-1),
+            cls=np.asarray(classes, dtype=np.float32).reshape(-1),
+        )
+    
+    @classmethod
+    def concat(cls, parts: Sequence["BoxColumns"]) -> "BoxColumns":
+        if not parts:
+            return cls.empty()
+        return cls(*(
+            np.concatenate([getattr(part, name) for part in parts])
+            for name in ("x", "y", "w", "h", "conf", "cls")
+        ))
+    
+    def __len__(self) -> int:
+        return len(self.x)
+    
+    def shifted(self, dx: float, dy: float) -> "BoxColumns":
+        """The same boxes, moved by (dx, dy) pixels."""
+        return BoxColumns(self.x + dx, self.y + dy, self.w, self.h, self.conf, self.cls)
+    
+    def select(self, mask: np.ndarray) -> "BoxColumns":
+        """Keep the rows selected by a boolean mask or index array."""
+        return BoxColumns(
+            self.x[mask], self.y[mask], self.w[mask], self.h[mask],
+            self.conf[mask], self.cls[mask],
+        )
+    
+    def postprocess(self, min_box_area: float) -> "BoxColumns":
+        """Drop boxes under `min_box_area` and clamp the rest to non-negative values."""
+        kept = self.select(self.w * self.h >= min_box_area)
+        return BoxColumns(
+            np.maximum(kept.x, 0), np.maximum(kept.y, 0),
+            np.maximum(kept.w, 0), np.maximum(kept.h, 0),
+            kept.conf, kept.cls,
+        )
+    
+    def rethreshold(
+        self,
+        conf: float,
+        iou: float,
+        max_det: int,
+        min_box_area: float,
+    ) -> "BoxColumns":
+        """Re-apply plan thresholds to raw (low conf floor, loose NMS) boxes."""
+        kept = self.select(self.conf >= conf)
+        kept = kept.select(nms(kept, iou)[:max_det])
+        return kept.postprocess(min_box_area)
+    
+    def to_array(self) -> np.ndarray:
+        """Stack into a float32 (n, 6) array of x, y, w, h, conf, cls."""
+        return np.stack(
+            [self.x, self.y, self.w, self.h, self.conf, self.cls], axis=1
+        ).astype(np.float32)
+    
+    @classmethod
+    def from_array(cls, data: np.ndarray) -> "BoxColumns":
+        data = np.asarray(data, dtype=np.float32).reshape(-1, 6)
+        return cls(data[:, 0], data[:, 1], data[:, 2], data[:, 3], data[:, 4], data[:, 5])
+    
+    def to_bytes(self) -> bytes:
+        return self.to_array().tobytes()
+    
+    @classmethod
+    def from_bytes(cls, raw: bytes) -> "BoxColumns":
+        return cls.from_array(np.frombuffer(raw, dtype=np.float32))
+    
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Build the per-box dicts used by the annotation write path."""
+        return [
+            {
+                "x": x,
+                "y": y,
+                "w": w,
+                "h": h,
+                "confidence": c,
+                "label": "object",  # Simplified for MVP
+            }
+            for x, y, w, h, c in zip(
+                self.x.tolist(), self.y.tolist(), self.w.tolist(),
+                self.h.tolist(), self.conf.tolist(),
+            )
+        ]
+
+def box_iou_matrix(boxes: BoxColumns) -> np.ndarray:
+    """Pairwise IoU of all boxes, as an (n, n) matrix."""
+    x1, y1 = boxes.x, boxes.y
+    x2, y2 = boxes.x + boxes.w, boxes.y + boxes.h
+    
+    inter_w = np.minimum(x2[:, None], x2[None, :]) - np.maximum(x1[:, None], x1[None, :])
+    inter_h = np.minimum(y2[:, None], y2[None, :]) - np.maximum(y1[:, None], y1[None, :])
+    inter = np.clip(inter_w, 0, None) * np.clip(inter_h, 0, None)
+    
+    area = boxes.w * boxes.h
+    union = area[:, None] + area[None, :] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+def nms(boxes: BoxColumns, iou: float) -> np.ndarray:
+    """Class-aware greedy NMS. Returns kept indices, highest confidence first."""
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+    if len(boxes) > NMS_MATRIX_MAX_BOXES:
+        return _nms_by_row(boxes, iou)
+    
+    order = np.argsort(-boxes.conf, kind="stable")
+    ious = box_iou_matrix(boxes.select(order))
+    # Boxes of different classes never suppress each other
+    cls = boxes.cls[order]
+    ious[cls[:, None] != cls[None, :]] = 0.0
+    
+    suppressed = np.zeros(len(order), dtype=bool)
+    keep = []
+    for i in range(len(order)):
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        suppressed |= ious[i] > iou
+    
+    return order[keep]
+
+def _nms_by_row(boxes: BoxColumns, iou: float) -> np.ndarray:
+    """Same as nms, comparing one kept box with the rest at a time.
+    
+    Memory stays linear in the number of boxes (merged tiles of a large
+    image can have tens of thousands), at the cost of a loop over kept boxes.
+    """
+    
+    order = np.argsort(-boxes.conf, kind="stable")
+    ordered = boxes.select(order)
+    x1, y1 = ordered.x, ordered.y
+    x2, y2 = ordered.x + ordered.w, ordered.y + ordered.h
+    area = ordered.w * ordered.h
+    cls = ordered.cls
+    
+    suppressed = np.zeros(len(order), dtype=bool)
+    keep = []
+    for i in range(len(order)):
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        rest = slice(i + 1, None)
+        inter_w = np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest])
+        inter_h = np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest])
+        inter = np.clip(inter_w, 0, None) * np.clip(inter_h, 0, None)
+        union = area[i] + area[rest] - inter
+        ious = np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+        suppressed[rest] |= (ious > iou) & (cls[rest] == cls[i])
+    
+    return order[keep]
+
+def tile_windows(width: int, height: int, tile_size: int, overlap: float) -> List[Tuple[int, int, int, int]]:
+    """(x0, y0, x1, y1) windows of `tile_size` pixels covering an image.
+    
+    Neighbouring tiles share `overlap` of a tile; the last row and column are
+    moved back to end at the image border, so no tile is cut short.
+    """
+    
+    def starts(length: int) -> List[int]:
+        if length <= tile_size:
+            return [0]
+        stride = max(1, int(tile_size * (1 - overlap)))
+        return list(range(0, length - tile_size, stride)) + [length - tile_size]
+    
+    return [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in starts(height) for x in starts(width)
+    ]
+
+def rect_input_shape(width: int, height: int, imgsz: int) -> Tuple[int, int]:
+    """(height, width) model input for an image: `imgsz` on its longer side.
+    
+    The shorter side is rounded up to a multiple of RECT_BUCKET_STEP, so
+    images of similar aspect ratio share a shape (and a batch) while padding
+    stays a small fraction of the input. The resize scale is the same as for
+    a square imgsz input.
+    """
+    
+    short = min(width, height) * imgsz / max(width, height, 1)
+    short = min(imgsz, max(RECT_BUCKET_STEP, math.ceil(short / RECT_BUCKET_STEP) * RECT_BUCKET_STEP))
+    return (imgsz, short) if height >= width else (short, imgsz)
+
+def tiling_for(tiling: Optional[Dict[str, Any]], width: int, height: int) -> Optional[Tiling]:
+    """(tile_size, overlap) if a plan's `tiling` applies to a width x height image."""
+    
+    if not tiling or not tiling.get("min_side") or max(width, height) <= tiling["min_side"]:
+        return None
+    return tiling["tile_size"], tiling["overlap"]
+
+def decode_image(storage_uri: str) -> np.ndarray:
+    """Read an image as a BGR array, oriented the way ultralytics loads files."""
+    
+    with PILImage.open(storage_uri) as img:
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        return np.ascontiguousarray(np.asarray(img)[:, :, ::-1])
+
+class ModelKey(NamedTuple):
+    """A loaded model: its weights, the backend running it and, for exported
+    backends, the input size it was exported for."""
+    
+    model: str
+    backend: str = "torch"
+    imgsz: Optional[int] = None
+    
+    def __str__(self) -> str:
+        if self.backend == "torch":
+            return self.model
+        return f"{self.model}[{self.backend},{self.imgsz}]"
+
 class YOLOService:
     def __init__(self):
-        self.models = {}
         # Get the models directory path
         self.models_dir = Path(__file__).parent.parent.parent / "yolo-models"
         self.models_dir.mkdir(exist_ok=True)  # Create if doesn't exist
+        self.exported_dir = Path(settings.EXPORTED_MODELS_DIR or self.models_dir / "exported")
+        self.models = ModelManager(
+            self._load_weights,
+            max_bytes=settings.MODEL_CACHE_MAX_BYTES,
+            max_models=settings.MODEL_CACHE_MAX_MODELS,
+            memory_of=_model_memory_bytes,
+        )
+        # (model, backend) pairs that could not be exported or loaded
+        self._failed_backends = set()
+        # model name -> ((size, mtime) of its local weights, their id)
+        self._weights_ids: Dict[str, Tuple[Tuple[int, int], str]] = {}
     
-    def load_model(self, model_name: str):
-        """Load YOLO model (cached)."""
-        if model_name not in self.models:
-            logger.info(f"Loading YOLO model: {model_name}")
-            
-            # Check if model exists in local models folder first
-            local_model_path = self.models_dir / model_name
-            
-            if local_model_path.exists():
-                logger.info(f"Using local model: {local_model_path}")
-                self.models[model_name] = YOLO(str(local_model_path))
-            else:
-                # Fallback to downloading from ultralytics
-                logger.info(f"Model not found locally, downloading: {model_name}")
-                self.models[model_name] = YOLO(model_name)
-                
-        return self.models[model_name]
+    def load_model(self, model_name: str, backend: str = "torch", imgsz: int = 640):
+        """Load YOLO model for `backend` (cached, see ModelManager).
+        
+        Falls back to torch when the backend's runtime is not installed or
+        the model can't be exported for it.
+        """
+        
+        key = self._model_key(model_name, backend, imgsz)
+        try:
+            return self.models.get(key)
+        except Exception:
+            if key.backend == "torch":
+                raise
+            logger.exception(f"Could not load {model_name} with {backend}, falling back to torch")
+            self._failed_backends.add((model_name, backend))
+            return self.models.get(ModelKey(model_name))
+    
+    def preload(self, model_names: Sequence[str], backend: str = "torch", imgsz: int = 640):
+        """Load and warm up models before the first job needs them."""
+        
+        for model_name in model_names:
+            self.load_model(model_name, backend, imgsz)
+            self.models.preload([self._model_key(model_name, backend, imgsz)], imgsz)
+    
+    def weights_id(self, model_name: str) -> str:
+        """Identifies the weights `model_name` loads, for keying stored predictions.
+        
+        Local weights are identified by their content (hashed again only when
+        the file's size or mtime changes), so retraining into the same file
+        invalidates old predictions. Downloaded weights are named releases.
+        """
+        
+        path = self.models_dir / model_name
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return f"release:{model_name}"
+        
+        version = (stat.st_size, stat.st_mtime_ns)
+        cached = self._weights_ids.get(model_name)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        weights_id = f"sha256:{digest.hexdigest()[:16]}"
+        self._weights_ids[model_name] = (version, weights_id)
+        return weights_id
+    
+    def resolve_backend(self, model_name: str, backend: str, imgsz: int) -> str:
+        """The backend load_model will actually use (after falling back to torch)."""
+        
+        return self._model_key(model_name, backend, imgsz).backend
+    
+    def _model_key(self, model_name: str, backend: str, imgsz: int) -> ModelKey:
+        if backend == "torch" or (model_name, backend) in self._failed_backends:
+            return ModelKey(model_name)
+        if not backend_available(backend):
+            logger.warning(f"Inference backend {backend} is not available, using torch for {model_name}")
+            self._failed_backends.add((model_name, backend))
+            return ModelKey(model_name)
+        return ModelKey(model_name, backend, imgsz)
+    
+    def _load_weights(self, key: ModelKey):
+        # Imported on first load so code paths that never run a model
+        # (the API process, benchmarks with a fake detector) don't need torch
+        from ultralytics import YOLO
+        
+        # Check if model exists in local models folder first
+        local_model_path = self.models_dir / key.model
+        
+        if key.backend != "torch":
+            if not local_model_path.exists():
+                from ultralytics.utils.downloads import attempt_download_asset
+                logger.info(f"Model not found locally, downloading: {key.model}")
+                local_model_path = Path(attempt_download_asset(key.model))
+            exported = export_model(local_model_path, key.backend, key.imgsz, self.exported_dir)
+            logger.info(f"Using {key.backend} model: {exported}")
+            return YOLO(str(exported), task="detect")
+        
+        if local_model_path.exists():
+            logger.info(f"Using local model: {local_model_path}")
+            return YOLO(str(local_model_path))
+        
+        # Fallback to downloading from ultralytics
+        logger.info(f"Model not found locally, downloading: {key.model}")
+        return YOLO(key.model)
     
     def predict_image(
         self,
@@ -40,53 +377,374 @@ class YOLOService:
         iou: float = 0.45,
         max_det: int = 100,
         min_box_area: int = 100,
+        backend: str = "torch",
     ) -> List[Dict[str, Any]]:
         """Run YOLO on single image, return boxes in xywh format."""
         
-        model = self.load_model(model_name)
-        
-        results = model.predict(
-            source=str(image_path),
+        return self.predict_batch(
+            [image_path],
+            model_name=model_name,
             imgsz=imgsz,
             conf=conf,
             iou=iou,
             max_det=max_det,
-            verbose=False
+            min_box_area=min_box_area,
+            batch_size=1,
+            backend=backend,
+        )[0]
+    
+    def predict_batch(
+        self,
+        sources: Sequence[Union[Path, str, np.ndarray]],
+        model_name: str = "yolov8n.pt",
+        imgsz: int = 640,
+        conf: float = 0.25,
+        iou: float = 0.45,
+        max_det: int = 100,
+        min_box_area: int = 100,
+        batch_size: Optional[int] = None,
+        backend: str = "torch",
+        tiling: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """Run YOLO on many images, return one box list per source (same order).
+        
+        Sources can be file paths or decoded BGR arrays. They are sent to the
+        model in chunks of `batch_size` so each forward pass is filled.
+        Images larger than a plan's `tiling` allows are predicted in tiles
+        (see _predict_tiled).
+        """
+        
+        return [
+            columns.to_dicts()
+            for columns in self.predict_batch_columns(
+                sources,
+                model_name=model_name,
+                imgsz=imgsz,
+                conf=conf,
+                iou=iou,
+                max_det=max_det,
+                min_box_area=min_box_area,
+                batch_size=batch_size,
+                backend=backend,
+                tiling=tiling,
+            )
+        ]
+    
+    def predict_batch_columns(
+        self,
+        sources: Sequence[Union[Path, str, np.ndarray]],
+        model_name: str = "yolov8n.pt",
+        imgsz: int = 640,
+        conf: float = 0.25,
+        iou: float = 0.45,
+        max_det: int = 100,
+        min_box_area: int = 100,
+        batch_size: Optional[int] = None,
+        backend: str = "torch",
+        tiling: Optional[Dict[str, Any]] = None,
+    ) -> List[BoxColumns]:
+        """Same as predict_batch, but return columnar results instead of dicts."""
+        
+        return [
+            columns.postprocess(min_box_area)
+            for columns in self._predict_raw(
+                sources, model_name, imgsz, conf, iou, max_det, batch_size, backend, tiling
+            )
+        ]
+    
+    def predict_batch_raw(
+        self,
+        sources: Sequence[Union[Path, str, np.ndarray]],
+        model_name: str = "yolov8n.pt",
+        imgsz: int = 640,
+        batch_size: Optional[int] = None,
+        backend: str = "torch",
+        tiling: Optional[Dict[str, Any]] = None,
+    ) -> List[BoxColumns]:
+        """Run YOLO at the stored-prediction floor (see Settings.PREDICTION_*).
+        
+        The result is unfiltered; use BoxColumns.rethreshold to apply a plan.
+        """
+        
+        return self._predict_raw(
+            sources,
+            model_name,
+            imgsz,
+            settings.PREDICTION_CONF_FLOOR,
+            settings.PREDICTION_IOU,
+            settings.PREDICTION_MAX_DET,
+            batch_size,
+            backend,
+            tiling,
         )
+    
+    def _predict_raw(
+        self,
+        sources: Sequence[Union[Path, str, np.ndarray]],
+        model_name: str,
+        imgsz: int,
+        conf: float,
+        iou: float,
+        max_det: int,
+        batch_size: Optional[int],
+        backend: str = "torch",
+        tiling: Optional[Dict[str, Any]] = None,
+    ) -> List[BoxColumns]:
+        tiled: Dict[Tiling, List[int]] = {}
+        if tiling:
+            for index, src in enumerate(sources):
+                tiles = tiling_for(tiling, *_source_size(src))
+                if tiles is not None:
+                    tiled.setdefault(tiles, []).append(index)
+        if not tiled:
+            return self._run_model(sources, model_name, imgsz, conf, iou, max_det, batch_size, backend)
+        
+        results: List[Optional[BoxColumns]] = [None] * len(sources)
+        tiled_indices = {index for indices in tiled.values() for index in indices}
+        plain = [index for index in range(len(sources)) if index not in tiled_indices]
+        for index, columns in zip(plain, self._run_model(
+            [sources[index] for index in plain], model_name, imgsz, conf, iou, max_det, batch_size, backend
+        )):
+            results[index] = columns
+        for (tile_size, overlap), indices in tiled.items():
+            for index, columns in zip(indices, self._predict_tiled(
+                [sources[index] for index in indices], tile_size, overlap,
+                model_name, imgsz, conf, iou, max_det, batch_size, backend
+            )):
+                results[index] = columns
+        return results
+    
+    def _predict_tiled(
+        self,
+        sources: Sequence[Union[Path, str, np.ndarray]],
+        tile_size: int,
+        overlap: float,
+        model_name: str,
+        imgsz: int,
+        conf: float,
+        iou: float,
+        max_det: int,
+        batch_size: Optional[int],
+        backend: str,
+    ) -> List[BoxColumns]:
+        """Predict large images as overlapping tiles at full resolution.
+        
+        The tiles of all images go through the model in shared batches, each
+        image also whole (downscaled) so objects bigger than a tile are still
+        found. Boxes are moved back to image coordinates; parts of an object
+        cut by tile edges are joined (see _merge_cut_boxes) and the remaining
+        duplicates from overlapping tiles go through one class-aware NMS per
+        image.
+        """
+        
+        crops = []
+        windows = []
+        for source in sources:
+            image = source if isinstance(source, np.ndarray) else decode_image(str(source))
+            height, width = image.shape[:2]
+            image_windows = [(0, 0, width, height)] + tile_windows(width, height, tile_size, overlap)
+            crops.extend(image[y0:y1, x0:x1] for x0, y0, x1, y1 in image_windows)
+            windows.append(image_windows)
         
-        boxes = []
-        
-        if results and len(results) > 0:
-            result = results[0]
-            
-            if result.boxes is not None:
-                for box in result.boxes:
-                    # Convert xyxy to xywh
-                    xyxy = box.xyxy[0].cpu().numpy()
-                    x1, y1, x2, y2 = xyxy
-                    x, y, w, h = x1, y1, x2 - x1, y2 - y1
-                    
-                    # Filter by min area
-                    area = w * h
-                    if area < min_box_area:
-                        continue
-                    
-                    # Clamp to bounds
-                    x = max(0, x)
-                    y = max(0, y)
-                    w = max(0, w)
-                    h = max(0, h)
-                    
-                    boxes.append({
-                        "x": float(x),
-                        "y": float(y),
-                        "w": float(w),
-                        "h": float(h),
-                        "confidence": float(box.conf[0]),
-                        "label": "object",  # Simplified for MVP
-                    })
-        
-        return boxes
+        results = iter(self._run_model(crops, model_name, imgsz, conf, iou, max_det, batch_size, backend))
+        
+        merged = []
+        for image_windows in windows:
+            _, _, width, height = image_windows[0]
+            parts, cut, window_ids = [], [], []
+            for window_id, window in enumerate(image_windows):
+                columns = next(results)
+                parts.append(columns.shifted(window[0], window[1]))
+                cut.append(_cut_boxes(columns, window, width, height))
+                window_ids.append(np.full(len(columns), window_id))
+            columns = _merge_cut_boxes(
+                BoxColumns.concat(parts), np.concatenate(cut),
+                np.concatenate(window_ids), np.asarray(image_windows, dtype=np.float32)
+            )
+            merged.append(columns.select(nms(columns, iou)[:max_det]))
+        return merged
+    
+    def _run_model(
+        self,
+        sources: Sequence[Union[Path, str, np.ndarray]],
+        model_name: str,
+        imgsz: int,
+        conf: float,
+        iou: float,
+        max_det: int,
+        batch_size: Optional[int],
+        backend: str,
+    ) -> List[BoxColumns]:
+        """Run the model on `sources` in batches; results keep the sources' order.
+        
+        With INFERENCE_RECT_BATCHES, images are first grouped by aspect ratio
+        and each group runs at a rectangular input size (see rect_input_shape),
+        so little of each batch is letterbox padding. Boxes come back in
+        original image pixels either way.
+        """
+        
+        model = self.load_model(model_name, backend, imgsz)
+        batch_size = max(1, batch_size or settings.PRELABEL_BATCH_SIZE)
+        
+        if settings.INFERENCE_RECT_BATCHES:
+            buckets: Dict[Any, List[int]] = {}
+            for index, src in enumerate(sources):
+                buckets.setdefault(rect_input_shape(*_source_size(src), imgsz), []).append(index)
+        else:
+            buckets = {imgsz: list(range(len(sources)))}
+        
+        all_columns: List[Optional[BoxColumns]] = [None] * len(sources)
+        
+        for shape, indices in buckets.items():
+            for start in range(0, len(indices), batch_size):
+                chunk_indices = indices[start:start + batch_size]
+                chunk = [
+                    # Tiles are views into the full image; the model wants them contiguous
+                    str(src) if isinstance(src, (Path, str)) else np.ascontiguousarray(src)
+                    for src in (sources[index] for index in chunk_indices)
+                ]
+                
+                with predict_seconds.time(model=model_name, imgsz=imgsz, backend=backend):
+                    results = model.predict(
+                        source=chunk,
+                        imgsz=shape,
+                        conf=conf,
+                        iou=iou,
+                        max_det=max_det,
+                        batch=len(chunk),
+                        verbose=False
+                    )
+                predicted_images.inc(len(chunk), model=model_name, imgsz=imgsz, backend=backend)
+                
+                for index, result in zip(chunk_indices, results):
+                    all_columns[index] = self._result_to_columns(result)
+        
+        return all_columns
+    
+    def _result_to_columns(self, result) -> BoxColumns:
+        """Move all boxes of one ultralytics result to the CPU in a single copy."""
+        
+        if result.boxes is None or len(result.boxes) == 0:
+            return BoxColumns.empty()
+        
+        # boxes.data is (n, 6): x1, y1, x2, y2, conf, cls
+        data = result.boxes.data.cpu().numpy()
+        return BoxColumns.from_xyxy(data[:, :4], data[:, 4], data[:, 5])
+
+def _cut_boxes(columns: BoxColumns, window: Tuple[int, int, int, int], width: int, height: int) -> np.ndarray:
+    """Mask of boxes touching the sides of a tile that are not the image border."""
+    
+    x0, y0, x1, y1 = window
+    cut = np.zeros(len(columns), dtype=bool)
+    if x0 > 0:
+        cut |= columns.x <= TILE_EDGE_MARGIN
+    if y0 > 0:
+        cut |= columns.y <= TILE_EDGE_MARGIN
+    if x1 < width:
+        cut |= columns.x + columns.w >= (x1 - x0) - TILE_EDGE_MARGIN
+    if y1 < height:
+        cut |= columns.y + columns.h >= (y1 - y0) - TILE_EDGE_MARGIN
+    return cut
+
+def _merge_cut_boxes(
+    columns: BoxColumns,
+    cut: np.ndarray,
+    window_ids: np.ndarray,
+    windows: np.ndarray,
+) -> BoxColumns:
+    """Join each cut box with the boxes other tiles saw of the same object.
+    
+    A box cut by a tile edge is compared with the boxes of every other window
+    (tile or whole image) inside the area both windows cover, where each saw
+    the same part of the object. Matches of one class are merged, transitively,
+    into their enclosing box at the highest confidence. An object wider than
+    the tile overlap thus comes out whole instead of as fragments, and a
+    fragment of an object another tile saw whole is absorbed by it.
+    """
+    
+    if not cut.any():
+        return columns
+    
+    x1, y1 = columns.x, columns.y
+    x2, y2 = columns.x + columns.w, columns.y + columns.h
+    box_windows = windows[window_ids]
+    parent = np.arange(len(columns))
+    
+    def root(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    
+    for i in np.flatnonzero(cut):
+        # The area both windows cover (empty where they don't overlap)
+        ax1 = np.maximum(box_windows[i, 0], box_windows[:, 0])
+        ay1 = np.maximum(box_windows[i, 1], box_windows[:, 1])
+        ax2 = np.maximum(np.minimum(box_windows[i, 2], box_windows[:, 2]), ax1)
+        ay2 = np.maximum(np.minimum(box_windows[i, 3], box_windows[:, 3]), ay1)
+        
+        ix1, ix2 = np.clip(x1[i], ax1, ax2), np.clip(x2[i], ax1, ax2)
+        iy1, iy2 = np.clip(y1[i], ay1, ay2), np.clip(y2[i], ay1, ay2)
+        jx1, jx2 = np.clip(x1, ax1, ax2), np.clip(x2, ax1, ax2)
+        jy1, jy2 = np.clip(y1, ay1, ay2), np.clip(y2, ay1, ay2)
+        
+        inter = (
+            np.clip(np.minimum(ix2, jx2) - np.maximum(ix1, jx1), 0, None)
+            * np.clip(np.minimum(iy2, jy2) - np.maximum(iy1, jy1), 0, None)
+        )
+        union = (ix2 - ix1) * (iy2 - iy1) + (jx2 - jx1) * (jy2 - jy1) - inter
+        ious = np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+        
+        matches = (ious > TILE_MERGE_IOU) & (columns.cls == columns.cls[i]) & (window_ids != window_ids[i])
+        for j in np.flatnonzero(matches):
+            parent[root(j)] = root(i)
+    
+    roots = np.array([root(i) for i in range(len(columns))])
+    groups, members = np.unique(roots, return_inverse=True)
+    if len(groups) == len(columns):
+        return columns
+    
+    gx1 = np.full(len(groups), np.inf, dtype=x1.dtype)
+    gy1 = np.full(len(groups), np.inf, dtype=y1.dtype)
+    gx2 = np.full(len(groups), -np.inf, dtype=x2.dtype)
+    gy2 = np.full(len(groups), -np.inf, dtype=y2.dtype)
+    conf = np.zeros(len(groups), dtype=columns.conf.dtype)
+    np.minimum.at(gx1, members, x1)
+    np.minimum.at(gy1, members, y1)
+    np.maximum.at(gx2, members, x2)
+    np.maximum.at(gy2, members, y2)
+    np.maximum.at(conf, members, columns.conf)
+    return BoxColumns(gx1, gy1, gx2 - gx1, gy2 - gy1, conf, columns.cls[groups])
+
+def _source_size(source: Union[Path, str, np.ndarray]) -> Tuple[int, int]:
+    """(width, height) of a source as the model sees it, without decoding files."""
+    
+    if isinstance(source, np.ndarray):
+        return source.shape[1], source.shape[0]
+    with PILImage.open(source) as img:
+        width, height = img.size
+        # EXIF orientations that rotate by 90 degrees
+        if img.getexif().get(0x0112) in (5, 6, 7, 8):
+            return height, width
+        return width, height
+
+def _model_memory_bytes(model) -> int:
+    """Bytes held by a model's parameters and buffers.
+    
+    Exported models are measured by their size on disk, which is roughly what
+    the runtime keeps loaded; anything else counts as 0.
+    """
+    
+    try:
+        module = model.model
+        if isinstance(module, (str, Path)):
+            path = Path(module)
+            files = [path] if path.is_file() else path.rglob("*")
+            return sum(f.stat().st_size for f in files if f.is_file())
+        tensors = list(module.parameters()) + list(module.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+    except Exception:
+        return 0
 
 # Singleton instance
 yolo_service = YOLOService()
\ No newline at end of file
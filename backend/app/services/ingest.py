@@ -0,0 +1,46 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+from PIL import Image as PILImage
+
+from app.core.config import settings
+from app.services.storage import content_store
+
+@dataclass
+class IngestedFile:
+    width: int
+    height: int
+    content_hash: str
+    path: Path
+    size: int
+    # False when identical bytes were already in the content store
+    created: bool
+
+class IngestService:
+    """Moves uploaded files into the content store off the event loop.
+    
+    Work runs on a dedicated, bounded thread pool so a large multi-file upload
+    is processed in parallel without starving the default threadpool that
+    serves sync routes and dependencies.
+    """
+    
+    def __init__(self, max_workers: int):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upload-ingest")
+    
+    def ingest(self, source: BinaryIO) -> IngestedFile:
+        """Hash and copy an upload into the content store in chunks.
+        
+        Dimensions come from the image header only; pixels are never decoded.
+        """
+        
+        source.seek(0)
+        with PILImage.open(source) as img:
+            width, height = img.size
+        
+        source.seek(0)
+        content_hash, path, size, created = content_store.put(source)
+        
+        return IngestedFile(width, height, content_hash, path, size, created)
+
+ingest_service = IngestService(max_workers=settings.UPLOAD_WORKERS)
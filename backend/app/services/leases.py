@@ -0,0 +1,165 @@
+from sqlalchemy import or_, and_
+from sqlalchemy.orm import Session
+from typing import Any, Iterator, List, Optional
+from uuid import UUID
+from contextlib import contextmanager
+from datetime import datetime, timedelta, UTC
+import logging
+import os
+import socket
+import threading
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.query_stats import count_batch
+from app.models.jobs import Job, JobStatus
+
+logger = logging.getLogger(__name__)
+
+class LeaseLostError(Exception):
+    """Another worker took over the job (our lease expired)."""
+
+class JobLeaseService:
+    """Claims, heartbeats and checkpoints for durable jobs.
+    
+    A job is owned by whoever holds an unexpired lease. Every progress write
+    goes through `checkpoint`, which extends the lease in the same UPDATE and
+    fails if the lease was lost, so two workers never write the same job.
+    Between checkpoints, `heartbeat` keeps the lease alive.
+    """
+    
+    @property
+    def worker_id(self) -> str:
+        # Computed lazily: each executor worker process has its own pid
+        return f"{socket.gethostname()}:{os.getpid()}"
+    
+    def _lease_expiry(self) -> datetime:
+        return datetime.now(UTC) + timedelta(seconds=settings.JOB_LEASE_SECONDS)
+    
+    def _claimable(self, now: datetime):
+        return or_(
+            Job.status == JobStatus.QUEUED,
+            and_(
+                Job.status == JobStatus.RUNNING,
+                or_(Job.lease_expires_at.is_(None), Job.lease_expires_at < now)
+            )
+        )
+    
+    def claim(self, db: Session, job_id: UUID) -> Optional[Job]:
+        """Atomically take the lease on a queued or stale job. None if someone else holds it."""
+        
+        now = datetime.now(UTC)
+        claimed = db.query(Job).filter(
+            Job.id == job_id,
+            self._claimable(now)
+        ).update({
+            Job.status: JobStatus.RUNNING,
+            Job.lease_owner: self.worker_id,
+            Job.lease_expires_at: self._lease_expiry(),
+            Job.heartbeat_at: now,
+            Job.attempts: Job.attempts + 1,
+        }, synchronize_session=False)
+        db.commit()
+        
+        if not claimed:
+            return None
+        
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if job.started_at is None:
+            job.started_at = now
+            db.commit()
+        return job
+    
+    def checkpoint(self, db: Session, job: Job, **values: Any):
+        """Write job progress and extend the lease, then commit.
+        
+        Pending writes in the session are committed together with the
+        checkpoint, or rolled back if the lease was lost. A checkpoint of
+        `processed` counts as one batch for the job's query stats.
+        """
+        
+        now = datetime.now(UTC)
+        updates = {
+            Job.lease_expires_at: self._lease_expiry(),
+            Job.heartbeat_at: now,
+        }
+        # Explicit values win, so the final checkpoint can clear the lease
+        updates.update({getattr(Job, key): value for key, value in values.items()})
+        
+        owned = db.query(Job).filter(
+            Job.id == job.id,
+            Job.lease_owner == self.worker_id
+        ).update(updates, synchronize_session=False)
+        
+        if not owned:
+            db.rollback()
+            raise LeaseLostError(f"Lost lease on job {job.id}")
+        
+        db.commit()
+        if "processed" in values:
+            count_batch()
+    
+    def renew(self, db: Session, job_id: UUID) -> bool:
+        """Extend the lease if this worker still holds it. False if it doesn't."""
+        
+        renewed = db.query(Job).filter(
+            Job.id == job_id,
+            Job.status == JobStatus.RUNNING,
+            Job.lease_owner == self.worker_id
+        ).update({
+            Job.lease_expires_at: self._lease_expiry(),
+            Job.heartbeat_at: datetime.now(UTC),
+        }, synchronize_session=False)
+        db.commit()
+        return bool(renewed)
+    
+    @contextmanager
+    def heartbeat(self, job_id: UUID) -> Iterator[None]:
+        """Renew the lease on `job_id` every JOB_LEASE_SECONDS / 3 while the block runs.
+        
+        Stages between checkpoints (an agent sample run, a bucket window, a
+        stretch of export) can outlast the lease on a slow host. Renewals run
+        in a background thread with their own session and never take a lease
+        this worker doesn't hold, so a job that was never claimed, or was
+        finished or taken over, is left alone.
+        """
+        
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=self._heartbeat, args=(job_id, stop), name=f"lease-heartbeat-{job_id}", daemon=True
+        )
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+    
+    def _heartbeat(self, job_id: UUID, stop: threading.Event):
+        while not stop.wait(settings.JOB_LEASE_SECONDS / 3):
+            db = SessionLocal()
+            try:
+                self.renew(db, job_id)
+            except Exception:
+                # Retried next beat; the lease outlasts two missed beats
+                logger.exception(f"Failed to renew lease on job {job_id}")
+            finally:
+                db.close()
+    
+    def release(self, db: Session, job_ids: List[UUID]):
+        """Expire leases now so another worker can resume these jobs immediately."""
+        
+        if not job_ids:
+            return
+        db.query(Job).filter(
+            Job.id.in_(job_ids),
+            Job.status == JobStatus.RUNNING
+        ).update({Job.lease_expires_at: datetime.now(UTC)}, synchronize_session=False)
+        db.commit()
+    
+    def resumable_jobs(self, db: Session) -> List[Job]:
+        """Queued jobs and running jobs whose lease has expired."""
+        
+        return db.query(Job).filter(self._claimable(datetime.now(UTC))).order_by(Job.created_at).all()
+
+job_lease_service = JobLeaseService()
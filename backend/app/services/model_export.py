@@ -0,0 +1,87 @@
+from functools import lru_cache
+from pathlib import Path
+import importlib.util
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+# ultralytics pip-installs missing export packages on the fly; job workers must
+# never change the environment, so a missing package makes the backend fall back
+# to torch instead (read by ultralytics when it is first imported)
+os.environ.setdefault("YOLO_AUTOINSTALL", "false")
+
+# "torch" runs the weights directly; the others run an exported copy
+INFERENCE_BACKENDS = ("torch", "onnx", "openvino")
+
+# Modules each exported backend needs for ultralytics' exporter (its ONNX export
+# also simplifies the graph with onnxslim) and to run the result; the backend's
+# extra installs them (poetry install --extras onnx)
+_REQUIRED_MODULES = {
+    "onnx": ("onnx", "onnxslim", "onnxruntime"),
+    "openvino": ("openvino", "openvino.tools.ovc"),
+}
+
+@lru_cache
+def backend_available(backend: str) -> bool:
+    """Whether this process can export and run models with `backend`."""
+    
+    if backend == "torch":
+        return True
+    modules = _REQUIRED_MODULES.get(backend)
+    if modules is None:
+        return False
+    missing = [module for module in modules if not _module_installed(module)]
+    if missing:
+        logger.warning(f"Inference backend {backend} needs {', '.join(missing)}")
+    return not missing
+
+def _module_installed(module: str) -> bool:
+    try:
+        return importlib.util.find_spec(module) is not None
+    except ModuleNotFoundError:
+        # The parent package of a submodule is missing
+        return False
+
+def exported_path(cache_dir: Path, weights: Path, backend: str, imgsz: int) -> Path:
+    """Where the export of `weights` for `backend` at `imgsz` is cached."""
+    
+    name = f"{weights.stem}-{imgsz}"
+    if backend == "onnx":
+        return cache_dir / f"{name}.onnx"
+    return cache_dir / f"{name}_openvino_model"
+
+def export_model(weights: Path, backend: str, imgsz: int, cache_dir: Path) -> Path:
+    """Export `weights` for `backend` once; later calls return the cached copy.
+    
+    Exports use dynamic input shapes, so the model also accepts batches and
+    sizes other than `imgsz`, but `imgsz` is the shape it is tuned for.
+    """
+    
+    target = exported_path(cache_dir, weights, backend, imgsz)
+    if target.exists():
+        return target
+    
+    from ultralytics import YOLO
+    
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+    
+    # ultralytics writes exports next to the weights, and several job workers
+    # may export the same model at once, so each exports from a private copy
+    with tempfile.TemporaryDirectory(dir=cache_dir) as tmp:
+        copy = Path(tmp) / weights.name
+        shutil.copy2(weights, copy)
+        exported = Path(YOLO(str(copy)).export(format=backend, imgsz=imgsz, dynamic=True))
+        try:
+            os.replace(exported, target)
+        except OSError:
+            # Another worker finished the same export first
+            if not target.exists():
+                raise
+    
+    logger.info(f"Exported {weights.name} to {backend} at {imgsz} in {time.perf_counter() - started:.1f}s: {target}")
+    return target
@@ -0,0 +1,116 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Hashable, Iterable, Optional
+import logging
+import threading
+import time
+
+import numpy as np
+
+from app.core.metrics import model_load_seconds, model_memory_bytes, worker_label
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class LoadedModel:
+    key: Hashable
+    model: Any
+    memory_bytes: int
+    loaded_at: float = field(default_factory=time.time)
+    last_used_at: float = field(default_factory=time.time)
+    warmed_up: bool = False
+
+class ModelManager:
+    """The models loaded in this process, kept within a memory budget.
+    
+    Models are loaded on first use by `loader(key)` and kept in LRU order.
+    Once their combined size exceeds `max_bytes`, or there are more than
+    `max_models` of them, the least recently used are dropped. The model just
+    requested is always kept, even if it alone is over the budget.
+    
+    Loaded models are reported through the model_memory_bytes metric (see
+    metrics.resident_models), which also covers the job worker processes.
+    """
+    
+    def __init__(
+        self,
+        loader: Callable[[Hashable], Any],
+        max_bytes: int,
+        max_models: int,
+        memory_of: Callable[[Any], int] = lambda model: 0,
+    ):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.max_models = max_models
+        self.memory_of = memory_of
+        self._models: "OrderedDict[Hashable, LoadedModel]" = OrderedDict()
+        # Held while loading too, so concurrent callers never load a model twice
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is None:
+                entry = self._load(key)
+            else:
+                self._models.move_to_end(key)
+            entry.last_used_at = time.time()
+            return entry.model
+    
+    def preload(self, keys: Iterable[Hashable], imgsz: int):
+        """Load and warm up `keys` now so the first job doesn't pay for it."""
+        
+        for key in keys:
+            model = self.get(key)
+            with self._lock:
+                entry = self._models.get(key)
+                if entry is None or entry.warmed_up:
+                    continue
+                started = time.perf_counter()
+                warm_up(model, imgsz)
+                entry.warmed_up = True
+            logger.info(f"Warmed up model {key} in {time.perf_counter() - started:.2f}s")
+    
+    def _load(self, key: Hashable) -> LoadedModel:
+        logger.info(f"Loading YOLO model: {key}")
+        with model_load_seconds.time(model=str(key)):
+            model = self.loader(key)
+        
+        entry = LoadedModel(key=key, model=model, memory_bytes=self.memory_of(model))
+        self._models[key] = entry
+        model_memory_bytes.set(entry.memory_bytes, model=str(key), worker=worker_label())
+        self._enforce_budget()
+        return entry
+    
+    def _enforce_budget(self):
+        total = sum(entry.memory_bytes for entry in self._models.values())
+        # The newest entry is last; never evict it
+        while len(self._models) > 1 and (total > self.max_bytes or len(self._models) > self.max_models):
+            key, entry = next(iter(self._models.items()))
+            total -= entry.memory_bytes
+            self._evict(key)
+    
+    def _evict(self, key: Hashable) -> bool:
+        entry = self._models.pop(key, None)
+        if entry is None:
+            return False
+        logger.info(f"Evicting model {key} ({entry.memory_bytes / 2**20:.1f} MiB)")
+        model_memory_bytes.remove(model=str(key), worker=worker_label())
+        return True
+
+def warm_up(model: Any, imgsz: int):
+    """Fuse conv+bn layers and run one dummy forward pass at `imgsz`.
+    
+    The first real predict then skips ultralytics' predictor setup and the
+    backend's lazy initialisation (allocator, kernels, autotuning).
+    """
+    
+    fuse: Optional[Callable[[], Any]] = getattr(model, "fuse", None)
+    if fuse is not None:
+        try:
+            fuse()
+        except Exception:
+            logger.warning("Could not fuse model layers", exc_info=True)
+    
+    dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+    model.predict(source=[dummy], imgsz=imgsz, verbose=False)
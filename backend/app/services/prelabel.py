@@ -0,0 +1,471 @@
+from sqlalchemy.orm import Session
+from uuid import UUID
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, UTC
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+import contextvars
+import logging
+import queue
+import random
+import threading
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import JobThroughput
+from app.models.image import Image
+from app.models.jobs import Job, JobStatus
+from app.models.prediction import Prediction
+from app.services.inference import yolo_service, BoxColumns, Tiling, decode_image, rect_input_shape, tiling_for
+from app.services.agent import agent_service
+from app.services.annotation_writer import annotation_writer
+from app.services.leases import job_lease_service, LeaseLostError
+
+logger = logging.getLogger(__name__)
+
+# Image rows fetched per round trip by the pipeline's reader
+PRELABEL_READ_CHUNK_SIZE = 500
+
+def run_prelabel_job(job_id: UUID):
+    """Execute prelabel job (runs in a job executor worker process).
+    
+    Safe to call again for a job that was interrupted: it only runs if it can
+    claim the job's lease, and it continues after the last checkpointed image.
+    """
+    
+    db = SessionLocal()
+    job = None
+    
+    try:
+        job = job_lease_service.claim(db, job_id)
+        if job is None:
+            logger.info(f"Prelabel job {job_id} is owned by another worker, skipping")
+            return
+        
+        params = job.params_json or {}
+        goal = params.get("goal", "balanced")
+        instructions = params.get("instructions", "")
+        backend = params.get("backend")
+        
+        if job.agent_mode and job.plan_v1_json:
+            # Resumed after the sample stage already finished
+            final_plan = job.plan_v1_json
+        elif job.agent_mode:
+            # Agent mode: Plan → Sample → Evaluate → Refine → Full run
+            
+            # 1. Create initial plan
+            plan_v0 = agent_service.create_initial_plan(goal, instructions, backend)
+            job_lease_service.checkpoint(db, job, plan_v0_json=plan_v0)
+            
+            # 2. Sample run
+            image_ids = [
+                row.id for row in
+                db.query(Image.id).filter(Image.dataset_id == job.dataset_id).all()
+            ]
+            sample_ids = random.sample(image_ids, min(20, len(image_ids)))
+            sample_images = db.query(Image).filter(Image.id.in_(sample_ids)).all()
+            
+            sample_results = yolo_service.predict_batch_columns(
+                [Path(img.storage_uri) for img in sample_images],
+                model_name=plan_v0["model"],
+                imgsz=plan_v0["imgsz"],
+                conf=plan_v0["conf"],
+                iou=plan_v0["iou"],
+                max_det=plan_v0["max_det"],
+                min_box_area=plan_v0["postprocess"]["min_box_area"],
+                backend=plan_v0["backend"],
+                tiling=plan_v0["tiling"]
+            )
+            
+            # 3. Evaluate
+            metrics = agent_service.compute_sample_metrics(sample_results)
+            job_lease_service.checkpoint(db, job, sample_metrics_json=metrics)
+            
+            # 4. Refine
+            plan_v1 = agent_service.refine_plan(plan_v0, metrics)
+            job_lease_service.checkpoint(db, job, plan_v1_json=plan_v1)
+            
+            # 5. Full run with refined plan
+            final_plan = plan_v1
+        elif job.plan_v0_json:
+            final_plan = job.plan_v0_json
+        else:
+            # Direct mode: just use initial plan
+            final_plan = agent_service.create_initial_plan(goal, instructions, backend)
+            job_lease_service.checkpoint(db, job, plan_v0_json=final_plan)
+        
+        # Run on all images not yet checkpointed
+        run_prelabel_pipeline(db, job, final_plan)
+        
+        job_lease_service.checkpoint(
+            db, job,
+            status=JobStatus.COMPLETE,
+            finished_at=datetime.now(UTC),
+            lease_owner=None,
+            lease_expires_at=None
+        )
+        
+    except LeaseLostError:
+        logger.warning(f"Prelabel job {job_id} was taken over by another worker")
+    except Exception as e:
+        db.rollback()
+        if job is not None:
+            job.status = JobStatus.FAILED
+            job.error = str(e)
+            job.lease_owner = None
+            job.lease_expires_at = None
+            db.commit()
+        raise
+    finally:
+        db.close()
+
+def run_prelabel_pipeline(db: Session, job: Job, plan: Dict[str, Any]):
+    """Stream the job's remaining images through decode → inference → write.
+    
+    Stages run concurrently and talk through bounded queues, so decoding, the
+    model and the DB overlap while memory stays at a few batches:
+    
+    - reader thread: streams image rows (yield_per), groups them into
+      batches of the same model input shape by their stored width/height
+      (see _input_bucket; tiled images in batches of PRELABEL_TILED_BATCH_SIZE),
+      and submits each batch's decodes to a thread pool; images whose content
+      hash already has a stored prediction for these weights, backend, imgsz
+      and tiling skip decode and inference (unless the job was started with
+      `force_inference`)
+    - this thread: runs the model on one decoded batch at a time
+    - writer thread: puts results back in id order, stores predictions and
+      annotations and checkpoints the job (the only user of `db` until the
+      pipeline finishes)
+    """
+    
+    batch_size = settings.PRELABEL_BATCH_SIZE
+    decoded_q = queue.Queue(maxsize=settings.PRELABEL_PREFETCH_BATCHES)
+    write_q = queue.Queue(maxsize=2)
+    stop = threading.Event()
+    errors = []
+    
+    dataset_id = job.dataset_id
+    checkpoint_image_id = job.checkpoint_image_id
+    processed = job.processed or 0
+    throughput = JobThroughput(job.id, job.type.value)
+    # Plans stored before tiling existed never tile
+    tiling = plan.get("tiling")
+    reuse_predictions = not (job.params_json or {}).get("force_inference")
+    weights_id = yolo_service.weights_id(plan["model"])
+    
+    def backend() -> str:
+        # Asked again when storing: loading the model may have fallen back to torch
+        return yolo_service.resolve_backend(plan["model"], plan.get("backend", "torch"), plan["imgsz"])
+    
+    def fail(exc: BaseException):
+        errors.append(exc)
+        stop.set()
+    
+    def read_stage(decode_pool: ThreadPoolExecutor):
+        read_db = SessionLocal()
+        # Rows waiting for their bucket to fill, as (position in id order, row)
+        buckets: Dict[Any, List[Any]] = {}
+        buffered = 0
+        lookahead = batch_size * settings.PRELABEL_BUCKET_WINDOW
+        
+        def bucket_size(key) -> int:
+            # Tiled images stay decoded at full resolution until their batch is predicted
+            return settings.PRELABEL_TILED_BATCH_SIZE if key[0] == "tiles" else batch_size
+        
+        def flush(key) -> bool:
+            nonlocal buffered
+            entries = buckets.pop(key)
+            buffered -= len(entries)
+            return submit([seq for seq, _ in entries], [row for _, row in entries])
+        
+        def submit(seqs, batch):
+            # Identical bytes already predicted with these weights are reused, not decoded
+            cached = {}
+            if reuse_predictions:
+                for tiles, rows in _group_by_tiling(batch, tiling).items():
+                    cached.update(find_cached_predictions(
+                        read_db, [row.content_hash for row in rows], plan["model"], plan["imgsz"], tiles,
+                        weights_id=weights_id, backend=backend()
+                    ))
+            pending = []
+            for row in batch:
+                # Duplicates within the batch share one decode (and one prediction)
+                key = row.content_hash or row.id
+                if key not in cached:
+                    cached[key] = decode_pool.submit(decode_image, row.storage_uri)
+                pending.append(cached[key])
+            return _put(decoded_q, (seqs, batch, pending), stop)
+        
+        try:
+            query = read_db.query(
+                Image.id, Image.storage_uri, Image.content_hash, Image.width, Image.height
+            ).filter(Image.dataset_id == dataset_id)
+            if checkpoint_image_id is not None:
+                query = query.filter(Image.id > checkpoint_image_id)
+            
+            rows = query.order_by(Image.id).yield_per(PRELABEL_READ_CHUNK_SIZE)
+            for seq, row in enumerate(rows):
+                key = _input_bucket(row, plan["imgsz"], tiling)
+                buckets.setdefault(key, []).append((seq, row))
+                buffered += 1
+                if len(buckets[key]) == bucket_size(key):
+                    if not flush(key):
+                        return
+                elif buffered > lookahead:
+                    # Don't hold rare shapes back for long: the writer has to
+                    # buffer every result that comes after them
+                    if not flush(min(buckets, key=lambda k: buckets[k][0][0])):
+                        return
+            for key in sorted(buckets, key=lambda k: buckets[k][0][0]):
+                if not flush(key):
+                    return
+        except BaseException as e:
+            fail(e)
+        finally:
+            read_db.close()
+            _put(decoded_q, None, stop)
+    
+    def write_stage():
+        nonlocal processed
+        # Results that arrived ahead of an earlier image, by position in id order
+        done: Dict[int, Any] = {}
+        next_seq = 0
+        try:
+            while True:
+                item = _get(write_q, stop)
+                if item is None:
+                    return
+                seqs, batch, batch_columns = item
+                done.update(zip(seqs, zip(batch, batch_columns)))
+                
+                # Checkpoints mark everything up to an id as done, so only
+                # write once all earlier images are in
+                ready = []
+                while next_seq in done:
+                    ready.append(done.pop(next_seq))
+                    next_seq += 1
+                if not ready:
+                    continue
+                rows = [row for row, _ in ready]
+                raw_columns = [columns for _, columns in ready]
+                
+                columns_by_id = {row.id: columns for row, columns in zip(rows, raw_columns)}
+                for tiles, tiling_rows in _group_by_tiling(rows, tiling).items():
+                    store_predictions(
+                        db, tiling_rows, [columns_by_id[row.id] for row in tiling_rows],
+                        plan["model"], plan["imgsz"], tiles,
+                        weights_id=weights_id, backend=backend()
+                    )
+                annotation_writer.replace_yolo_annotations(
+                    db,
+                    dataset_id,
+                    [(row.id, apply_plan(columns, plan).to_dicts()) for row, columns in zip(rows, raw_columns)]
+                )
+                
+                # Results and checkpoint commit together
+                processed += len(rows)
+                job_lease_service.checkpoint(
+                    db, job,
+                    processed=processed,
+                    checkpoint_image_id=rows[-1].id
+                )
+                throughput.add(len(rows))
+        except BaseException as e:
+            fail(e)
+    
+    with ThreadPoolExecutor(
+        max_workers=settings.PRELABEL_DECODE_WORKERS,
+        thread_name_prefix="prelabel-decode"
+    ) as decode_pool:
+        # Stages run in the job's context so their queries count towards its stats
+        reader = threading.Thread(
+            target=contextvars.copy_context().run, args=(read_stage, decode_pool), name="prelabel-read"
+        )
+        writer = threading.Thread(
+            target=contextvars.copy_context().run, args=(write_stage,), name="prelabel-write"
+        )
+        reader.start()
+        writer.start()
+        
+        try:
+            while True:
+                item = _get(decoded_q, stop)
+                if item is None:
+                    break
+                seqs, rows, pending = item
+                
+                # Predict at the stored floor for images without a cached
+                # prediction; the writer applies the plan
+                futures = list({
+                    id(entry): entry for entry in pending if isinstance(entry, Future)
+                }.values())
+                predicted = {}
+                if futures:
+                    results = yolo_service.predict_batch_raw(
+                        [future.result() for future in futures],
+                        model_name=plan["model"],
+                        imgsz=plan["imgsz"],
+                        batch_size=batch_size,
+                        # Plans stored before backends existed ran on torch
+                        backend=plan.get("backend", "torch"),
+                        tiling=tiling
+                    )
+                    predicted = {id(future): columns for future, columns in zip(futures, results)}
+                
+                raw_columns = [
+                    predicted[id(entry)] if isinstance(entry, Future) else entry
+                    for entry in pending
+                ]
+                if not _put(write_q, (seqs, rows, raw_columns), stop):
+                    break
+        except BaseException as e:
+            fail(e)
+        finally:
+            _put(write_q, None, stop)
+            reader.join()
+            writer.join()
+            decode_pool.shutdown(cancel_futures=True)
+            throughput.close()
+    
+    if errors:
+        raise errors[0]
+
+def _put(q: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    """Blocking put that gives up once the pipeline is stopping."""
+    
+    while True:
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            if stop.is_set():
+                return False
+
+def _get(q: queue.Queue, stop: threading.Event) -> Any:
+    """Blocking get that returns None (end of stream) once the pipeline is stopping."""
+    
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return None
+
+def _input_bucket(row: Any, imgsz: int, tiling: Optional[Dict[str, Any]]) -> Any:
+    """Images with the same bucket run at the same model input shape.
+    
+    Worked out from the stored width/height, so images can be grouped before
+    they are decoded. Tiled images all run as tiles of one size.
+    """
+    
+    tiles = tiling_for(tiling, row.width, row.height)
+    if tiles is not None:
+        return ("tiles", tiles)
+    if settings.INFERENCE_RECT_BATCHES:
+        return ("rect", rect_input_shape(row.width, row.height, imgsz))
+    return ("square", imgsz)
+
+def _group_by_tiling(rows: Sequence[Any], tiling: Optional[Dict[str, Any]]) -> Dict[Optional[Tiling], List[Any]]:
+    """Split image rows by the tiling (or None) they are predicted with."""
+    
+    groups = {}
+    for row in rows:
+        groups.setdefault(tiling_for(tiling, row.width, row.height), []).append(row)
+    return groups
+
+def apply_plan(columns: BoxColumns, plan: Dict[str, Any]) -> BoxColumns:
+    """Filter raw stored predictions down to what the plan would have produced."""
+    
+    if plan["iou"] > settings.PREDICTION_IOU or plan["conf"] < settings.PREDICTION_CONF_FLOOR:
+        logger.warning(
+            "Plan thresholds (conf=%s, iou=%s) are looser than the stored prediction floor",
+            plan["conf"], plan["iou"]
+        )
+    
+    return columns.rethreshold(
+        conf=plan["conf"],
+        iou=plan["iou"],
+        max_det=plan["max_det"],
+        min_box_area=plan["postprocess"]["min_box_area"],
+    )
+
+def find_cached_predictions(
+    db: Session,
+    content_hashes: Sequence[Optional[str]],
+    model_name: str,
+    imgsz: int,
+    tiling: Optional[Tiling] = None,
+    *,
+    weights_id: str,
+    backend: str
+) -> Dict[str, BoxColumns]:
+    """Stored raw predictions for any image with these content hashes.
+    
+    Only predictions made by the same weights (see YOLOService.weights_id)
+    on the same backend, with the current floor settings and the same
+    tiling (None: whole image), are reused.
+    """
+    
+    tile_size, tile_overlap = tiling or (None, None)
+    
+    hashes = {content_hash for content_hash in content_hashes if content_hash}
+    if not hashes:
+        return {}
+    
+    rows = db.query(Image.content_hash, Prediction.boxes).join(
+        Image, Image.id == Prediction.image_id
+    ).filter(
+        Image.content_hash.in_(hashes),
+        Prediction.model_name == model_name,
+        Prediction.imgsz == imgsz,
+        Prediction.weights_id == weights_id,
+        Prediction.backend == backend,
+        Prediction.conf_floor == settings.PREDICTION_CONF_FLOOR,
+        Prediction.iou == settings.PREDICTION_IOU,
+        Prediction.max_det == settings.PREDICTION_MAX_DET,
+        Prediction.tile_size == tile_size,
+        Prediction.tile_overlap == tile_overlap
+    ).all()
+    
+    return {row.content_hash: BoxColumns.from_bytes(row.boxes) for row in rows}
+
+def store_predictions(
+    db: Session,
+    images: Sequence[Any],
+    raw_columns: List[BoxColumns],
+    model_name: str,
+    imgsz: int,
+    tiling: Optional[Tiling] = None,
+    *,
+    weights_id: str,
+    backend: str
+):
+    """Replace the stored raw predictions for these images (not committed).
+    
+    `images` can be Image objects or any rows with an `id`.
+    """
+    
+    tile_size, tile_overlap = tiling or (None, None)
+    
+    db.query(Prediction).filter(
+        Prediction.image_id.in_([img.id for img in images]),
+        Prediction.model_name == model_name,
+        Prediction.imgsz == imgsz
+    ).delete(synchronize_session=False)
+    
+    db.add_all([
+        Prediction(
+            image_id=img.id,
+            model_name=model_name,
+            imgsz=imgsz,
+            weights_id=weights_id,
+            backend=backend,
+            conf_floor=settings.PREDICTION_CONF_FLOOR,
+            iou=settings.PREDICTION_IOU,
+            max_det=settings.PREDICTION_MAX_DET,
+            tile_size=tile_size,
+            tile_overlap=tile_overlap,
+            boxes=columns.to_bytes()
+        )
+        for img, columns in zip(images, raw_columns)
+    ])
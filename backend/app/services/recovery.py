@@ -0,0 +1,92 @@
+from typing import Optional
+import logging
+import threading
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.jobs import JobType
+from app.services.executor import job_executor
+from app.services.leases import job_lease_service
+from app.services.prelabel import run_prelabel_job
+from app.services.export import export_service, run_export_job
+
+logger = logging.getLogger(__name__)
+
+# Entry point per job type; each takes only the job id and resumes from the DB
+JOB_RUNNERS = {
+    JobType.PRELABEL: run_prelabel_job,
+    JobType.EXPORT: run_export_job,
+}
+
+class JobRecoveryMonitor:
+    """Resubmits queued jobs and jobs whose lease expired (e.g. after a restart).
+    
+    Runs once at startup and then every JOB_RECOVERY_INTERVAL_SECONDS, since a
+    crashed worker's lease is still valid for a while after the crash. Each
+    pass also deletes expired export artifacts.
+    """
+    
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="job-recovery", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+    
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.resume_stale_jobs()
+            except Exception:
+                logger.exception("Job recovery sweep failed")
+            try:
+                self.purge_expired_exports()
+            except Exception:
+                logger.exception("Export artifact cleanup failed")
+            self._stop.wait(self.interval)
+    
+    def resume_stale_jobs(self) -> int:
+        """Submit every resumable job not already queued here. Returns how many were submitted."""
+        
+        db = SessionLocal()
+        try:
+            jobs = job_lease_service.resumable_jobs(db)
+        finally:
+            db.close()
+        
+        submitted = 0
+        for job in jobs:
+            runner = JOB_RUNNERS.get(job.type)
+            if runner is None or job_executor.is_pending(job.id):
+                continue
+            if not job_executor.has_capacity():
+                break
+            
+            logger.info(f"Resuming {job.type.value} job {job.id} from {job.processed}/{job.total}")
+            job_executor.submit(runner, job.id)
+            submitted += 1
+        
+        return submitted
+
+    def purge_expired_exports(self) -> int:
+        db = SessionLocal()
+        try:
+            removed = export_service.purge_expired(db)
+        finally:
+            db.close()
+        if removed:
+            logger.info(f"Deleted {removed} expired export artifact(s)")
+        return removed
+
+job_recovery = JobRecoveryMonitor(interval=settings.JOB_RECOVERY_INTERVAL_SECONDS)
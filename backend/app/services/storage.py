@@ -0,0 +1,155 @@
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects import postgresql, sqlite
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Tuple
+import hashlib
+import logging
+import os
+import uuid
+
+from app.models.blob import Blob
+from app.services.thumbnails import thumbnail_service
+
+logger = logging.getLogger(__name__)
+
+# Use absolute path to project root
+BLOB_BASE = Path(__file__).parent.parent.parent.parent / "data" / "blobs"
+
+# Bytes hashed and copied per read
+STORE_CHUNK_SIZE = 1024 * 1024
+
+class ContentStore:
+    """Content-addressed file store: files are named by their SHA-256.
+    
+    Files live at `<root>/<h[0:2]>/<h[2:4]>/<h>`, so no directory grows past a
+    few thousand entries. Identical bytes are stored once; the `blobs` table
+    counts how many images reference each file.
+    
+    `put` may find a file that a concurrent delete is about to remove, so
+    writers commit their references first and then `restore` anything that
+    went missing; `remove_files` unlinks only while holding the blob row.
+    """
+    
+    def __init__(self, root: Path):
+        self.root = root
+    
+    def path_for(self, sha256: str) -> Path:
+        return self.root / sha256[:2] / sha256[2:4] / sha256
+    
+    def put(self, source: BinaryIO) -> Tuple[str, Path, int, bool]:
+        """Stream `source` into the store.
+        
+        Returns (sha256, path, size, created); `created` is False when the
+        same bytes were already stored. The file is only safe to rely on once
+        a reference to it has been committed (see `restore`).
+        """
+        
+        tmp_dir = self.root / "tmp"
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = tmp_dir / uuid.uuid4().hex
+        
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with tmp_path.open("wb") as out:
+                while chunk := source.read(STORE_CHUNK_SIZE):
+                    digest.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+            
+            sha256 = digest.hexdigest()
+            path = self.path_for(sha256)
+            if path.exists():
+                return sha256, path, size, False
+            
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_path, path)
+            return sha256, path, size, True
+        finally:
+            tmp_path.unlink(missing_ok=True)
+    
+    def restore(self, sha256: str, source: BinaryIO) -> bool:
+        """Store `source` again if the file for `sha256` is gone. True if it was.
+        
+        Call after committing a reference to `sha256`: a delete that released
+        the last reference between `put` and that commit may have removed it.
+        """
+        
+        if self.path_for(sha256).exists():
+            return False
+        source.seek(0)
+        stored, _, _, _ = self.put(source)
+        if stored != sha256:
+            raise ValueError(f"Source no longer matches {sha256}")
+        return True
+    
+    def add_refs(self, db: Session, sizes: Dict[str, int], counts: Dict[str, int]):
+        """Increment reference counts, creating blob rows as needed (not committed)."""
+        
+        if not counts:
+            return
+        
+        dialect = sqlite if db.get_bind().dialect.name == "sqlite" else postgresql
+        # Rows are locked in hash order so concurrent writers can't deadlock
+        stmt = dialect.insert(Blob).values([
+            {"sha256": sha256, "size": sizes[sha256], "refcount": counts[sha256]}
+            for sha256 in sorted(counts)
+        ])
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[Blob.sha256],
+            set_={"refcount": Blob.refcount + stmt.excluded.refcount}
+        ))
+    
+    def release_refs(self, db: Session, counts: Dict[str, int]) -> List[str]:
+        """Decrement reference counts (not committed).
+        
+        Returns the hashes that reached zero. Their rows stay until the
+        caller passes them to `remove_files` after committing.
+        """
+        
+        if not counts:
+            return []
+        
+        for sha256, count in sorted(counts.items()):
+            db.query(Blob).filter(Blob.sha256 == sha256).update(
+                {Blob.refcount: Blob.refcount - count}, synchronize_session=False
+            )
+        
+        return [
+            row.sha256 for row in
+            db.query(Blob.sha256).filter(
+                Blob.sha256.in_(list(counts)),
+                Blob.refcount <= 0
+            ).all()
+        ]
+    
+    def remove_files(self, db: Session, sha256s: List[str]):
+        """Delete the files of blobs that are still unreferenced, then commit.
+        
+        The blob rows are deleted first and each file is unlinked before the
+        commit, so the row lock is held meanwhile. An upload taking a new
+        reference either committed first (the row is kept, so is the file) or
+        waits for the lock and then finds the file gone and restores it.
+        Hashes without a row, stored by a failed upload, get a zero count
+        first so they are locked the same way. Thumbnail variants, keyed by
+        the same hash, go with the file.
+        """
+        
+        if not sha256s:
+            return
+        
+        zero = {sha256: 0 for sha256 in sha256s}
+        self.add_refs(db, sizes=zero, counts=zero)
+        removed = db.execute(
+            delete(Blob).where(
+                Blob.sha256.in_(sha256s),
+                Blob.refcount <= 0
+            ).returning(Blob.sha256)
+        ).scalars().all()
+        for sha256 in removed:
+            self.path_for(sha256).unlink(missing_ok=True)
+            thumbnail_service.remove_variants(sha256)
+        db.commit()
+
+content_store = ContentStore(BLOB_BASE)
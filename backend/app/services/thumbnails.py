@@ -0,0 +1,62 @@
+from pathlib import Path
+from typing import Union
+from PIL import Image as PILImage, ImageOps
+import os
+import uuid
+
+# Lazily generated WebP variants, cached on disk next to the originals
+THUMBNAIL_BASE = Path(__file__).parent.parent.parent.parent / "data" / "thumbnails"
+
+# Longest side in pixels for each resized variant
+IMAGE_VARIANTS = {
+    "thumb": 256,
+    "preview": 1024,
+}
+
+class ThumbnailService:
+    """Resized WebP variants of uploaded images for galleries and previews."""
+    
+    def variant_path(self, key: Union[str, uuid.UUID], size: str) -> Path:
+        key = str(key)
+        return THUMBNAIL_BASE / size / key[:2] / f"{key}.webp"
+    
+    def get_variant(self, key: Union[str, uuid.UUID], source_path: Path, size: str) -> Path:
+        """Return the cached variant, generating it on first use.
+        
+        `key` is the image's content hash, so identical uploads share variants
+        (or the image id for files stored before the content store).
+        
+        Generation writes to a temp file and renames it, so concurrent
+        requests for the same variant never see a partial file.
+        """
+        
+        path = self.variant_path(key, size)
+        if path.exists():
+            return path
+        
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        
+        try:
+            with PILImage.open(source_path) as img:
+                # draft() lets JPEG decode at a reduced scale instead of full size
+                img.draft("RGB", (IMAGE_VARIANTS[size], IMAGE_VARIANTS[size]))
+                img = ImageOps.exif_transpose(img)
+                if img.mode not in ("RGB", "RGBA"):
+                    img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+                img.thumbnail((IMAGE_VARIANTS[size], IMAGE_VARIANTS[size]))
+                img.save(tmp_path, format="WEBP", quality=80, method=4)
+            os.replace(tmp_path, path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+        
+        return path
+    
+    def remove_variants(self, key: Union[str, uuid.UUID]):
+        """Delete every cached variant of `key` (once its original is gone)."""
+        
+        for size in IMAGE_VARIANTS:
+            self.variant_path(key, size).unlink(missing_ok=True)
+
+thumbnail_service = ThumbnailService()
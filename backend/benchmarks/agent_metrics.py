@@ -0,0 +1,137 @@
+"""Time AgentService.compute_sample_metrics against the per-pair Python loop
+it replaced, as detections per image grow.
+    
+    python -m benchmarks.agent_metrics --detections 10,50,100,200,300
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+def reference_sample_metrics(sample_results: List[List[Dict]]) -> Dict[str, Any]:
+    """The original implementation: every pair of boxes compared in Python."""
+    
+    all_det_counts = []
+    all_confidences = []
+    zero_det_count = 0
+    overlap_count = 0
+    total_boxes = 0
+    tiny_box_count = 0
+    
+    for image_boxes in sample_results:
+        det_count = len(image_boxes)
+        all_det_counts.append(det_count)
+        
+        if det_count == 0:
+            zero_det_count += 1
+            continue
+        
+        for i, box1 in enumerate(image_boxes):
+            all_confidences.append(box1["confidence"])
+            if box1["w"] * box1["h"] < 100:
+                tiny_box_count += 1
+            for box2 in image_boxes[i+1:]:
+                if _reference_iou(box1, box2) > 0.8:
+                    overlap_count += 1
+            total_boxes += 1
+    
+    return {
+        "avg_dets_per_image": statistics.mean(all_det_counts) if all_det_counts else 0,
+        "pct_zero_det_images": zero_det_count / len(sample_results) if sample_results else 0,
+        "avg_confidence": statistics.mean(all_confidences) if all_confidences else 0,
+        "overlap_rate": overlap_count / max(1, total_boxes),
+        "tiny_box_ratio": tiny_box_count / max(1, total_boxes),
+    }
+
+def _reference_iou(box1: Dict, box2: Dict) -> float:
+    inter_x_min = max(box1["x"], box2["x"])
+    inter_y_min = max(box1["y"], box2["y"])
+    inter_x_max = min(box1["x"] + box1["w"], box2["x"] + box2["w"])
+    inter_y_max = min(box1["y"] + box1["h"], box2["y"] + box2["h"])
+    
+    if inter_x_max <= inter_x_min or inter_y_max <= inter_y_min:
+        return 0.0
+    
+    inter_area = (inter_x_max - inter_x_min) * (inter_y_max - inter_y_min)
+    union_area = box1["w"] * box1["h"] + box2["w"] * box2["h"] - inter_area
+    return inter_area / union_area if union_area > 0 else 0.0
+
+def make_sample(images: int, detections: int, seed: int = 0) -> List[List[Dict[str, Any]]]:
+    """Sample results shaped like predict_batch output, with some near-duplicates."""
+    
+    rng = np.random.default_rng(seed)
+    sample = []
+    for _ in range(images):
+        w = rng.uniform(4, 120, detections)
+        h = rng.uniform(4, 120, detections)
+        x = rng.uniform(0, 640 - w)
+        y = rng.uniform(0, 480 - h)
+        # Every tenth box nearly repeats the previous one
+        dup = np.arange(detections) % 10 == 9
+        x[dup] = x[np.flatnonzero(dup) - 1] + 1
+        y[dup] = y[np.flatnonzero(dup) - 1] + 1
+        w[dup] = w[np.flatnonzero(dup) - 1]
+        h[dup] = h[np.flatnonzero(dup) - 1]
+        conf = rng.uniform(0.05, 1.0, detections)
+        sample.append([
+            {"x": a, "y": b, "w": c, "h": d, "confidence": e, "label": "object"}
+            for a, b, c, d, e in zip(x.tolist(), y.tolist(), w.tolist(), h.tolist(), conf.tolist())
+        ])
+    return sample
+
+def best_of(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark agent sample metrics")
+    parser.add_argument("--detections", default="10,50,100,200,300", help="Comma-separated boxes per image")
+    parser.add_argument("--images", type=int, default=20, help="Images per sample (agent mode samples 20)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", help="Also write the results as JSON")
+    args = parser.parse_args(argv)
+    
+    # Only settings are needed, not a database
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-not-for-production")
+    from app.services.agent import agent_service
+    
+    results = []
+    print(f"{'detections':>10} {'loop ms':>10} {'numpy ms':>10} {'speedup':>8}")
+    for detections in [int(n) for n in args.detections.split(",")]:
+        sample = make_sample(args.images, detections)
+        
+        expected = reference_sample_metrics(sample)
+        actual = agent_service.compute_sample_metrics(sample)
+        for key, value in expected.items():
+            if not np.isclose(actual[key], value):
+                print(f"Mismatch at {detections} detections: {key} {actual[key]} != {value}", file=sys.stderr)
+                return 1
+        
+        loop = best_of(lambda: reference_sample_metrics(sample), args.repeat)
+        vectorized = best_of(lambda: agent_service.compute_sample_metrics(sample), args.repeat)
+        results.append({
+            "detections": detections,
+            "images": args.images,
+            "loop_seconds": loop,
+            "numpy_seconds": vectorized,
+            "speedup": loop / vectorized,
+        })
+        print(f"{detections:>10} {loop * 1000:>10.2f} {vectorized * 1000:>10.2f} {loop / vectorized:>7.1f}x")
+    
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"results": results}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""Compare two benchmark result files (see benchmarks.run).
+    
+    python -m benchmarks.compare base.json head.json --threshold 0.10
+
+Prints the median time of every scenario/size found in both files and exits
+with status 1 when any of them got slower than the threshold allows.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import json
+import sys
+
+Key = Tuple[str, int, int]
+
+def load(path: str) -> Tuple[Dict[str, Any], Dict[Key, Dict[str, Any]]]:
+    with open(path) as f:
+        data = json.load(f)
+    results = {
+        (result["scenario"], result["size"], result["boxes"]): result
+        for result in data["results"]
+    }
+    return data["meta"], results
+
+def compare(
+    base: Dict[Key, Dict[str, Any]],
+    head: Dict[Key, Dict[str, Any]],
+    threshold: float,
+) -> Tuple[List[str], List[Key]]:
+    """Table lines and the keys whose median grew by more than `threshold`."""
+    
+    lines = [f"{'scenario':<18} {'size':>7} {'base ms':>11} {'head ms':>11} {'change':>8}"]
+    regressions = []
+    for key in sorted(base.keys() & head.keys()):
+        before = base[key]["median"]
+        after = head[key]["median"]
+        change = (after - before) / before if before > 0 else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        elif change < -threshold:
+            flag = "  faster"
+        lines.append(
+            f"{key[0]:<18} {key[1]:>7} {before * 1000:>11.1f} {after * 1000:>11.1f} {change:>+8.1%}{flag}"
+        )
+    return lines, regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two Orion benchmark runs")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown of the median (0.10 = 10%%)")
+    args = parser.parse_args(argv)
+    
+    base_meta, base = load(args.base)
+    head_meta, head = load(args.head)
+    
+    for label, meta in (("base", base_meta), ("head", head_meta)):
+        print(f"{label}: {meta.get('commit')}{' (dirty)' if meta.get('dirty') else ''} "
+              f"{meta.get('db_backend')} python {meta.get('python')} {meta.get('timestamp')}")
+    if base_meta.get("platform") != head_meta.get("platform"):
+        print("warning: runs are from different platforms, timings may not be comparable")
+    
+    lines, regressions = compare(base, head, args.threshold)
+    print("\n".join(lines))
+    
+    missing = sorted(base.keys() ^ head.keys())
+    if missing:
+        print(f"only in one file: {', '.join(f'{name}@{size}' for name, size, _ in missing)}")
+    
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
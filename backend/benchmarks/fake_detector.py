@@ -0,0 +1,103 @@
+from pathlib import Path
+from typing import List, Sequence, Union
+import time
+import zlib
+
+import numpy as np
+from PIL import Image as PILImage
+
+class _Tensor:
+    """Just enough of a torch tensor for YOLOService._result_to_columns."""
+    
+    def __init__(self, data: np.ndarray):
+        self.data = data
+    
+    def cpu(self) -> "_Tensor":
+        return self
+    
+    def numpy(self) -> np.ndarray:
+        return self.data
+
+class _Boxes:
+    def __init__(self, data: np.ndarray):
+        self.data = _Tensor(data)
+    
+    def __len__(self) -> int:
+        return len(self.data.data)
+
+class _Result:
+    def __init__(self, data: np.ndarray):
+        self.boxes = _Boxes(data)
+
+class FakeDetector:
+    """Deterministic stand-in for an ultralytics YOLO model.
+    
+    The same image always gets the same boxes: they are drawn from an RNG
+    seeded with a checksum of the pixels. Each image gets `boxes_per_image`
+    candidates with confidences spread over (0, 1), and the usual conf,
+    max_det and class-aware NMS arguments are honoured. `latency_per_image`
+    adds a fixed sleep per image to mimic a real forward pass.
+    """
+    
+    def __init__(self, boxes_per_image: int = 20, latency_per_image: float = 0.0, classes: int = 3):
+        self.boxes_per_image = boxes_per_image
+        self.latency_per_image = latency_per_image
+        self.classes = classes
+    
+    def predict(
+        self,
+        source: Sequence[Union[str, Path, np.ndarray]],
+        imgsz: int = 640,
+        conf: float = 0.25,
+        iou: float = 0.7,
+        max_det: int = 300,
+        batch: int = 1,
+        verbose: bool = False,
+        **kwargs,
+    ) -> List[_Result]:
+        # Imported here so the benchmark package loads before app settings exist
+        from app.services.inference import BoxColumns, nms
+        
+        results = []
+        for src in source:
+            pixels = self._load(src)
+            height, width = pixels.shape[:2]
+            rng = np.random.default_rng(zlib.crc32(pixels[::7, ::7].tobytes()))
+            
+            n = self.boxes_per_image
+            w = rng.uniform(0.02, 0.3, n) * width
+            h = rng.uniform(0.02, 0.3, n) * height
+            x = rng.uniform(0, 1, n) * (width - w)
+            y = rng.uniform(0, 1, n) * (height - h)
+            scores = rng.uniform(0.01, 1.0, n)
+            classes = rng.integers(0, self.classes, n)
+            
+            columns = BoxColumns(
+                x.astype(np.float32), y.astype(np.float32),
+                w.astype(np.float32), h.astype(np.float32),
+                scores.astype(np.float32), classes.astype(np.float32),
+            )
+            columns = columns.select(columns.conf >= conf)
+            columns = columns.select(nms(columns, iou)[:max_det])
+            
+            data = np.stack([
+                columns.x, columns.y, columns.x + columns.w, columns.y + columns.h,
+                columns.conf, columns.cls,
+            ], axis=1).astype(np.float32)
+            results.append(_Result(data))
+        
+        if self.latency_per_image:
+            time.sleep(self.latency_per_image * len(source))
+        return results
+    
+    def _load(self, src: Union[str, Path, np.ndarray]) -> np.ndarray:
+        if isinstance(src, np.ndarray):
+            return src
+        with PILImage.open(src) as img:
+            return np.asarray(img.convert("RGB"))[:, :, ::-1]
+    
+    def install(self, service) -> "FakeDetector":
+        """Make `service` (a YOLOService) use this detector for every model name."""
+        
+        service.load_model = lambda model_name, backend="torch", imgsz=640: self
+        return self
@@ -0,0 +1,153 @@
+"""Run the benchmark scenarios and write the timings as JSON.
+    
+    python -m benchmarks.run --sizes 100,1000 --repeat 5 --out results.json
+
+Without --database-url a throwaway SQLite database is used. A Postgres URL
+must point at a database that already has the schema (alembic upgrade head);
+the benchmark removes the data it creates, but use a scratch database anyway.
+"""
+from datetime import datetime, UTC
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Orion backend benchmarks")
+    parser.add_argument("--database-url", help="SQLAlchemy URL (default: a temporary SQLite file)")
+    parser.add_argument("--sizes", default="100,1000", help="Comma-separated dataset sizes (images)")
+    parser.add_argument("--boxes", type=int, default=10, help="Annotations per generated image")
+    parser.add_argument("--detections", type=int, default=20, help="Candidate boxes the fake detector makes per image")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds the fake detector sleeps per image")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per scenario")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs per scenario before timing")
+    parser.add_argument("--scenarios", help="Comma-separated scenario names (default: all)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="benchmark-results.json", help="Where to write the JSON results")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    workdir = Path(tempfile.mkdtemp(prefix="orion-bench-"))
+    
+    # Settings are read when app modules are imported, so set them up first
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{workdir / 'bench.sqlite'}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-not-for-production")
+    # Headers and per-request stats stay on: they are part of what is measured
+    logging.basicConfig(level=logging.WARNING)
+    
+    from app.core.database import Base, SessionLocal, engine
+    from app.services import export
+    from app.services.inference import yolo_service
+    from app.services.storage import content_store
+    from benchmarks.fake_detector import FakeDetector
+    from benchmarks.scenarios import SCENARIOS, cleanup_dataset, make_client
+    from benchmarks.synthetic import generate_dataset
+    import app.models  # noqa: F401 (registers every table for create_all)
+    
+    if engine.dialect.name == "sqlite":
+        Base.metadata.create_all(engine)
+    content_store.root = workdir / "storage"
+    export.EXPORT_BASE = workdir / "exports"
+    FakeDetector(boxes_per_image=args.detections, latency_per_image=args.latency).install(yolo_service)
+    
+    names = args.scenarios.split(",") if args.scenarios else list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})", file=sys.stderr)
+        return 2
+    
+    sizes = [int(s) for s in args.sizes.split(",")]
+    if "export_job" in names and max(sizes) <= export.EXPORT_PROGRESS_EVERY:
+        print(f"warning: export_job only checkpoints mid-export above {export.EXPORT_PROGRESS_EVERY} images; "
+              f"add a larger size to --sizes", file=sys.stderr)
+    
+    results = []
+    for size in sizes:
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            dataset = generate_dataset(db, size, args.boxes, seed=args.seed)
+        finally:
+            db.close()
+        print(f"generated {size} images x {args.boxes} boxes in {time.perf_counter() - started:.2f}s")
+        
+        client = make_client(dataset)
+        try:
+            for name in names:
+                scenario = SCENARIOS[name](dataset, client, args.boxes)
+                seconds = []
+                for i in range(args.warmup + args.repeat):
+                    scenario.setup()
+                    started = time.perf_counter()
+                    scenario.run()
+                    elapsed = time.perf_counter() - started
+                    if i >= args.warmup:
+                        seconds.append(elapsed)
+                result = summarize(name, size, args.boxes, scenario.items(), seconds)
+                results.append(result)
+                print(f"  {name:<18} {size:>7} images  median {result['median'] * 1000:10.1f} ms  "
+                      f"({result['per_item_ms']:.3f} ms/item)")
+        finally:
+            client.close()
+            cleanup_dataset(dataset)
+    
+    output = {"meta": environment(args, engine.dialect.name), "results": results}
+    Path(args.out).write_text(json.dumps(output, indent=2))
+    print(f"wrote {args.out}")
+    engine.dispose()
+    shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+def summarize(name: str, size: int, boxes: int, items: int, seconds: List[float]) -> Dict[str, Any]:
+    median = statistics.median(seconds)
+    return {
+        "scenario": name,
+        "size": size,
+        "boxes": boxes,
+        "items": items,
+        "seconds": seconds,
+        "median": median,
+        "min": min(seconds),
+        "max": max(seconds),
+        "stdev": statistics.stdev(seconds) if len(seconds) > 1 else 0.0,
+        "per_item_ms": median * 1000 / max(1, items),
+    }
+
+def environment(args: argparse.Namespace, db_backend: str) -> Dict[str, Any]:
+    """What the results depend on besides the code, for comparing runs."""
+    
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": datetime.now(UTC).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "db_backend": db_backend,
+        "args": {
+            key: value for key, value in vars(args).items()
+            if key not in ("database_url", "out")
+        },
+    }
+
+def _git(*command: str) -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", *command], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+if __name__ == "__main__":
+    sys.exit(main())
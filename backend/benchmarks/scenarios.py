@@ -0,0 +1,304 @@
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Type
+import abc
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import delete, select
+
+from app.core.database import SessionLocal
+from app.core.security import create_access_token
+from app.main import app
+from app.models.annotation import Annotation
+from app.models.dataset import Dataset
+from app.models.image import Image
+from app.models.jobs import Job, JobStatus, JobType
+from app.models.prediction import Prediction
+from app.models.user import User
+from app.routes.images import MAX_PAGE_SIZE
+from app.services.agent import agent_service
+from app.services.export import run_export_job
+from app.services.inference import yolo_service
+from app.services.prelabel import run_prelabel_job
+from app.services.storage import content_store
+from benchmarks.synthetic import SyntheticDataset
+
+# Images sampled by agent mode before the full run (see run_prelabel_job)
+AGENT_SAMPLE_SIZE = 20
+# Images whose annotations are replaced per annotation_put run
+PUT_IMAGES = 50
+# Page size used by list_images_page
+PAGE_SIZE = 100
+
+class Scenario(abc.ABC):
+    """One timed operation on a synthetic dataset.
+    
+    `setup` runs untimed before every repeat, `run` is the timed part and
+    `items` is how many units (images, usually) one run processes.
+    """
+    
+    name = ""
+    
+    def __init__(self, dataset: SyntheticDataset, client: TestClient, boxes: int):
+        self.dataset = dataset
+        self.client = client
+        self.boxes = boxes
+    
+    def setup(self):
+        pass
+    
+    @abc.abstractmethod
+    def run(self):
+        """The timed operation."""
+    
+    def items(self) -> int:
+        return len(self.dataset.image_ids)
+
+class PrelabelScenario(Scenario):
+    """Direct-mode prelabel job with no cached predictions."""
+    
+    name = "prelabel"
+    
+    def setup(self):
+        db = SessionLocal()
+        try:
+            db.execute(delete(Prediction).where(Prediction.image_id.in_(
+                select(Image.id).where(Image.dataset_id == self.dataset.dataset_id)
+            )))
+            db.commit()
+        finally:
+            db.close()
+        self.job_id = _create_prelabel_job(self.dataset)
+    
+    def run(self):
+        run_prelabel_job(self.job_id)
+        _check_job(self.job_id)
+
+class PrelabelCachedScenario(Scenario):
+    """Prelabel job served from predictions stored by an earlier run."""
+    
+    name = "prelabel_cached"
+    
+    def setup(self):
+        db = SessionLocal()
+        try:
+            cached = db.query(Prediction.id).join(Image).filter(
+                Image.dataset_id == self.dataset.dataset_id
+            ).first()
+        finally:
+            db.close()
+        if cached is None:
+            # Fill the cache once, outside the timing
+            job_id = _create_prelabel_job(self.dataset)
+            run_prelabel_job(job_id)
+            _check_job(job_id)
+        self.job_id = _create_prelabel_job(self.dataset)
+    
+    def run(self):
+        run_prelabel_job(self.job_id)
+        _check_job(self.job_id)
+
+class ExportScenario(Scenario):
+    """Streaming JSON export (GET /datasets/{id}/export), read to the end."""
+    
+    name = "export_dataset"
+    
+    def run(self):
+        response = self.client.get(f"/datasets/{self.dataset.dataset_id}/export")
+        response.raise_for_status()
+        len(response.content)
+
+class ExportJobScenario(Scenario):
+    """Background COCO export job, artifact written to disk.
+    
+    The job checkpoints every EXPORT_PROGRESS_EVERY images, so only sizes
+    above that exercise checkpointing while rows are being streamed.
+    """
+    
+    name = "export_job"
+    
+    def setup(self):
+        db = SessionLocal()
+        try:
+            job = Job(
+                dataset_id=self.dataset.dataset_id,
+                type=JobType.EXPORT,
+                status=JobStatus.QUEUED,
+                total=len(self.dataset.image_ids),
+                params_json={"format": "coco"}
+            )
+            db.add(job)
+            db.commit()
+            self.job_id = job.id
+        finally:
+            db.close()
+    
+    def run(self):
+        run_export_job(self.job_id)
+        _check_job(self.job_id)
+
+class ListImagesScenario(Scenario):
+    """The whole image list, page by page at the largest page size, as the UI loads it."""
+    
+    name = "list_images"
+    
+    def run(self):
+        cursor = None
+        while True:
+            params = {"limit": MAX_PAGE_SIZE}
+            if cursor:
+                params["cursor"] = cursor
+            response = self.client.get(f"/datasets/{self.dataset.dataset_id}/images", params=params)
+            response.raise_for_status()
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+
+class ListImagesPageScenario(Scenario):
+    """The last page of the image list, reached by keyset cursor."""
+    
+    name = "list_images_page"
+    
+    def setup(self):
+        self.cursor = None
+        skip = len(self.dataset.image_ids) - PAGE_SIZE
+        while skip > 0:
+            params = {"limit": min(skip, MAX_PAGE_SIZE)}
+            if self.cursor:
+                params["cursor"] = self.cursor
+            response = self.client.get(f"/datasets/{self.dataset.dataset_id}/images", params=params)
+            response.raise_for_status()
+            self.cursor = response.headers.get("X-Next-Cursor")
+            skip -= params["limit"]
+    
+    def run(self):
+        params = {"limit": PAGE_SIZE}
+        if self.cursor:
+            params["cursor"] = self.cursor
+        response = self.client.get(f"/datasets/{self.dataset.dataset_id}/images", params=params)
+        response.raise_for_status()
+    
+    def items(self) -> int:
+        return min(PAGE_SIZE, len(self.dataset.image_ids))
+
+class AnnotationPutScenario(Scenario):
+    """Replace all annotations of PUT_IMAGES images, one request each."""
+    
+    name = "annotation_put"
+    
+    def setup(self):
+        self.image_ids = self.dataset.image_ids[:PUT_IMAGES]
+        self.body = {"annotations": [
+            {"label": f"class{i % 3}", "x": 2.0 * i, "y": 1.5 * i, "w": 20.0, "h": 15.0}
+            for i in range(self.boxes)
+        ]}
+    
+    def run(self):
+        for image_id in self.image_ids:
+            response = self.client.put(f"/images/{image_id}/annotations", json=self.body)
+            response.raise_for_status()
+    
+    def items(self) -> int:
+        return len(self.image_ids)
+
+class AgentMetricsScenario(Scenario):
+    """Agent-mode evaluation of a sample run (compute_sample_metrics)."""
+    
+    name = "agent_metrics"
+    
+    def setup(self):
+        if hasattr(self, "sample_results"):
+            return
+        db = SessionLocal()
+        try:
+            paths = [
+                Path(uri) for (uri,) in db.query(Image.storage_uri).filter(
+                    Image.id.in_(self.dataset.image_ids[:AGENT_SAMPLE_SIZE])
+                )
+            ]
+        finally:
+            db.close()
+        plan = agent_service.create_initial_plan("fast")
+        self.sample_results = yolo_service.predict_batch(
+            paths,
+            model_name=plan["model"],
+            imgsz=plan["imgsz"],
+            conf=plan["conf"],
+            iou=plan["iou"],
+            max_det=plan["max_det"],
+            min_box_area=0
+        )
+    
+    def run(self):
+        agent_service.compute_sample_metrics(self.sample_results)
+    
+    def items(self) -> int:
+        return len(self.sample_results)
+
+SCENARIOS: Dict[str, Type[Scenario]] = {
+    scenario.name: scenario for scenario in (
+        PrelabelScenario,
+        PrelabelCachedScenario,
+        ExportScenario,
+        ExportJobScenario,
+        ListImagesScenario,
+        ListImagesPageScenario,
+        AnnotationPutScenario,
+        AgentMetricsScenario,
+    )
+}
+
+def make_client(dataset: SyntheticDataset) -> TestClient:
+    """A client logged in as the dataset's owner (no lifespan: jobs run inline)."""
+    
+    client = TestClient(app)
+    client.cookies.set("access_token", create_access_token({"sub": str(dataset.user_id)}))
+    return client
+
+def cleanup_dataset(dataset: SyntheticDataset):
+    """Remove everything generate_dataset and the scenarios created."""
+    
+    db = SessionLocal()
+    try:
+        image_ids = select(Image.id).where(Image.dataset_id == dataset.dataset_id)
+        hashes = [h for (h,) in db.execute(
+            select(Image.content_hash).where(Image.dataset_id == dataset.dataset_id)
+        )]
+        db.execute(delete(Annotation).where(Annotation.image_id.in_(image_ids)))
+        db.execute(delete(Prediction).where(Prediction.image_id.in_(image_ids)))
+        db.execute(delete(Image).where(Image.dataset_id == dataset.dataset_id))
+        db.execute(delete(Job).where(Job.dataset_id == dataset.dataset_id))
+        db.execute(delete(Dataset).where(Dataset.id == dataset.dataset_id))
+        db.execute(delete(User).where(User.id == dataset.user_id))
+        unreferenced = content_store.release_refs(db, Counter(hashes))
+        db.commit()
+        content_store.remove_files(db, unreferenced)
+    finally:
+        db.close()
+
+def _create_prelabel_job(dataset: SyntheticDataset, goal: str = "fast") -> uuid.UUID:
+    db = SessionLocal()
+    try:
+        job = Job(
+            dataset_id=dataset.dataset_id,
+            type=JobType.PRELABEL,
+            status=JobStatus.QUEUED,
+            total=len(dataset.image_ids),
+            agent_mode=False,
+            params_json={"goal": goal, "instructions": ""}
+        )
+        db.add(job)
+        db.commit()
+        return job.id
+    finally:
+        db.close()
+
+def _check_job(job_id: uuid.UUID):
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        if job.status != JobStatus.COMPLETE:
+            raise RuntimeError(f"Benchmark job {job_id} ended {job.status.value}: {job.error}")
+    finally:
+        db.close()
@@ -0,0 +1,114 @@
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, UTC
+from typing import List, Tuple
+from uuid import UUID
+import io
+import uuid
+
+import numpy as np
+from PIL import Image as PILImage
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models.annotation import Annotation, AnnotationSource
+from app.models.dataset import Dataset
+from app.models.image import Image
+from app.models.user import User
+from app.services.storage import content_store
+
+# Rows per multi-row INSERT while generating
+GENERATE_CHUNK_SIZE = 1000
+
+@dataclass
+class SyntheticDataset:
+    user_id: UUID
+    dataset_id: UUID
+    image_ids: List[UUID]
+
+def generate_dataset(
+    db: Session,
+    n_images: int,
+    boxes_per_image: int,
+    image_size: Tuple[int, int] = (160, 120),
+    seed: int = 0,
+) -> SyntheticDataset:
+    """Create a user, a dataset and `n_images` images with annotations.
+    
+    Images are small random JPEGs written through the content store, each
+    with `boxes_per_image` manual annotations. The same seed always produces
+    the same pixels and boxes. Counters are filled in as the app would.
+    """
+    
+    rng = np.random.default_rng(seed)
+    width, height = image_size
+    
+    user = User(email=f"bench-{uuid.uuid4().hex[:12]}@example.com", password_hash="!")
+    db.add(user)
+    db.flush()
+    dataset = Dataset(owner_user_id=user.id, name=f"bench-{n_images}x{boxes_per_image}")
+    db.add(dataset)
+    db.flush()
+    
+    image_ids = [uuid.uuid4() for _ in range(n_images)]
+    created_at = datetime.now(UTC)
+    
+    for start in range(0, n_images, GENERATE_CHUNK_SIZE):
+        chunk_ids = image_ids[start:start + GENERATE_CHUNK_SIZE]
+        image_rows = []
+        annotation_rows = []
+        sizes = {}
+        hashes = []
+        
+        for image_id in chunk_ids:
+            # Coarse noise upscaled: compresses like a photo, not like static
+            coarse = rng.integers(0, 256, (height // 8 + 1, width // 8 + 1, 3), dtype=np.uint8)
+            img = PILImage.fromarray(coarse).resize((width, height), PILImage.BILINEAR)
+            buffer = io.BytesIO()
+            img.save(buffer, "JPEG", quality=85)
+            buffer.seek(0)
+            
+            sha256, path, size, _ = content_store.put(buffer)
+            sizes[sha256] = size
+            hashes.append(sha256)
+            
+            image_rows.append({
+                "id": image_id,
+                "dataset_id": dataset.id,
+                "filename": f"{image_id.hex[:8]}.jpg",
+                "storage_uri": str(path),
+                "content_hash": sha256,
+                "width": width,
+                "height": height,
+                "created_at": created_at,
+                "annotation_count": boxes_per_image,
+            })
+            
+            w = rng.uniform(0.05, 0.4, boxes_per_image) * width
+            h = rng.uniform(0.05, 0.4, boxes_per_image) * height
+            x = rng.uniform(0, 1, boxes_per_image) * (width - w)
+            y = rng.uniform(0, 1, boxes_per_image) * (height - h)
+            for i in range(boxes_per_image):
+                annotation_rows.append({
+                    "id": uuid.uuid4(),
+                    "image_id": image_id,
+                    "label": f"class{i % 3}",
+                    "x": float(x[i]),
+                    "y": float(y[i]),
+                    "w": float(w[i]),
+                    "h": float(h[i]),
+                    "source": AnnotationSource.manual,
+                    "confidence": None,
+                    "updated_at": created_at,
+                })
+        
+        content_store.add_refs(db, sizes=sizes, counts=Counter(hashes))
+        db.execute(insert(Image), image_rows)
+        if annotation_rows:
+            db.execute(insert(Annotation), annotation_rows)
+    
+    dataset.image_count = n_images
+    dataset.annotation_count = n_images * boxes_per_image
+    db.commit()
+    
+    return SyntheticDataset(user_id=user.id, dataset_id=dataset.id, image_ids=image_ids)
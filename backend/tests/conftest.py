@@ -0,0 +1,50 @@
+"""Test setup: point the app at a scratch database before it is imported.
+
+By default a throwaway SQLite file is used. Set TEST_DATABASE_URL to run
+against Postgres instead; it must point at a scratch database that already
+has the schema (alembic upgrade head).
+"""
+from pathlib import Path
+import os
+import tempfile
+
+import pytest
+
+_workdir = Path(tempfile.mkdtemp(prefix="orion-tests-"))
+os.environ["DATABASE_URL"] = os.environ.get("TEST_DATABASE_URL") or f"sqlite:///{_workdir / 'test.sqlite'}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.setdefault("SECRET_KEY", "test-secret-key-not-for-production")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import app.models  # noqa: E402,F401 (registers every table for create_all)
+from app.core.database import Base, SessionLocal, async_engine, engine  # noqa: E402
+from app.main import app  # noqa: E402 (imported after app.models, which binds `app` to the package)
+from app.services.executor import job_executor  # noqa: E402
+from app.services.recovery import job_recovery  # noqa: E402
+
+if engine.dialect.name == "sqlite":
+    Base.metadata.create_all(engine)
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture
+def api(monkeypatch):
+    """A client for the app, without job workers or the recovery monitor.
+    
+    Entered so every request shares one event loop: asyncpg connections are
+    bound to the loop that opened them.
+    """
+    
+    monkeypatch.setattr(job_executor, "start", lambda: None)
+    monkeypatch.setattr(job_recovery, "start", lambda: None)
+    with TestClient(app) as client:
+        yield client
+        # Drop pooled connections while their loop is still running
+        client.portal.call(async_engine.dispose)
@@ -0,0 +1,29 @@
+from concurrent.futures.process import BrokenProcessPool
+from uuid import uuid4
+import os
+
+import pytest
+
+from app.services.executor import JobExecutor
+
+def die(job_id):
+    # What an OOM kill looks like to the pool
+    os._exit(1)
+
+def finish(job_id):
+    return None
+
+@pytest.fixture
+def executor():
+    executor = JobExecutor(max_workers=1, queue_limit=4)
+    yield executor
+    executor.shutdown(timeout=5)
+
+def test_pool_is_replaced_after_a_worker_dies(executor):
+    killed = executor.submit(die, uuid4())
+    with pytest.raises(BrokenProcessPool):
+        killed.result(timeout=120)
+    
+    # Whether or not the done callback has dropped the broken pool yet
+    assert executor.submit(finish, uuid4()).result(timeout=120) is None
+    assert executor.pending_count() == 0
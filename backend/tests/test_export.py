@@ -0,0 +1,173 @@
+from collections import Counter
+from datetime import datetime, timedelta, UTC
+from uuid import uuid4
+import io
+import json
+import os
+import zipfile
+
+import pytest
+from sqlalchemy import delete, insert
+
+from app.core.security import create_access_token
+from app.models.annotation import Annotation, AnnotationSource
+from app.models.dataset import Dataset
+from app.models.image import Image
+from app.models.jobs import Job, JobStatus, JobType
+from app.models.user import User
+from app.services import export
+from app.services.export import EXPORT_PROGRESS_EVERY, export_service, run_export_job
+from app.services.leases import job_lease_service
+
+# Enough images for several mid-export checkpoints, not a multiple of the interval
+N_IMAGES = 2 * EXPORT_PROGRESS_EVERY + 250
+
+@pytest.fixture
+def dataset(db):
+    """A dataset of N_IMAGES images; every other image has two annotations."""
+    
+    user = User(email=f"export-{uuid4().hex[:12]}@example.com", password_hash="!")
+    db.add(user)
+    db.flush()
+    dataset = Dataset(owner_user_id=user.id, name="export-test", image_count=N_IMAGES)
+    db.add(dataset)
+    db.flush()
+    
+    image_ids = [uuid4() for _ in range(N_IMAGES)]
+    db.execute(insert(Image), [
+        {
+            "id": image_id,
+            "dataset_id": dataset.id,
+            "filename": f"{i}.jpg",
+            "storage_uri": f"/nonexistent/{i}.jpg",
+            "width": 200,
+            "height": 100,
+        }
+        for i, image_id in enumerate(image_ids)
+    ])
+    db.execute(insert(Annotation), [
+        {
+            "id": uuid4(),
+            "image_id": image_id,
+            "label": label,
+            "x": 10.0,
+            "y": 20.0,
+            "w": 50.0,
+            "h": 40.0,
+            "source": AnnotationSource.manual,
+        }
+        for image_id in image_ids[::2]
+        for label in ("cat", "dog")
+    ])
+    db.commit()
+    
+    yield dataset
+    
+    db.rollback()
+    db.execute(delete(Job).where(Job.dataset_id == dataset.id))
+    db.execute(delete(Annotation).where(Annotation.image_id.in_(image_ids)))
+    db.execute(delete(Image).where(Image.dataset_id == dataset.id))
+    db.execute(delete(Dataset).where(Dataset.id == dataset.id))
+    db.execute(delete(User).where(User.id == user.id))
+    db.commit()
+
+@pytest.fixture
+def checkpoints(monkeypatch):
+    """`processed` values of every export checkpoint."""
+    
+    seen = []
+    original = job_lease_service.checkpoint
+    
+    def record(db, job, **values):
+        if "processed" in values:
+            seen.append(values["processed"])
+        return original(db, job, **values)
+    
+    monkeypatch.setattr(job_lease_service, "checkpoint", record)
+    return seen
+
+@pytest.fixture(autouse=True)
+def export_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(export, "EXPORT_BASE", tmp_path)
+    return tmp_path
+
+@pytest.fixture(autouse=True)
+def small_fetches(monkeypatch):
+    # Keep the row cursor open across checkpoints (the dataset has fewer rows
+    # than one default fetch)
+    monkeypatch.setattr(export, "EXPORT_FETCH_SIZE", 100)
+
+def run_export(db, dataset, export_format):
+    job = Job(
+        dataset_id=dataset.id,
+        type=JobType.EXPORT,
+        status=JobStatus.QUEUED,
+        total=N_IMAGES,
+        params_json={"format": export_format}
+    )
+    db.add(job)
+    db.commit()
+    
+    run_export_job(job.id)
+    
+    db.expire_all()
+    job = db.get(Job, job.id)
+    assert job.status == JobStatus.COMPLETE, job.error
+    assert job.processed == N_IMAGES
+    return job
+
+def test_coco_export_checkpoints_while_streaming(db, dataset, checkpoints):
+    job = run_export(db, dataset, "coco")
+    
+    assert checkpoints == [0, EXPORT_PROGRESS_EVERY, 2 * EXPORT_PROGRESS_EVERY, N_IMAGES]
+    with open(job.artifact_uri) as f:
+        document = json.load(f)
+    assert len(document["images"]) == N_IMAGES
+    assert len(document["annotations"]) == N_IMAGES
+    assert [c["name"] for c in document["categories"]] == ["cat", "dog"]
+    # Annotation ids and image references stay consistent across checkpoints
+    assert [a["id"] for a in document["annotations"]] == list(range(1, N_IMAGES + 1))
+    per_image = Counter(a["image_id"] for a in document["annotations"])
+    assert len(per_image) == N_IMAGES // 2
+    assert set(per_image.values()) == {2}
+
+def test_yolo_export_checkpoints_while_streaming(db, dataset, checkpoints):
+    job = run_export(db, dataset, "yolo")
+    
+    assert checkpoints == [0, EXPORT_PROGRESS_EVERY, 2 * EXPORT_PROGRESS_EVERY, N_IMAGES]
+    with zipfile.ZipFile(job.artifact_uri) as archive:
+        labels = [name for name in archive.namelist() if name.startswith("labels/")]
+        assert len(labels) == N_IMAGES
+        assert archive.read("classes.txt").decode() == "cat\ndog\n"
+        lines = [
+            line for name in labels
+            for line in io.TextIOWrapper(archive.open(name)).read().splitlines()
+        ]
+    assert len(lines) == N_IMAGES
+    assert sorted(set(line.split()[0] for line in lines)) == ["0", "1"]
+
+def test_unknown_format_is_rejected(api, dataset):
+    api.cookies.set("access_token", create_access_token({"sub": str(dataset.owner_user_id)}))
+    
+    response = api.post(f"/datasets/{dataset.id}/exports", json={"format": "voc"})
+    
+    assert response.status_code == 422
+
+def test_expired_artifacts_are_deleted(db, dataset, export_dir):
+    job = run_export(db, dataset, "coco")
+    artifact = export_dir / os.path.basename(job.artifact_uri)
+    orphan = export_dir / "orphan.json"
+    orphan.write_text("{}")
+    
+    assert export_service.purge_expired(db) == 0
+    assert artifact.exists() and orphan.exists()
+    
+    job.finished_at = datetime.now(UTC) - timedelta(days=2)
+    db.commit()
+    old = (datetime.now(UTC) - timedelta(days=2)).timestamp()
+    os.utime(orphan, (old, old))
+    
+    assert export_service.purge_expired(db) == 2
+    assert not artifact.exists() and not orphan.exists()
+    db.refresh(job)
+    assert job.artifact_uri is None
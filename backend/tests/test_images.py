@@ -0,0 +1,73 @@
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import delete, insert
+
+from app.core.security import create_access_token
+from app.models.dataset import Dataset
+from app.models.image import Image
+from app.models.user import User
+from app.routes.images import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+N_IMAGES = 2 * DEFAULT_PAGE_SIZE + 50
+
+@pytest.fixture
+def dataset(db):
+    user = User(email=f"images-{uuid4().hex[:12]}@example.com", password_hash="!")
+    db.add(user)
+    db.flush()
+    dataset = Dataset(owner_user_id=user.id, name="images-test", image_count=N_IMAGES)
+    db.add(dataset)
+    db.flush()
+    db.execute(insert(Image), [
+        {
+            "dataset_id": dataset.id,
+            "filename": f"{i:04d}.jpg",
+            "storage_uri": f"/nonexistent/{i}.jpg",
+            "width": 64,
+            "height": 48,
+        }
+        for i in range(N_IMAGES)
+    ])
+    db.commit()
+    
+    yield dataset
+    
+    db.rollback()
+    db.execute(delete(Image).where(Image.dataset_id == dataset.id))
+    db.execute(delete(Dataset).where(Dataset.id == dataset.id))
+    db.execute(delete(User).where(User.id == user.id))
+    db.commit()
+
+@pytest.fixture
+def client(api, dataset):
+    api.cookies.set("access_token", create_access_token({"sub": str(dataset.owner_user_id)}))
+    return api
+
+def test_list_images_is_paged_by_default(client, dataset):
+    response = client.get(f"/datasets/{dataset.id}/images")
+    
+    assert response.status_code == 200
+    assert len(response.json()) == DEFAULT_PAGE_SIZE
+    assert response.headers["X-Next-Cursor"]
+
+def test_list_images_cursor_walks_every_image_once(client, dataset):
+    seen = []
+    cursor = None
+    while True:
+        params = {"sort": "filename"}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get(f"/datasets/{dataset.id}/images", params=params)
+        assert response.status_code == 200
+        seen.extend(item["filename"] for item in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    
+    assert seen == [f"{i:04d}.jpg" for i in range(N_IMAGES)]
+
+def test_list_images_rejects_pages_over_the_maximum(client, dataset):
+    response = client.get(f"/datasets/{dataset.id}/images", params={"limit": MAX_PAGE_SIZE + 1})
+    
+    assert response.status_code == 422
@@ -0,0 +1,45 @@
+import pytest
+
+from app.core.config import settings
+from app.core.metrics import Metric, MetricsRegistry
+from app.routes import metrics as metrics_route
+
+def test_metric_must_implement_samples():
+    class Incomplete(Metric):
+        def _apply_local(self, op, label_values, value):
+            pass
+    
+    with pytest.raises(TypeError):
+        Incomplete(MetricsRegistry(), "orion_incomplete", "Never registered")
+
+def test_remote_client_without_token_is_refused(api, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", None)
+    
+    assert api.get("/metrics").status_code == 403
+
+def test_local_client_without_token(api, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", None)
+    # TestClient reports its peer as "testclient"
+    monkeypatch.setattr(metrics_route, "LOOPBACK_HOSTS", {"testclient"})
+    
+    response = api.get("/metrics")
+    
+    assert response.status_code == 200
+    assert "orion_executor_pending_jobs 0" in response.text
+
+def test_token(api, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-secret")
+    
+    assert api.get("/metrics").status_code == 401
+    assert api.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert api.get("/metrics", headers={"Authorization": "Bearer scrape-secret"}).status_code == 200
+
+def test_health_details_need_metrics_access(api, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-secret")
+    
+    assert api.get("/health").json() == {"status": "ok"}
+    assert api.get("/health/details").status_code == 401
+    
+    response = api.get("/health/details", headers={"Authorization": "Bearer scrape-secret"})
+    assert response.status_code == 200
+    assert response.json()["models"] == []
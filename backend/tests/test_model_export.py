@@ -0,0 +1,23 @@
+import pytest
+
+from app.services import model_export
+
+@pytest.fixture(autouse=True)
+def fresh_checks():
+    model_export.backend_available.cache_clear()
+    yield
+    model_export.backend_available.cache_clear()
+
+def test_backend_needs_every_export_package(monkeypatch):
+    # The runtime alone is not enough: exporting needs onnx and onnxslim too
+    monkeypatch.setattr(model_export, "_module_installed", lambda module: module == "onnxruntime")
+    
+    assert not model_export.backend_available("onnx")
+    assert model_export.backend_available("torch")
+
+def test_backend_with_all_packages(monkeypatch):
+    monkeypatch.setattr(model_export, "_module_installed", lambda module: True)
+    
+    assert model_export.backend_available("onnx")
+    assert model_export.backend_available("openvino")
+    assert not model_export.backend_available("tensorrt")
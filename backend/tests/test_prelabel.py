@@ -0,0 +1,167 @@
+from uuid import uuid4
+
+import numpy as np
+import pytest
+from sqlalchemy import delete, insert, select, update
+
+from app.core.config import settings
+from app.models.annotation import Annotation
+from app.models.dataset import Dataset
+from app.models.image import Image
+from app.models.jobs import Job, JobStatus, JobType
+from app.models.prediction import Prediction
+from app.models.user import User
+from app.services import prelabel
+from app.services.agent import agent_service
+from app.services.inference import BoxColumns, yolo_service
+from app.services.leases import job_lease_service
+
+N_IMAGES = 50
+BATCH_SIZE = 4
+# (width, height) of the images, every third one portrait
+SIZES = [(640, 480), (640, 480), (480, 640)]
+
+@pytest.fixture
+def dataset(db):
+    user = User(email=f"prelabel-{uuid4().hex[:12]}@example.com", password_hash="!")
+    db.add(user)
+    db.flush()
+    dataset = Dataset(owner_user_id=user.id, name="prelabel-test", image_count=N_IMAGES)
+    db.add(dataset)
+    db.flush()
+    db.execute(insert(Image), [
+        {
+            "dataset_id": dataset.id,
+            "filename": f"{i}.jpg",
+            # The fake decoder reads the size back from the path
+            "storage_uri": f"/nonexistent/{width}x{height}/{i}.jpg",
+            "width": width,
+            "height": height,
+        }
+        for i, (width, height) in enumerate(SIZES[i % len(SIZES)] for i in range(N_IMAGES))
+    ])
+    db.commit()
+    
+    yield dataset
+    
+    db.rollback()
+    image_ids = select(Image.id).where(Image.dataset_id == dataset.id)
+    db.execute(delete(Annotation).where(Annotation.image_id.in_(image_ids)))
+    db.execute(delete(Prediction).where(Prediction.image_id.in_(image_ids)))
+    db.execute(delete(Job).where(Job.dataset_id == dataset.id))
+    db.execute(delete(Image).where(Image.dataset_id == dataset.id))
+    db.execute(delete(Dataset).where(Dataset.id == dataset.id))
+    db.execute(delete(User).where(User.id == user.id))
+    db.commit()
+
+@pytest.fixture
+def model_batches(monkeypatch):
+    """Shapes of the decoded images in every batch given to the model."""
+    
+    batches = []
+    
+    def decode(storage_uri):
+        width, height = map(int, storage_uri.split("/")[-2].split("x"))
+        return np.zeros((height, width, 3), dtype=np.uint8)
+    
+    def predict_batch_raw(images, **kwargs):
+        batches.append([image.shape[:2] for image in images])
+        return [BoxColumns.from_xyxy([[10, 10, 100, 100]], [0.9], [0]) for _ in images]
+    
+    monkeypatch.setattr(prelabel, "decode_image", decode)
+    monkeypatch.setattr(yolo_service, "predict_batch_raw", predict_batch_raw)
+    monkeypatch.setattr(settings, "PRELABEL_BATCH_SIZE", BATCH_SIZE)
+    monkeypatch.setattr(settings, "PRELABEL_BUCKET_WINDOW", 2)
+    return batches
+
+@pytest.fixture
+def checkpoints(monkeypatch):
+    """checkpoint_image_id of every checkpoint."""
+    
+    seen = []
+    original = job_lease_service.checkpoint
+    
+    def record(db, job, **values):
+        if "checkpoint_image_id" in values:
+            seen.append(values["checkpoint_image_id"])
+        return original(db, job, **values)
+    
+    monkeypatch.setattr(job_lease_service, "checkpoint", record)
+    return seen
+
+def run_job(db, dataset, **params):
+    job = Job(
+        dataset_id=dataset.id,
+        type=JobType.PRELABEL,
+        status=JobStatus.QUEUED,
+        total=N_IMAGES,
+        params_json={"goal": "fast", "instructions": "", **params}
+    )
+    db.add(job)
+    db.commit()
+    assert job_lease_service.claim(db, job.id) is not None
+    
+    prelabel.run_prelabel_pipeline(db, job, agent_service.create_initial_plan("fast"))
+    return job
+
+def test_batches_are_bucketed_before_decode_and_written_in_id_order(db, dataset, model_batches, checkpoints):
+    job = run_job(db, dataset)
+    
+    # Each batch holds one shape, and at most BATCH_SIZE decoded images
+    assert all(len(set(shapes)) == 1 and len(shapes) <= BATCH_SIZE for shapes in model_batches)
+    assert sum(len(shapes) for shapes in model_batches) == N_IMAGES
+    
+    image_ids = sorted(db.scalars(select(Image.id).where(Image.dataset_id == dataset.id)))
+    assert checkpoints == sorted(checkpoints)
+    assert checkpoints[-1] == image_ids[-1]
+    db.expire_all()
+    assert db.get(Job, job.id).processed == N_IMAGES
+    assert set(db.scalars(
+        select(Image.annotation_count).where(Image.dataset_id == dataset.id)
+    )) == {1}
+
+def test_tiled_images_get_their_own_batch_size(db, dataset, model_batches, monkeypatch):
+    # Every test image is over the limit, so all of them are tiled
+    monkeypatch.setattr(settings, "TILING_MIN_SIDE", 600)
+    monkeypatch.setattr(settings, "PRELABEL_TILED_BATCH_SIZE", 2)
+    
+    run_job(db, dataset)
+    
+    assert max(len(shapes) for shapes in model_batches) == 2
+    assert sum(len(shapes) for shapes in model_batches) == N_IMAGES
+
+def test_stored_predictions_are_reused_only_for_the_same_weights(db, dataset, model_batches, monkeypatch):
+    db.execute(
+        update(Image).where(Image.dataset_id == dataset.id).values(content_hash=Image.filename)
+    )
+    db.commit()
+    
+    def predicted_images():
+        count = sum(len(shapes) for shapes in model_batches)
+        model_batches.clear()
+        return count
+    
+    run_job(db, dataset)
+    assert predicted_images() == N_IMAGES
+    
+    run_job(db, dataset)
+    assert predicted_images() == 0
+    
+    run_job(db, dataset, force_inference=True)
+    assert predicted_images() == N_IMAGES
+    
+    monkeypatch.setattr(yolo_service, "weights_id", lambda model_name: "sha256:retrained")
+    run_job(db, dataset)
+    assert predicted_images() == N_IMAGES
+
+def test_weights_id_follows_file_content(tmp_path, monkeypatch):
+    monkeypatch.setattr(yolo_service, "models_dir", tmp_path)
+    weights = tmp_path / "custom.pt"
+    weights.write_bytes(b"v1")
+    
+    first = yolo_service.weights_id("custom.pt")
+    assert yolo_service.weights_id("custom.pt") == first
+    
+    weights.write_bytes(b"v2!")
+    assert yolo_service.weights_id("custom.pt") != first
+    assert yolo_service.weights_id("yolov8n.pt") == "release:yolov8n.pt"
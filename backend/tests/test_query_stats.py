@@ -0,0 +1,40 @@
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.query_stats import count_batch, log_query_stats, track_queries
+
+def repeated_warnings(caplog):
+    return [record for record in caplog.records if "possible N+1" in record.getMessage()]
+
+def test_statements_repeated_once_per_batch_are_not_reported(db, caplog):
+    with track_queries() as stats:
+        for _ in range(3 * settings.DB_REPEATED_QUERY_THRESHOLD):
+            db.execute(text("SELECT 1"))
+            count_batch()
+    
+    log_query_stats("Job", stats)
+    
+    assert stats.count == 3 * settings.DB_REPEATED_QUERY_THRESHOLD
+    assert repeated_warnings(caplog) == []
+
+def test_per_row_statements_in_a_batch_are_reported(db, caplog):
+    with track_queries() as stats:
+        for _ in range(settings.DB_REPEATED_QUERY_THRESHOLD):
+            db.execute(text("SELECT 1"))
+        count_batch()
+    
+    log_query_stats("Job", stats)
+    
+    assert len(repeated_warnings(caplog)) == 1
+
+def test_executemany_is_not_a_repeat(db, caplog):
+    db.execute(text("CREATE TEMPORARY TABLE query_stats_rows (n INTEGER)"))
+    with track_queries() as stats:
+        for _ in range(settings.DB_REPEATED_QUERY_THRESHOLD):
+            db.execute(text("INSERT INTO query_stats_rows (n) VALUES (:n)"), [{"n": 1}, {"n": 2}])
+    db.rollback()
+    
+    log_query_stats("Request", stats)
+    
+    assert repeated_warnings(caplog) == []
@@ -0,0 +1,98 @@
+import io
+
+import pytest
+
+from PIL import Image as PILImage
+
+from app.models.blob import Blob
+from app.services import thumbnails
+from app.services.storage import ContentStore
+from app.services.thumbnails import IMAGE_VARIANTS, thumbnail_service
+
+@pytest.fixture
+def store(tmp_path):
+    return ContentStore(tmp_path / "blobs")
+
+@pytest.fixture
+def cleanup(db):
+    """Blob rows created by a test are removed afterwards."""
+    
+    hashes = []
+    yield hashes
+    db.rollback()
+    db.query(Blob).filter(Blob.sha256.in_(hashes)).delete(synchronize_session=False)
+    db.commit()
+
+def refcount(db, sha256):
+    db.expire_all()
+    blob = db.get(Blob, sha256)
+    return None if blob is None else blob.refcount
+
+def test_delete_between_put_and_ref_commit_is_restored(db, store, cleanup):
+    data = b"shared bytes"
+    sha256, path, size, _ = store.put(io.BytesIO(data))
+    cleanup.append(sha256)
+    store.add_refs(db, {sha256: size}, {sha256: 1})
+    db.commit()
+    
+    # A second upload finds the file already stored...
+    source = io.BytesIO(data)
+    _, _, _, created = store.put(source)
+    assert not created
+    
+    # ...but the only other reference is released and removed before it commits
+    unreferenced = store.release_refs(db, {sha256: 1})
+    db.commit()
+    store.remove_files(db, unreferenced)
+    assert not path.exists()
+    
+    store.add_refs(db, {sha256: size}, {sha256: 1})
+    db.commit()
+    assert store.restore(sha256, source)
+    assert path.read_bytes() == data
+    assert refcount(db, sha256) == 1
+
+def test_remove_files_keeps_files_referenced_meanwhile(db, store, cleanup):
+    sha256, path, size, _ = store.put(io.BytesIO(b"kept"))
+    cleanup.append(sha256)
+    store.add_refs(db, {sha256: size}, {sha256: 1})
+    db.commit()
+    
+    unreferenced = store.release_refs(db, {sha256: 1})
+    db.commit()
+    assert unreferenced == [sha256]
+    assert refcount(db, sha256) == 0
+    
+    store.add_refs(db, {sha256: size}, {sha256: 1})
+    db.commit()
+    store.remove_files(db, unreferenced)
+    
+    assert path.exists()
+    assert refcount(db, sha256) == 1
+    assert not store.restore(sha256, io.BytesIO(b"kept"))
+
+def test_remove_files_of_failed_upload(db, store, cleanup):
+    sha256, path, _, created = store.put(io.BytesIO(b"never referenced"))
+    cleanup.append(sha256)
+    assert created
+    
+    store.remove_files(db, [sha256])
+    
+    assert not path.exists()
+    assert refcount(db, sha256) is None
+
+def test_thumbnails_go_with_the_last_reference(db, store, cleanup, tmp_path, monkeypatch):
+    monkeypatch.setattr(thumbnails, "THUMBNAIL_BASE", tmp_path / "thumbnails")
+    source = io.BytesIO()
+    PILImage.new("RGB", (64, 48)).save(source, format="PNG")
+    source.seek(0)
+    sha256, path, size, _ = store.put(source)
+    cleanup.append(sha256)
+    store.add_refs(db, {sha256: size}, {sha256: 1})
+    db.commit()
+    variants = [thumbnail_service.get_variant(sha256, path, variant) for variant in IMAGE_VARIANTS]
+    
+    store.remove_files(db, store.release_refs(db, {sha256: 1}))
+    
+    assert not path.exists()
+    assert not any(variant.exists() for variant in variants)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from app.services.inference import BoxColumns, yolo_service
+
+TILE_SIZE = 640
+OVERLAP = 0.2
+
+@pytest.fixture(autouse=True)
+def detector(monkeypatch):
+    """Finds each non-zero pixel value of a crop as one object, as far as the crop shows it.
+    
+    Like a real model on a downscaled large image, it finds nothing in the
+    whole-image pass, so only the tiles count.
+    """
+    
+    def run_model(crops, *args):
+        results = []
+        for crop in crops:
+            boxes = []
+            if max(crop.shape[:2]) <= TILE_SIZE:
+                for value in np.unique(crop[crop > 0]):
+                    ys, xs = np.nonzero(crop == value)
+                    boxes.append([xs.min(), ys.min(), xs.max() + 1, ys.max() + 1])
+            results.append(BoxColumns.from_xyxy(np.array(boxes), np.full(len(boxes), 0.9), np.zeros(len(boxes))))
+        return results
+    
+    monkeypatch.setattr(yolo_service, "_run_model", run_model)
+
+def predict(image):
+    [columns] = yolo_service._predict_tiled(
+        [image], TILE_SIZE, OVERLAP, "fake.pt", TILE_SIZE, 0.25, 0.5, 300, None, "torch"
+    )
+    return sorted(
+        (float(x), float(y), float(x + w), float(y + h))
+        for x, y, w, h in zip(columns.x, columns.y, columns.w, columns.h)
+    )
+
+def test_object_wider_than_overlap_across_seams():
+    # Tiles start at x = 0, 512, 1024 and 1360; the object spans three of them
+    image = np.zeros((800, 2000), dtype=np.uint8)
+    image[100:300, 450:1250] = 1
+    
+    assert predict(image) == [(450, 100, 1250, 300)]
+
+def test_cut_part_of_object_seen_whole_by_another_tile():
+    image = np.zeros((800, 2000), dtype=np.uint8)
+    image[400:500, 600:700] = 1
+    
+    assert predict(image) == [(600, 400, 700, 500)]
+
+def test_separate_objects_stay_separate():
+    image = np.zeros((800, 2000), dtype=np.uint8)
+    image[100:200, 100:200] = 1
+    image[100:200, 620:1300] = 2
+    
+    assert predict(image) == [(100, 100, 200, 200), (620, 100, 1300, 200)]
@@ -0,0 +1,89 @@
+"""Routes on the async session write timezone-aware timestamps.
+
+asyncpg refuses aware datetimes for `timestamp without time zone` columns,
+which SQLite never notices: run these against Postgres (TEST_DATABASE_URL)
+to cover that.
+"""
+from uuid import uuid4
+import io
+
+import pytest
+from PIL import Image as PILImage
+
+from app.models.user import User
+from app.services import storage
+from app.services.executor import job_executor
+
+def jpeg(width: int, height: int, color: int) -> bytes:
+    buffer = io.BytesIO()
+    PILImage.new("RGB", (width, height), (color, color, color)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+@pytest.fixture
+def account(api, db, tmp_path, monkeypatch):
+    """A registered, logged-in user with one dataset of two uploaded images."""
+    
+    monkeypatch.setattr(storage.content_store, "root", tmp_path / "blobs")
+    email = f"timestamps-{uuid4().hex[:12]}@example.com"
+    
+    response = api.post("/auth/register", json={"email": email, "password": "correct horse"})
+    assert response.status_code == 200, response.text
+    
+    response = api.post("/datasets", json={"name": "timestamps"})
+    assert response.status_code == 200, response.text
+    dataset_id = response.json()["id"]
+    
+    response = api.post(f"/datasets/{dataset_id}/images", files=[
+        ("files", (f"{i}.jpg", jpeg(32 + i, 24, 40 * i), "image/jpeg")) for i in range(2)
+    ])
+    assert response.status_code == 200, response.text
+    
+    yield dataset_id, response.json()["image_ids"]
+    
+    assert api.delete(f"/datasets/{dataset_id}").status_code == 200
+    db.query(User).filter(User.email == email).delete()
+    db.commit()
+
+def test_annotation_writes(api, account):
+    _, (image_id, _) = account
+    
+    response = api.put(f"/images/{image_id}/annotations", json={"annotations": [
+        {"label": "cat", "x": 1, "y": 2, "w": 10, "h": 8},
+    ]})
+    assert response.status_code == 200, response.text
+    
+    response = api.get(f"/images/{image_id}/annotations")
+    version = int(response.headers["X-Annotation-Version"])
+    annotation = response.json()[0]
+    response = api.patch(f"/images/{image_id}/annotations", json={
+        "version": version,
+        "create": [{"label": "dog", "x": 5, "y": 5, "w": 4, "h": 4}],
+        "update": [{**annotation, "w": 12}],
+    })
+    assert response.status_code == 200, response.text
+    
+    response = api.post(f"/images/{image_id}/reviewed")
+    assert response.status_code == 200, response.text
+
+def test_images_sorted_by_upload_time(api, account):
+    dataset_id, image_ids = account
+    
+    response = api.get(f"/datasets/{dataset_id}/images", params={"limit": 1})
+    assert response.status_code == 200, response.text
+    first = response.json()[0]["id"]
+    response = api.get(f"/datasets/{dataset_id}/images", params={
+        "limit": 1, "cursor": response.headers["X-Next-Cursor"]
+    })
+    assert response.status_code == 200, response.text
+    assert {first, response.json()[0]["id"]} == set(image_ids)
+
+def test_start_prelabel(api, account, monkeypatch):
+    dataset_id, _ = account
+    monkeypatch.setattr(job_executor, "submit", lambda fn, job_id: None)
+    
+    response = api.post(f"/datasets/{dataset_id}/prelabel", json={"goal": "fast"})
+    assert response.status_code == 200, response.text
+    
+    response = api.get(f"/jobs/{response.json()['job_id']}")
+    assert response.status_code == 200, response.text
+    assert response.json()["status"] == "queued"
@@ -47,6 +47,7 @@ interface AnnotateImageData {
   id: string
   filename: string
   url: string
+  thumbnail?: string
   width: number
   height: number
   boxes: AnnotateBoundingBox[]
@@ -148,6 +149,7 @@ export function AnnotateContent({ datasetId }: AnnotateContentProps) {
               id: img.id,
               filename: img.filename,
               url: imageUrl,
+              thumbnail: getImageUrl(img.id, "thumb"),
               width: img.width,
               height: img.height,
               boxes: fullBoxes,
@@ -158,6 +160,7 @@ export function AnnotateContent({ datasetId }: AnnotateContentProps) {
               id: img.id,
               filename: img.filename,
               url: imageUrl,
+              thumbnail: getImageUrl(img.id, "thumb"),
               width: img.width,
               height: img.height,
               boxes: [],
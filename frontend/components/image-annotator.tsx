@@ -747,7 +747,7 @@ export function ImageAnnotator({
   
                 images.map((img, index) => {
                   const imgName = img.filename || `Image ${index + 1}`
-                  const imgThumb = img.url
+                  const imgThumb = img.thumbnail || img.url
                   
                   return (
                     <button
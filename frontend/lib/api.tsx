@@ -98,12 +98,35 @@ export async function uploadImages(datasetId: string, files: File[]) {
   return response.json();
 }
 
+// The list is paged; follow X-Next-Cursor until every image is loaded
 export async function getImages(datasetId: string) {
-  return fetchAPI(`/datasets/${datasetId}/images`);
+  const images: any[] = [];
+  let cursor: string | null = null;
+
+  do {
+    const params = new URLSearchParams({ limit: '1000' });
+    if (cursor) params.set('cursor', cursor);
+
+    const response = await fetch(`${API_URL}/datasets/${datasetId}/images?${params}`, {
+      credentials: 'include',
+    });
+
+    if (!response.ok) {
+      const error = await response.json().catch(() => ({ detail: 'Failed to load images' }));
+      throw new Error(error.detail || 'Failed to load images');
+    }
+
+    images.push(...(await response.json()));
+    cursor = response.headers.get('X-Next-Cursor');
+  } while (cursor);
+
+  return images;
 }
 
-export function getImageUrl(imageId: string) {
-  return `${API_URL}/images/${imageId}/file`;
+// "thumb" (256px) and "preview" (1024px) are WebP variants for lists and galleries
+export function getImageUrl(imageId: string, size?: 'thumb' | 'preview') {
+  const query = size ? `?size=${size}` : '';
+  return `${API_URL}/images/${imageId}/file${query}`;
 }
 
 // Annotations